@@ -0,0 +1,343 @@
+import asyncio
+import sys
+import time
+from types import MappingProxyType
+
+import ccxt
+import ccxt.async_support as ccxt_async
+
+import scalping_bot as bot
+from scalping_bot import write_log, symbol, timeframe, long_window
+
+# --- Moteur asynchrone du bot ---
+# Même stratégie que scalping_bot.main, sur ccxt.async_support : à chaque itération les
+# bougies, le ticker et les soldes expirés sont demandés en parallèle (asyncio.gather), la
+# latence d'un tick est donc celle de l'appel le plus lent et non la somme des trois.
+# Les ordres sont passés sur la même boucle d'événements. L'état (SMA, positions, trades
+# fermés) et les règles de décision sont ceux de scalping_bot.
+
+BENCH_DELAYS = {'ohlcv': 0.120, 'ticker': 0.080, 'balance': 0.150} # Latences simulées (s) par endpoint
+
+
+def init_async_exchange():
+    """Initialise l'objet exchange CCXT asynchrone pour Binance."""
+    exchange = ccxt_async.binance({
+        'apiKey': bot.API_KEY,
+        'secret': bot.SECRET_KEY,
+        'options': {'defaultType': 'spot'},
+        'enableRateLimit': True, # Active la gestion automatique des limites de taux
+    })
+    exchange.set_sandbox_mode(True)
+    return exchange
+
+
+async def fetch_new_candles(exchange):
+    """Version asynchrone de scalping_bot.fetch_new_candles. Retourne [] en cas d'erreur."""
+    try:
+        if bot.sma_state.last_timestamp is None:
+            return await exchange.fetch_ohlcv(symbol, timeframe, limit=long_window + 5) or []
+        return await exchange.fetch_ohlcv(symbol, timeframe, since=bot.sma_state.last_timestamp) or []
+    except ccxt.NetworkError as e:
+        write_log(f"Erreur réseau lors de la récupération OHLCV: {e}")
+        return []
+    except ccxt.ExchangeError as e:
+        write_log(f"Erreur d'échange lors de la récupération OHLCV: {e}")
+        return []
+    except Exception as e:
+        write_log(f"Erreur inattendue lors de la récupération OHLCV: {e}")
+        return []
+
+
+async def fetch_balances(exchange):
+    """Version asynchrone de scalping_bot.fetch_balances. Retourne (0, 0) en cas d'erreur."""
+    try:
+        balance = await exchange.fetch_balance()
+        usd = balance['total'].get('USDT', 0)
+        btc = balance['total'].get('BTC', 0)
+        return usd, btc
+    except ccxt.NetworkError as e:
+        write_log(f"Erreur réseau lors de la récupération des soldes: {e}")
+        return 0, 0
+    except ccxt.ExchangeError as e:
+        write_log(f"Erreur d'échange lors de la récupération des soldes: {e}")
+        return 0, 0
+    except Exception as e:
+        write_log(f"Erreur inattendue lors de la récupération des soldes: {e}")
+        return 0, 0
+
+
+class AsyncSnapshotProvider(bot.SnapshotProvider):
+    """
+    Instantanés du marché construits sur un exchange asynchrone : les endpoints expirés sont
+    demandés en parallèle (ou l'un après l'autre si concurrent=False, pour comparer).
+    """
+
+    def __init__(self, exchange, ttls=None, clock=time.monotonic, concurrent=True):
+        super().__init__(ttls, clock)
+        self.exchange = exchange
+        self.concurrent = concurrent
+
+    def market(self):
+        if self._market is None:
+            self._market = MappingProxyType(self.exchange.market(symbol))
+        return self._market
+
+    def fetchers(self):
+        return {
+            'ohlcv': lambda: fetch_new_candles(self.exchange),
+            'ticker': lambda: self.exchange.fetch_ticker(symbol),
+            'balance': lambda: fetch_balances(self.exchange),
+        }
+
+    async def take(self, candles=True):
+        now = self.clock()
+        fetchers = self.fetchers()
+        refreshed = self._to_refresh(fetchers, now, candles)
+        if self.concurrent:
+            values = await asyncio.gather(*(fetchers[endpoint]() for endpoint in refreshed))
+        else:
+            values = [await fetchers[endpoint]() for endpoint in refreshed]
+        for endpoint, value in zip(refreshed, values):
+            self._store(endpoint, value, now)
+        return self._snapshot(now, refreshed)
+
+
+async def place_order(provider, side, amount, market):
+    """Version asynchrone de scalping_bot.place_order sur l'exchange de `provider`."""
+    exchange = provider.exchange
+    try:
+        min_amount = market['limits']['amount']['min']
+
+        # Arrondir le montant à la précision de l'échange
+        formatted_amount = exchange.amount_to_precision(symbol, amount)
+
+        if float(formatted_amount) < min_amount:
+            write_log(f"Le montant de l'ordre ({formatted_amount}) est inférieur au minimum ({min_amount}). Ordre non placé.")
+            return None
+
+        order = await exchange.create_order(symbol, 'market', side, formatted_amount)
+        provider.invalidate('balance') # Le solde a changé : il sera relu au prochain instantané
+        return order
+    except ccxt.InsufficientFunds as e:
+        write_log(f"Fonds insuffisants pour placer un ordre {side} de {amount}: {e}")
+        return None
+    except ccxt.DDoSProtection as e:
+        write_log(f"Protection DDoS activée, attente...: {e}")
+        await asyncio.sleep(exchange.rateLimit / 1000) # Attendre le temps recommandé
+        return None
+    except ccxt.ExchangeNotAvailable as e:
+        write_log(f"Échange non disponible: {e}")
+        return None
+    except ccxt.RequestTimeout as e:
+        write_log(f"Requête expirée: {e}")
+        return None
+    except ccxt.NetworkError as e:
+        write_log(f"Erreur réseau lors de l'ordre {side}: {e}")
+        return None
+    except ccxt.ExchangeError as e:
+        write_log(f"Erreur d'échange lors de l'ordre {side}: {e}")
+        return None
+    except Exception as e:
+        write_log(f"Erreur inattendue lors de l'ordre {side}: {e}")
+        return None
+
+
+async def manage_positions(provider, snapshot):
+    """Ferme les positions dont le SL ou le TP est touché au prix de l'instantané."""
+    for pos_id, side, status in bot.exit_orders(snapshot):
+        order = await place_order(provider, side, bot.open_positions[pos_id]['amount'], snapshot.market)
+        bot.close_position(pos_id, order, snapshot.price, status)
+
+
+async def protect_position(provider, pos_id, market):
+    """Version asynchrone de scalping_bot.protect_position."""
+    exchange = provider.exchange
+    if not bot.supports_brackets(exchange):
+        return
+    try:
+        response = await getattr(exchange, bot.BRACKET_METHOD)(bot.bracket_params(bot.open_positions[pos_id], market, exchange))
+    except ccxt.NetworkError as e:
+        write_log(f"Réponse de l'OCO perdue pour la position (ID: {pos_id}), recherche sur l'exchange: {e}")
+        try:
+            bot.resolve_bracket(pos_id, await exchange.fetch_open_orders(symbol))
+        except Exception as check_error:
+            bot.mark_bracket_pending(pos_id, check_error)
+        return
+    except Exception as e:
+        write_log(f"OCO refusé pour la position (ID: {pos_id}), surveillance locale des SL/TP: {e}")
+        return
+    bot.attach_bracket(pos_id, response)
+
+
+async def reconcile_brackets(provider):
+    """Version asynchrone de scalping_bot.reconcile_brackets : les ordres à détailler sont demandés en parallèle."""
+    pending = bot.pending_brackets()
+    if not pending and not bot.protected_positions():
+        return
+    exchange = provider.exchange
+    try:
+        open_orders = await exchange.fetch_open_orders(symbol)
+    except (ccxt.NetworkError, ccxt.ExchangeError) as e:
+        write_log(f"Erreur lors de la lecture des ordres ouverts, OCO revérifiés à la prochaine clôture: {e}")
+        return
+    for pos_id in pending:
+        bot.resolve_bracket(pos_id, open_orders)
+    open_ids = {order['id'] for order in open_orders}
+    for pos_id, position in bot.protected_positions().items():
+        legs = position['bracket_orders']
+        if all(order_id in open_ids for order_id in legs.values()):
+            continue
+        try:
+            orders = await asyncio.gather(*(exchange.fetch_order(order_id, symbol) for order_id in legs.values()))
+        except (ccxt.NetworkError, ccxt.ExchangeError) as e:
+            write_log(f"Erreur lors de la lecture de l'OCO de la position (ID: {pos_id}), nouvelle vérification à la prochaine clôture: {e}")
+            continue
+        if bot.settle_bracket(pos_id, dict(zip(legs, orders))):
+            provider.invalidate('balance')
+
+
+async def run_tick(provider, close):
+    """
+    Itération de clôture de bougie : instantané, SMA jusqu'à la bougie `close`, sorties SL/TP
+    puis entrée éventuelle. Les positions sont gérées même quand aucun signal ne peut être
+    évalué (démarrage, bougie pas encore publiée). Retourne le signal évalué ('buy', 'sell' ou None).
+    """
+    snapshot = await provider.take()
+    bot.sma_state.update(bot.closed_candles(snapshot.candles, close))
+    signal = bot.close_signal(close)
+
+    # Gérer les positions ouvertes : sorties exécutées par les OCO, puis SL/TP surveillés localement
+    await reconcile_brackets(provider)
+    await manage_positions(provider, snapshot)
+
+    # Décider d'ouvrir une nouvelle position, protégée par un OCO sur l'exchange
+    # (taille arrondie à la précision du client asynchrone, dont les marchés sont chargés)
+    entry = bot.entry_order(signal, snapshot, provider.exchange)
+    if entry:
+        side, size = entry
+        pos_id = bot.open_position(side, await place_order(provider, side, size, snapshot.market), snapshot.price)
+        if pos_id:
+            await protect_position(provider, pos_id, snapshot.market)
+
+    bot.last_signal = signal
+    bot.report_status(snapshot)
+    return signal
+
+
+async def main(exchange=None):
+    """Boucle principale asynchrone du bot de trading."""
+    exchange = exchange or init_async_exchange()
+    provider = AsyncSnapshotProvider(exchange)
+    write_log("Démarrage du bot de trading (asynchrone)...")
+
+    # Reprendre les trades fermés et les positions ouvertes depuis le journal
+    bot.recover_state()
+
+    scheduler = bot.CandleScheduler(timeframe)
+
+    try:
+        await exchange.load_markets()
+        while True:
+            try:
+                if scheduler.needs_sync():
+                    sent = scheduler.clock()
+                    server_ms = await exchange.fetch_time()
+                    scheduler.set_server_time(server_ms, sent, scheduler.clock())
+
+                # Attente du prochain événement : clôture de bougie, ou surveillance SL/TP entre deux clôtures
+                event, close, wait = scheduler.next_event(monitoring=bot.needs_monitoring())
+                await asyncio.sleep(wait)
+                if event == 'monitor':
+                    await manage_positions(provider, await provider.take(candles=False))
+                    bot.sync_journal()
+                    continue
+
+                start = time.perf_counter()
+                await run_tick(provider, close)
+                write_log(f"Durée du tick: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+                # Rendre durables les événements de trading de cette clôture
+                bot.sync_journal()
+
+            except ccxt.DDoSProtection as e:
+                write_log(f"Protection DDoS activée. Attente prolongée: {e}")
+                await asyncio.sleep(exchange.rateLimit / 1000 * 2) # Attendre plus longtemps
+            except ccxt.NetworkError as e:
+                write_log(f"Erreur réseau générale: {e}. Nouvelle tentative dans 10s.")
+                await asyncio.sleep(10)
+            except ccxt.ExchangeError as e:
+                write_log(f"Erreur d'échange générale: {e}. Nouvelle tentative dans 10s.")
+                await asyncio.sleep(10)
+            except Exception as e:
+                write_log(f"Erreur inattendue dans la boucle principale: {e}. Nouvelle tentative dans 10s.")
+                await asyncio.sleep(10)
+    finally:
+        await exchange.close()
+
+# --- Mesure de latence ---
+
+class DelayedExchange:
+    """Exchange asynchrone factice : chaque appel attend la latence configurée pour son endpoint."""
+
+    rateLimit = 50
+
+    def __init__(self, delays=None, price=100.0):
+        self.delays = dict(BENCH_DELAYS if delays is None else delays)
+        self.price = price
+
+    async def load_markets(self):
+        return {}
+
+    async def close(self):
+        pass
+
+    def market(self, market_symbol):
+        return {'precision': {'amount': 5}, 'limits': {'amount': {'min': 0.00001}}}
+
+    def amount_to_precision(self, market_symbol, amount):
+        return f"{amount:.5f}"
+
+    async def fetch_time(self):
+        return int(time.time() * 1000)
+
+    async def fetch_ohlcv(self, market_symbol, tf, since=None, limit=None):
+        await asyncio.sleep(self.delays['ohlcv'])
+        return [[60_000 * i, self.price, self.price, self.price, self.price, 1.0] for i in range(limit or 1)]
+
+    async def fetch_ticker(self, market_symbol):
+        await asyncio.sleep(self.delays['ticker'])
+        return {'last': self.price}
+
+    async def fetch_balance(self):
+        await asyncio.sleep(self.delays['balance'])
+        return {'total': {'USDT': 1000.0, 'BTC': 1.0}}
+
+    async def create_order(self, market_symbol, order_type, side, amount):
+        await asyncio.sleep(self.delays.get('order', 0))
+        return {'id': '1', 'amount': float(amount), 'price': self.price, 'average': self.price}
+
+
+async def measure_latency(delays=None, ticks=10):
+    """Durée moyenne (s) d'un instantané complet, requêtes séquentielles puis parallèles."""
+    results = {}
+    no_cache = {endpoint: 0.0 for endpoint in bot.SNAPSHOT_TTLS}
+    for name, concurrent in (('sequential', False), ('concurrent', True)):
+        provider = AsyncSnapshotProvider(DelayedExchange(delays), ttls=no_cache, concurrent=concurrent)
+        start = time.perf_counter()
+        for _ in range(ticks):
+            await provider.take()
+        results[name] = (time.perf_counter() - start) / ticks
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        # python async_bot.py bench [ohlcv_ms ticker_ms balance_ms]
+        delays = dict(BENCH_DELAYS)
+        if len(sys.argv) == 5:
+            delays = {endpoint: float(ms) / 1000 for endpoint, ms in zip(('ohlcv', 'ticker', 'balance'), sys.argv[2:])}
+        latencies = asyncio.run(measure_latency(delays))
+        for name, latency in latencies.items():
+            print(f"{name:>10} : {latency * 1000:.0f} ms par tick")
+    else:
+        asyncio.run(main())
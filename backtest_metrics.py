@@ -0,0 +1,133 @@
+import numpy as np
+
+# --- Métriques de performance vectorisées pour les résultats de backtest ---
+# La courbe d'équité par bougie est reconstruite à partir des seuls tableaux de trades
+# (sommes cumulées de deltas aux bougies d'entrée et de sortie), sans boucle Python :
+# le calcul reste O(bougies + trades) et peut tourner sur chaque run d'un balayage.
+
+DURATION_BINS = np.array([0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000, np.inf]) # Durées des trades, en bougies
+YEAR = np.timedelta64(365, 'D')
+
+
+def bars_per_year(time_values):
+    """Nombre de bougies par an déduit de l'écart médian entre bougies (tableau datetime64)."""
+    if len(time_values) < 2:
+        return None
+    spacing = np.median(np.diff(time_values).astype('timedelta64[ns]').astype(np.int64))
+    if spacing <= 0:
+        return None
+    return YEAR.astype('timedelta64[ns]').astype(np.int64) / spacing
+
+
+def trade_arrays(trades):
+    """Convertit les tuples de trades (ordre de backtester.TRADE_COLUMNS) en tableaux NumPy."""
+    if not trades:
+        empty = np.array([], dtype=np.float64)
+        return {'type': np.array([], dtype=object), 'entry_time': np.array([], dtype=np.int64),
+                'entry_price': empty, 'amount_btc': empty, 'profit_usd': empty,
+                'exit_time': np.array([], dtype=np.int64)}
+    columns = list(zip(*trades))
+    return {
+        'type': np.array(columns[1], dtype=object),
+        'entry_time': np.array(columns[2], dtype=np.int64),
+        'entry_price': np.array(columns[3], dtype=np.float64),
+        'amount_btc': np.array(columns[4], dtype=np.float64),
+        'profit_usd': np.array(columns[9], dtype=np.float64),
+        'exit_time': np.array(columns[10], dtype=np.int64),
+    }
+
+
+def equity_curve(timestamps, close, trades, initial_balance):
+    """
+    Équité par bougie : solde initial + P&L réalisé des trades fermés + P&L latent des trades ouverts.
+    Retourne (equity, positions_ouvertes, index_entrée, index_sortie).
+    """
+    n = len(close)
+    entry_index = np.searchsorted(timestamps, trades['entry_time'])
+    exit_index = np.searchsorted(timestamps, trades['exit_time'])
+    side = np.where(trades['type'] == 'long', 1.0, -1.0)
+    quantity = side * trades['amount_btc']
+
+    # P&L réalisé : ajouté à la bougie de sortie
+    realized = np.zeros(n + 1)
+    np.add.at(realized, exit_index, trades['profit_usd'])
+    # P&L latent : quantité signée et coût d'entrée actifs de l'entrée (incluse) à la sortie (exclue)
+    held = np.zeros(n + 1)
+    cost = np.zeros(n + 1)
+    open_count = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(held, entry_index, quantity)
+    np.add.at(held, exit_index, -quantity)
+    np.add.at(cost, entry_index, quantity * trades['entry_price'])
+    np.add.at(cost, exit_index, -quantity * trades['entry_price'])
+    np.add.at(open_count, entry_index, 1)
+    np.add.at(open_count, exit_index, -1)
+
+    open_positions = np.cumsum(open_count[:n])
+    unrealized = np.where(open_positions > 0, np.cumsum(held[:n]) * close - np.cumsum(cost[:n]), 0.0)
+    equity = initial_balance + np.cumsum(realized[:n]) + unrealized
+    return equity, open_positions, entry_index, exit_index
+
+
+def compute_metrics(timestamps, close, trades, initial_balance, periods_per_year=None, duration_bins=DURATION_BINS):
+    """
+    Calcule les métriques d'un backtest à partir des bougies (timestamps int64, close float64)
+    et des tableaux de trades (voir trade_arrays). Retourne un dictionnaire.
+    Sharpe et Sortino sont calculés sur les rendements par bougie, puis annualisés
+    si periods_per_year est fourni.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    equity, open_positions, entry_index, exit_index = equity_curve(timestamps, close, trades, initial_balance)
+
+    # Drawdown maximal et sa durée (en bougies, du dernier plus-haut jusqu'au point courant)
+    running_max = np.maximum.accumulate(equity)
+    drawdown = equity - running_max
+    drawdown_pct = drawdown / running_max
+    bar_index = np.arange(len(equity))
+    last_peak = np.maximum.accumulate(np.where(drawdown == 0, bar_index, 0))
+    underwater_bars = bar_index - last_peak
+
+    # Rendements par bougie
+    returns = np.diff(equity) / equity[:-1]
+    mean_return = returns.mean() if len(returns) else 0.0
+    std_return = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2)) if len(returns) else 0.0
+    sharpe = mean_return / std_return if std_return > 0 else 0.0
+    sortino = mean_return / downside if downside > 0 else 0.0
+    if periods_per_year:
+        sharpe *= np.sqrt(periods_per_year)
+        sortino *= np.sqrt(periods_per_year)
+
+    profits = trades['profit_usd']
+    gross_profit = profits[profits > 0].sum()
+    gross_loss = -profits[profits < 0].sum()
+    durations = exit_index - entry_index
+    duration_counts, _ = np.histogram(durations, bins=duration_bins)
+
+    return {
+        'final_equity': equity[-1] if len(equity) else initial_balance,
+        'max_drawdown_usd': -drawdown.min() if len(drawdown) else 0.0,
+        'max_drawdown_pct': -drawdown_pct.min() * 100 if len(drawdown) else 0.0,
+        'max_drawdown_duration_bars': int(underwater_bars.max()) if len(underwater_bars) else 0,
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'exposure_pct': np.count_nonzero(open_positions) / len(open_positions) * 100 if len(open_positions) else 0.0,
+        'profit_factor': gross_profit / gross_loss if gross_loss > 0 else float('inf'),
+        'avg_trade_duration_bars': durations.mean() if len(durations) else 0.0,
+        'duration_bins': duration_bins,
+        'duration_counts': duration_counts,
+    }
+
+
+def format_duration_histogram(metrics):
+    """Histogramme des durées de trades sous forme de lignes de texte (pour les logs)."""
+    bins = metrics['duration_bins']
+    lines = []
+    for low, high, count in zip(bins[:-1], bins[1:], metrics['duration_counts']):
+        if np.isinf(high):
+            label = f"{int(low)}+"
+        elif high - low == 1:
+            label = f"{int(low)}"
+        else:
+            label = f"{int(low)}-{int(high) - 1}"
+        lines.append(f"  {label:>9} bougies : {count}")
+    return lines
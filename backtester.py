@@ -1,6 +1,14 @@
 import pandas as pd
+import numpy as np
+import bisect
+import os
 from datetime import datetime
 
+import backtest_metrics
+import kline_parser
+import ohlcv_store
+import resampler
+
 # --- Paramètres de la stratégie (ceux que nous allons tester et optimiser) ---
 # Ces valeurs seront initialisées ici pour le backtesting.
 # Elles sont identiques à celles de votre bot de trading initial.
@@ -11,9 +19,141 @@ TAKE_PROFIT_PCT = 0.005  # 0.5% take profit
 INITIAL_BALANCE_USDT = 10000 # Solde de départ fictif pour le backtest
 POSITION_SIZING_PCT = 0.01 # 1% du capital pour chaque trade
 
+# --- Paramètres de simulation des sorties ---
+# False : SL/TP vérifiés sur la clôture de chaque bougie (comportement historique)
+# True : SL/TP vérifiés sur le low/high de chaque bougie, sortie au niveau touché
+INTRABAR_EXITS = False
+RESOLVER_BLOCK_SIZE = 16 # Taille du premier bloc examiné par resolve_exit (doublée ensuite)
+
+# --- Journal des événements du backtest ---
+# Niveaux de journalisation :
+#   'silent'  : aucun message, aucun fichier (balayages de paramètres)
+#   'summary' : uniquement le bilan de fin de backtest
+#   'trades'  : bilan + chaque ouverture/fermeture/signal ignoré, mis en mémoire tampon
+#               puis écrits en bloc (CSV ou Parquet, ou console si aucun fichier)
+JOURNAL_SILENT = 'silent'
+JOURNAL_SUMMARY = 'summary'
+JOURNAL_TRADES = 'trades'
+JOURNAL_LEVEL = JOURNAL_SUMMARY
+JOURNAL_FILE = None # Ex: "backtest_journal.csv" ou "backtest_journal.parquet" (niveau 'trades')
+JOURNAL_FLUSH_THRESHOLD = 100000 # Nombre d'événements en mémoire avant écriture
+
+JOURNAL_COLUMNS = ['time', 'event', 'type', 'price', 'amount_btc', 'stop_loss', 'take_profit',
+                   'profit_usd', 'balance_usdt', 'balance_btc']
+
+
+def write_log(message):
+    """Écrit un message horodaté dans la console."""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[{timestamp}] {message}")
+
+
+class BacktestJournal:
+    """
+    Journal des événements de trading d'un backtest.
+    Au niveau 'trades', record() se contente d'ajouter un tuple à un tampon : le formatage
+    et l'écriture n'ont lieu qu'au flush (seuil atteint ou fin du backtest).
+    """
+
+    def __init__(self, level=None, path=None, flush_threshold=None, time_dtype='datetime64[ns]'):
+        self.level = JOURNAL_LEVEL if level is None else level
+        if self.level not in (JOURNAL_SILENT, JOURNAL_SUMMARY, JOURNAL_TRADES):
+            raise ValueError(f"Niveau de journal inconnu: {self.level}")
+        self.path = JOURNAL_FILE if path is None else path
+        self.flush_threshold = JOURNAL_FLUSH_THRESHOLD if flush_threshold is None else flush_threshold
+        self.time_dtype = np.dtype(time_dtype)
+        self.records_trades = self.level == JOURNAL_TRADES
+        self._buffer = []
+        self._parts_written = 0
+        self.events_written = 0
+
+    def record(self, timestamp, event, position_type, price, amount_btc, stop_loss, take_profit,
+               profit_usd, balance_usdt, balance_btc):
+        """Ajoute un événement au tampon (timestamp int64 dans l'unité de time_dtype)."""
+        self._buffer.append((timestamp, event, position_type, price, amount_btc, stop_loss, take_profit,
+                             profit_usd, balance_usdt, balance_btc))
+        if len(self._buffer) >= self.flush_threshold:
+            self.flush()
+
+    def summary(self, message):
+        """Message du bilan de fin de backtest (ignoré en mode silencieux)."""
+        if self.level != JOURNAL_SILENT:
+            write_log(message)
+
+    def flush(self):
+        """Écrit en bloc les événements en attente puis vide le tampon."""
+        if not self._buffer:
+            return
+        events = pd.DataFrame.from_records(self._buffer, columns=JOURNAL_COLUMNS)
+        events['time'] = events['time'].to_numpy(dtype=np.int64).view(self.time_dtype)
+        self._buffer = []
+        if not self.path:
+            print('\n'.join(self._format_lines(events)))
+        elif self.path.endswith('.parquet'):
+            # Un fichier Parquet ne s'étend pas : chaque flush écrit une partie numérotée
+            base, extension = os.path.splitext(self.path)
+            part_path = self.path if self._parts_written == 0 else f"{base}.part{self._parts_written}{extension}"
+            try:
+                events.to_parquet(part_path, index=False)
+            except ImportError as e:
+                write_log(f"Erreur: Parquet indisponible ({e}). Journal écrit en CSV à la place.")
+                self.path = base + '.csv'
+                events.to_csv(self.path, mode='a', header=self.events_written == 0, index=False)
+            self._parts_written += 1
+        else:
+            events.to_csv(self.path, mode='a', header=self.events_written == 0, index=False)
+        self.events_written += len(events)
+
+    def close(self):
+        """Vide le tampon en fin de backtest."""
+        self.flush()
+        if self.path and self.events_written:
+            self.summary(f"Journal des trades ({self.events_written} événements) écrit dans {self.path}")
+
+    @staticmethod
+    def _format_lines(events):
+        """Messages lisibles (mêmes libellés que l'ancien log par événement) pour l'affichage console."""
+        lines = []
+        for row in events.itertuples(index=False):
+            if row.event == 'open':
+                action = 'BUY signal. Opened LONG' if row.type == 'long' else 'SELL signal. Opened SHORT'
+                lines.append(f"[{row.time}] {action} {row.amount_btc:.6f} BTC at {row.price:.2f}. SL: {row.stop_loss:.2f}, TP: {row.take_profit:.2f}. Balance: {row.balance_usdt:.2f} USDT")
+            elif row.event == 'ignored':
+                if row.type == 'long':
+                    lines.append(f"[{row.time}] BUY signal ignored: Insufficient USDT balance ({row.balance_usdt:.2f}) to open position.")
+                else:
+                    lines.append(f"[{row.time}] SELL signal ignored: Insufficient BTC balance ({row.balance_btc:.6f}) to open short position or size too small.")
+            elif row.event == 'closed_end_of_test':
+                lines.append(f"Position ouverte fermée à la fin du backtest: {row.type} pour {row.profit_usd:.2f} USDT.")
+            else:
+                label = 'SL' if row.event == 'closed_sl' else 'TP'
+                if row.type == 'long':
+                    lines.append(f"[{row.time}] {label} LONG hit. Sold {row.amount_btc:.6f} BTC at {row.price:.2f}. Profit: {row.profit_usd:.2f} USDT. Balance: {row.balance_usdt:.2f} USDT")
+                else:
+                    lines.append(f"[{row.time}] {label} SHORT hit. Bought {row.amount_btc:.6f} BTC at {row.price:.2f}. Profit: {row.profit_usd:.2f} USDT. Balance: {row.balance_usdt:.2f} USDT")
+        return lines
+
 # --- Fonction pour charger les données historiques ---
-def load_historical_data(filename):
-    """Charge les données OHLCV depuis un fichier CSV."""
+def load_historical_data(filename=None, symbol='BTCUSDT', timeframe='1m', start_date=None, end_date=None,
+                         store_dir=ohlcv_store.STORE_DIR):
+    """
+    Charge les données OHLCV depuis un fichier CSV, ou, sans nom de fichier, depuis le stockage
+    partitionné de data_downloader.py (seuls les jours de [start_date, end_date] sont lus).
+    Un timeframe absent du stockage (5m, 15m, 1h...) est dérivé des bougies 1m (voir resampler).
+    """
+    if filename is None:
+        try:
+            store = resampler.store_for_timeframe(ohlcv_store.OHLCVStore(store_dir), symbol, timeframe, start_date, end_date)
+            df = store.query(symbol, timeframe, start_date, end_date)
+            if df.empty:
+                print(f"Erreur: Aucune donnée {symbol} {timeframe} dans le stockage '{store_dir}'. Lancez data_downloader.py d'abord.")
+                return df
+            print(f"Données historiques chargées depuis le stockage '{store_dir}'. Nombre de bougies : {len(df)}")
+            print(f"Période : {df['timestamp'].iloc[0]} à {df['timestamp'].iloc[-1]}")
+            return df
+        except Exception as e:
+            print(f"Erreur lors du chargement des données depuis le stockage '{store_dir}': {e}")
+            return pd.DataFrame()
     try:
         df = pd.read_csv(filename)
         df['timestamp'] = pd.to_datetime(df['timestamp'])
@@ -29,6 +169,53 @@ def load_historical_data(filename):
         print(f"Erreur lors du chargement ou du traitement du fichier CSV: {e}")
         return pd.DataFrame()
 
+def load_mapped_data(symbol='BTCUSDT', timeframe='1m', start_date=None, end_date=None,
+                     store_dir=ohlcv_store.STORE_DIR):
+    """
+    Ouvre les données du stockage partitionné en mémoire mappée (voir OHLCVStore.open_range) :
+    dictionnaire de vues NumPy en lecture seule, sans copie, à passer à run_backtest. None en cas d'erreur.
+    Comme pour load_historical_data, un timeframe supérieur à 1m peut être dérivé des bougies 1m.
+    """
+    try:
+        store = resampler.store_for_timeframe(ohlcv_store.OHLCVStore(store_dir), symbol, timeframe, start_date, end_date)
+        data = store.open_range(symbol, timeframe, start_date, end_date)
+        times = data['timestamp'].view('datetime64[ns]')
+        print(f"Données historiques mappées depuis le stockage '{store_dir}'. Nombre de bougies : {len(times)}")
+        print(f"Période : {pd.Timestamp(times[0])} à {pd.Timestamp(times[-1])}")
+        return data
+    except Exception as e:
+        print(f"Erreur lors de l'ouverture des données depuis le stockage '{store_dir}': {e}")
+        return None
+
+# --- Lecture des fichiers journaliers de klines (un fichier Binance brut par jour) ---
+DAILY_DATA_DIR = "temp_data"
+KLINE_COLUMNS = kline_parser.KLINE_COLUMNS
+
+def list_daily_kline_files(data_dir=DAILY_DATA_DIR, symbol='BTCUSDT', timeframe='1m', start_date=None, end_date=None):
+    """
+    Liste les fichiers journaliers {symbol}-{timeframe}-YYYY-MM-DD.csv de data_dir dans l'ordre
+    chronologique, limités à [start_date, end_date] (format 'YYYY-MM-DD', bornes incluses).
+    """
+    prefix = f"{symbol.replace('/', '')}-{timeframe}-"
+    daily_files = []
+    for name in os.listdir(data_dir):
+        day = name[len(prefix):-len('.csv')]
+        if not (name.startswith(prefix) and name.endswith('.csv')) or len(day) != len('YYYY-MM-DD'):
+            continue
+        if (start_date and day < start_date) or (end_date and day > end_date):
+            continue
+        daily_files.append((day, os.path.join(data_dir, name)))
+    return [path for _, path in sorted(daily_files)]
+
+def read_daily_klines(path):
+    """Lit un fichier de klines Binance brut (sans en-tête). Les temps sont en ms ou en µs selon les fichiers."""
+    return kline_parser.parse_klines(path)
+
+def iter_daily_klines(data_dir=DAILY_DATA_DIR, symbol='BTCUSDT', timeframe='1m', start_date=None, end_date=None):
+    """Itère sur les DataFrames journaliers, un fichier à la fois (mémoire constante)."""
+    for path in list_daily_kline_files(data_dir, symbol, timeframe, start_date, end_date):
+        yield read_daily_klines(path)
+
 # --- Fonctions d'indicateurs (copiées de votre bot) ---
 def calculate_moving_averages(df):
     """Calcule les moyennes mobiles simples."""
@@ -62,212 +249,439 @@ def check_signals(df_slice, last_signal):
         return 'sell'
     return None
 
+# Codes de signal stockés dans la colonne 'signal' (int8) calculée par compute_signals
+SIGNAL_NONE = 0
+SIGNAL_BUY = 1
+SIGNAL_SELL = -1
+# Écart relatif sous lequel SMA courte et longue sont égales. Deux moyennes vraiment égales
+# sortent de pandas.rolling().mean() ou de SMACache avec un bruit d'arrondi de quelques 1e-15
+# en relatif, alors que deux moyennes distinctes de prix au centime diffèrent d'au moins
+# 0.01 / (short_window * long_window), soit 1e-11 en relatif pour deux fenêtres de 100 bougies
+# à 100 000 USDT. Avec ce seuil, une égalité donne le même signal quel que soit le calcul des
+# SMA, comme dans scalping_bot où les sommes exactes (Fraction) donnent des moyennes égales.
+SMA_TIE_RTOL = 1e-13
+
+def crossover_signals(sma_short, sma_long, start):
+    """
+    Calcule le tableau de signaux (int8) à partir des SMA courte et longue.
+    Le signal de la bougie i reprend la règle de check_signals sur les bougies i-1 et i, les
+    deux SMA étant considérées égales quand leur écart est sous SMA_TIE_RTOL (voir ci-dessus).
+    Les bougies avant `start` (fenêtres incomplètes) n'ont jamais de signal.
+    """
+    diff = np.asarray(sma_short, dtype=np.float64) - np.asarray(sma_long, dtype=np.float64)
+    tie = np.abs(diff) <= SMA_TIE_RTOL * np.abs(sma_long)
+    above = (diff > 0) & ~tie
+    below = (diff < 0) & ~tie
+    prev_above = np.roll(above, 1)
+    prev_below = np.roll(below, 1)
+
+    # Signal d'achat (croisement haussier) / de vente (croisement baissier)
+    buy = above & ~prev_above
+    sell = below & ~prev_below
+
+    signal = np.full(len(sma_short), SIGNAL_NONE, dtype=np.int8)
+    signal[buy] = SIGNAL_BUY
+    signal[sell] = SIGNAL_SELL
+    signal[:start] = SIGNAL_NONE
+    return signal
+
+def compute_signals(df, short_window=None, long_window=None):
+    """
+    Calcule en une seule passe vectorisée SMA_short, SMA_long et la colonne 'signal'
+    sur tout le DataFrame (au lieu de recalculer les SMA sur une tranche à chaque bougie).
+    Par défaut les fenêtres sont SHORT_WINDOW et LONG_WINDOW.
+    Retourne un nouveau DataFrame avec ces trois colonnes : `df` n'est pas modifié.
+    """
+    short_window = SHORT_WINDOW if short_window is None else short_window
+    long_window = LONG_WINDOW if long_window is None else long_window
+
+    sma_short = df['close'].rolling(window=short_window, min_periods=1).mean()
+    sma_long = df['close'].rolling(window=long_window, min_periods=1).mean()
+
+    # Le backtest ne regarde les signaux qu'à partir de long_window (fenêtres complètes)
+    signals = crossover_signals(sma_short.to_numpy(dtype=np.float64), sma_long.to_numpy(dtype=np.float64), long_window)
+    return df.assign(SMA_short=sma_short, SMA_long=sma_long, signal=signals)
+
 # --- Fonctions de gestion de position (simplifiées pour le backtesting) ---
 # Dans le backtesting, nous ne plaçons pas d'ordres réels, nous simulons juste.
 
 # Structure pour suivre les trades dans le backtest
-# Chaque trade sera un dictionnaire:
+# Chaque trade fermé est une ligne du DataFrame retourné par run_backtest:
 # {'id': unique_id, 'type': 'long'/'short', 'entry_time': datetime, 'entry_price': float, 
 #  'amount_btc': float, 'stop_loss': float, 'take_profit': float, 'exit_time': datetime, 
 #  'exit_price': float, 'profit_usd': float, 'status': 'open'/'closed_sl'/'closed_tp'}
+TRADE_COLUMNS = ['id', 'type', 'entry_time', 'entry_price', 'amount_btc', 'stop_loss',
+                 'take_profit', 'status', 'exit_price', 'profit_usd', 'exit_time']
 backtest_trades = []
 current_open_position = None # Pour simuler une seule position ouverte à la fois
 
 
-def run_backtest(df):
+class BacktestPosition:
+    """Position ouverte du backtest (enregistrement compact, sans dictionnaire)."""
+    __slots__ = ('id', 'type', 'entry_time', 'entry_price', 'amount_btc', 'stop_loss', 'take_profit')
+
+    def __init__(self, id, type, entry_time, entry_price, amount_btc, stop_loss, take_profit):
+        self.id = id
+        self.type = type
+        self.entry_time = entry_time # Timestamp int64 (même unité que la colonne 'timestamp')
+        self.entry_price = entry_price
+        self.amount_btc = amount_btc
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class BacktestState:
     """
-    Exécute le backtest sur les données historiques.
+    État du backtest conservé entre les bougies : soldes, position ouverte et trades fermés,
+    ainsi que les paramètres de risque du run (par défaut ceux du module).
     """
-    global backtest_trades, current_open_position
-    
-    backtest_trades = [] # Réinitialiser les trades pour chaque run
-    current_open_position = None # Aucune position ouverte au début
-    
-    current_balance_usdt = INITIAL_BALANCE_USDT
-    current_balance_btc = 0 # On commence sans BTC, juste USDT pour acheter
-
-    write_log(f"Démarrage du backtest avec solde initial : {current_balance_usdt:.2f} USDT")
-
-    # Itérer sur chaque bougie du DataFrame
-    # Nous commençons à LONG_WINDOW pour avoir suffisamment de données pour les SMA
-    for i in range(LONG_WINDOW, len(df)):
-        # Simulateurs de temps pour le log
-        current_time = df['timestamp'].iloc[i]
-        current_price = df['close'].iloc[i]
-
-        # Récupérer la tranche de données nécessaire pour le calcul des indicateurs
-        # Il faut au moins LONG_WINDOW bougies pour calculer la SMA_long correctement
-        df_slice_for_signal = df.iloc[i-LONG_WINDOW:i+1].copy() # Copie pour éviter SettingWithCopyWarning
-        df_slice_for_signal = calculate_moving_averages(df_slice_for_signal)
-        
-        # Le signal est basé sur le croisement de la bougie précédente et actuelle
-        signal = check_signals(df_slice_for_signal, None) # last_signal n'est pas utile ici car on simule pas à pas
+    __slots__ = ('balance_usdt', 'balance_btc', 'position', 'trades', 'ambiguous_exits',
+                 'stop_loss_pct', 'take_profit_pct', 'position_sizing_pct', 'journal')
+
+    def __init__(self, balance_usdt=INITIAL_BALANCE_USDT, stop_loss_pct=None, take_profit_pct=None,
+                 position_sizing_pct=None, journal=None):
+        self.stop_loss_pct = STOP_LOSS_PCT if stop_loss_pct is None else stop_loss_pct
+        self.take_profit_pct = TAKE_PROFIT_PCT if take_profit_pct is None else take_profit_pct
+        self.position_sizing_pct = POSITION_SIZING_PCT if position_sizing_pct is None else position_sizing_pct
+        # Journal des événements (None : aucun, pour les runs en masse comme les balayages de paramètres)
+        self.journal = journal if journal is not None and journal.records_trades else None
+        self.balance_usdt = balance_usdt
+        self.balance_btc = 0 # On commence sans BTC, juste USDT pour acheter
+        self.position = None # Une seule position ouverte à la fois
+        self.trades = [] # Tuples dans l'ordre de TRADE_COLUMNS
+        self.ambiguous_exits = 0 # Sorties intrabar où SL et TP étaient dans la même bougie
+
+    def close_position(self, exit_time, exit_price, status):
+        """Ferme la position ouverte au prix donné et enregistre le trade."""
+        position = self.position
+        if position.type == 'long': # Vente des BTC
+            profit = (exit_price - position.entry_price) * position.amount_btc
+            self.balance_usdt += position.amount_btc * exit_price
+            self.balance_btc -= position.amount_btc
+        else: # Rachat des BTC pour couvrir le short
+            profit = (position.entry_price - exit_price) * position.amount_btc
+            self.balance_btc += position.amount_btc
+            self.balance_usdt -= position.amount_btc * exit_price
+        self.trades.append((position.id, position.type, position.entry_time, position.entry_price,
+                            position.amount_btc, position.stop_loss, position.take_profit,
+                            status, exit_price, profit, exit_time))
+        self.position = None
+        if self.journal is not None:
+            self.journal.record(exit_time, status, position.type, exit_price, position.amount_btc,
+                                position.stop_loss, position.take_profit, profit,
+                                self.balance_usdt, self.balance_btc)
+        return profit
+
+
+def resolve_exit(start, is_long, stop_loss, take_profit, low, high, open_=None, close=None,
+                 intrabar=False, block_size=RESOLVER_BLOCK_SIZE):
+    """
+    Cherche directement la première bougie >= start dont le low/high franchit le SL ou le TP,
+    par blocs vectorisés de taille croissante (sans parcourir toute la fin de la série).
+
+    En mode clôture (intrabar=False), low et high sont le tableau des clôtures et la sortie
+    se fait au prix de clôture, comme le backtest historique.
+    En mode intrabar, la sortie se fait au niveau SL/TP (ou à l'ouverture si elle l'a déjà dépassé).
+    Si SL et TP sont tous deux dans la même bougie, l'ordre est déduit de sa direction
+    (haussière : open -> low -> high, baissière : open -> high -> low) et la sortie est marquée ambiguë.
+
+    Retourne (index, status, exit_price, ambiguous), ou None si aucun niveau n'est atteint.
+    """
+    n = len(low)
+    block_start = start
+    size = block_size
+    while block_start < n:
+        block_end = min(block_start + size, n)
+        if is_long:
+            sl_hit = low[block_start:block_end] <= stop_loss
+            tp_hit = high[block_start:block_end] >= take_profit
+        else:
+            sl_hit = high[block_start:block_end] >= stop_loss
+            tp_hit = low[block_start:block_end] <= take_profit
+        hit = sl_hit | tp_hit
+        j = int(hit.argmax())
+        if hit[j]:
+            i = block_start + j
+            if not intrabar:
+                return i, 'closed_sl' if sl_hit[j] else 'closed_tp', close[i], False
+            return _resolve_intrabar(i, is_long, stop_loss, take_profit, bool(sl_hit[j]), bool(tp_hit[j]), open_, close)
+        block_start = block_end
+        size *= 2 # Les positions se ferment en général en quelques bougies : on élargit ensuite
+    return None
+
+
+def _resolve_intrabar(i, is_long, stop_loss, take_profit, sl_hit, tp_hit, open_, close):
+    """Détermine le niveau touché en premier dans la bougie i et son prix d'exécution."""
+    bar_open = open_[i]
+    # Ouverture déjà au-delà d'un niveau (gap) : exécution immédiate au prix d'ouverture
+    if is_long:
+        if bar_open <= stop_loss:
+            return i, 'closed_sl', bar_open, False
+        if bar_open >= take_profit:
+            return i, 'closed_tp', bar_open, False
+    else:
+        if bar_open >= stop_loss:
+            return i, 'closed_sl', bar_open, False
+        if bar_open <= take_profit:
+            return i, 'closed_tp', bar_open, False
+
+    ambiguous = sl_hit and tp_hit
+    if ambiguous:
+        bullish_bar = close[i] >= bar_open
+        # Long : le low (SL) est touché avant le high (TP) dans une bougie haussière. Inversement pour un short.
+        sl_first = bullish_bar if is_long else not bullish_bar
+    else:
+        sl_first = sl_hit
+    if sl_first:
+        return i, 'closed_sl', stop_loss, ambiguous
+    return i, 'closed_tp', take_profit, ambiguous
 
-        # --- Gestion des positions ouvertes (SL/TP) ---
-        if current_open_position:
-            position = current_open_position
-            
-            if position['type'] == 'long': # Position d'achat (On possède du BTC, on veut vendre plus haut)
-                if current_price <= position['stop_loss']:
-                    profit = (current_price - position['entry_price']) * position['amount_btc']
-                    current_balance_usdt += position['amount_btc'] * current_price # Vente des BTC
-                    current_balance_btc -= position['amount_btc'] # Décrémente les BTC possédés
-                    
-                    position.update({
-                        'exit_price': current_price,
-                        'profit_usd': profit,
-                        'exit_time': current_time,
-                        'status': 'closed_sl'
-                    })
-                    backtest_trades.append(position)
-                    write_log(f"[{current_time}] SL LONG hit. Sold {position['amount_btc']:.6f} BTC at {current_price:.2f}. Profit: {profit:.2f} USDT. Balance: {current_balance_usdt:.2f} USDT")
-                    current_open_position = None # Ferme la position
-                elif current_price >= position['take_profit']:
-                    profit = (current_price - position['entry_price']) * position['amount_btc']
-                    current_balance_usdt += position['amount_btc'] * current_price # Vente des BTC
-                    current_balance_btc -= position['amount_btc'] # Décrémente les BTC possédés
-                    
-                    position.update({
-                        'exit_price': current_price,
-                        'profit_usd': profit,
-                        'exit_time': current_time,
-                        'status': 'closed_tp'
-                    })
-                    backtest_trades.append(position)
-                    write_log(f"[{current_time}] TP LONG hit. Sold {position['amount_btc']:.6f} BTC at {current_price:.2f}. Profit: {profit:.2f} USDT. Balance: {current_balance_usdt:.2f} USDT")
-                    current_open_position = None # Ferme la position
-            
-            elif position['type'] == 'short': # Position de vente (On possède des USDT, on veut racheter BTC moins cher)
-                # Note: Dans un backtest SPOT, un "short" signifie qu'on a vendu BTC au début
-                # et on attend de le racheter. Le profit est basé sur la différence de prix.
-                # Conceptuellement, on a converti les BTC en USDT, et on attend de les re-convertir.
-                
-                if current_price >= position['stop_loss']:
-                    profit = (position['entry_price'] - current_price) * position['amount_btc']
-                    current_balance_btc += position['amount_btc'] # On rachète le BTC pour couvrir
-                    current_balance_usdt -= position['amount_btc'] * current_price # Coût du rachat en USDT
-                    
-                    position.update({
-                        'exit_price': current_price,
-                        'profit_usd': profit,
-                        'exit_time': current_time,
-                        'status': 'closed_sl'
-                    })
-                    backtest_trades.append(position)
-                    write_log(f"[{current_time}] SL SHORT hit. Bought {position['amount_btc']:.6f} BTC at {current_price:.2f}. Profit: {profit:.2f} USDT. Balance: {current_balance_usdt:.2f} USDT")
-                    current_open_position = None
-                elif current_price <= position['take_profit']:
-                    profit = (position['entry_price'] - current_price) * position['amount_btc']
-                    current_balance_btc += position['amount_btc'] # On rachète le BTC pour couvrir
-                    current_balance_usdt -= position['amount_btc'] * current_price # Coût du rachat en USDT
-                    
-                    position.update({
-                        'exit_price': current_price,
-                        'profit_usd': profit,
-                        'exit_time': current_time,
-                        'status': 'closed_tp'
-                    })
-                    backtest_trades.append(position)
-                    write_log(f"[{current_time}] TP SHORT hit. Bought {position['amount_btc']:.6f} BTC at {current_price:.2f}. Profit: {profit:.2f} USDT. Balance: {current_balance_usdt:.2f} USDT")
-                    current_open_position = None
+
+def simulate_bars(state, timestamps, close, signals, start,
+                  open_=None, high=None, low=None, intrabar=INTRABAR_EXITS):
+    """
+    Coeur d'exécution du backtest sur des tableaux NumPy simples :
+    timestamps (int64), close/open/high/low (float64) et signals (int8, voir compute_signals).
+    Traite les bougies [start, len(close)) et met à jour `state` sur place.
+    Le coût est proportionnel au nombre de trades : on saute au prochain signal quand aucune
+    position n'est ouverte, et directement à la bougie de sortie (resolve_exit) sinon.
+    """
+    if not intrabar:
+        # Mode clôture : SL/TP comparés aux clôtures uniquement
+        low = high = close
+    signal_bars = (np.flatnonzero(signals[start:]) + start).tolist()
+    n = len(close)
+
+    i = start
+    k = 0 # Index du prochain signal dans signal_bars
+    while i < n:
+        # --- Gestion de la position ouverte (SL/TP) ---
+        position = state.position
+        if position is not None:
+            is_long = position.type == 'long'
+            exit = resolve_exit(i, is_long, position.stop_loss, position.take_profit,
+                                low, high, open_, close, intrabar)
+            if exit is None:
+                break # Position toujours ouverte à la fin des données
+            i, status, exit_price, ambiguous = exit
+            exit_price = float(exit_price)
+            if ambiguous:
+                state.ambiguous_exits += 1
+            state.close_position(int(timestamps[i]), exit_price, status)
+            # La bougie de fermeture peut aussi ouvrir une nouvelle position (voir ci-dessous)
+        else:
+            # --- Aucune position : sauter directement au prochain signal ---
+            k = bisect.bisect_left(signal_bars, i, k)
+            if k == len(signal_bars):
+                break
+            i = signal_bars[k]
 
         # --- Décider d'ouvrir une nouvelle position ---
-        if not current_open_position: # Seulement si aucune position n'est ouverte
-            if signal == 'buy':
-                # Calcul de la taille de la position en BTC
-                amount_usdt_to_risk = current_balance_usdt * POSITION_SIZING_PCT
-                amount_btc_to_buy = amount_usdt_to_risk / current_price
-                
-                # Assurez-vous que nous avons assez d'USDT pour l'achat
-                if current_balance_usdt >= amount_usdt_to_risk:
-                    stop_loss = current_price * (1 - STOP_LOSS_PCT)
-                    take_profit = current_price * (1 + TAKE_PROFIT_PCT)
-                    
-                    current_open_position = {
-                        'id': len(backtest_trades) + 1, # ID simple pour le backtest
-                        'type': 'long',
-                        'entry_time': current_time,
-                        'entry_price': current_price,
-                        'amount_btc': amount_btc_to_buy,
-                        'stop_loss': stop_loss,
-                        'take_profit': take_profit,
-                        'status': 'open'
-                    }
-                    current_balance_usdt -= amount_usdt_to_risk # Déduction du solde USDT
-                    current_balance_btc += amount_btc_to_buy # Augmentation des BTC possédés
-                    write_log(f"[{current_time}] BUY signal. Opened LONG {amount_btc_to_buy:.6f} BTC at {current_price:.2f}. SL: {stop_loss:.2f}, TP: {take_profit:.2f}. Balance: {current_balance_usdt:.2f} USDT")
-                else:
-                    write_log(f"[{current_time}] BUY signal ignored: Insufficient USDT balance ({current_balance_usdt:.2f}) to open position.")
-
-            elif signal == 'sell':
-                # Pour un "short" en backtest spot, on simule une vente de BTC qu'on a déjà
-                # et on gagne si le prix baisse. Cela signifie qu'on simule avoir des BTC virtuels
-                # pour les vendre, puis les racheter.
-                
-                # Taille de la position en BTC à "vendre" (en assumant qu'on a le BTC)
-                amount_btc_to_sell = current_balance_btc * POSITION_SIZING_PCT
-                
-                # Simplification: on suppose qu'on a toujours assez de BTC pour "short" avec un certain % du capital BTC
-                # (Dans un vrai short, on emprunterait les BTC)
-                if current_balance_btc >= amount_btc_to_sell and amount_btc_to_sell > 0: # S'assurer d'avoir des BTC pour vendre
-                    stop_loss = current_price * (1 + STOP_LOSS_PCT)
-                    take_profit = current_price * (1 - TAKE_PROFIT_PCT)
-                    
-                    current_open_position = {
-                        'id': len(backtest_trades) + 1,
-                        'type': 'short',
-                        'entry_time': current_time,
-                        'entry_price': current_price,
-                        'amount_btc': amount_btc_to_sell,
-                        'stop_loss': stop_loss,
-                        'take_profit': take_profit,
-                        'status': 'open'
-                    }
-                    current_balance_usdt += amount_btc_to_sell * current_price # Ajout USDT de la vente
-                    current_balance_btc -= amount_btc_to_sell # Déduction BTC "vendus"
-                    write_log(f"[{current_time}] SELL signal. Opened SHORT {amount_btc_to_sell:.6f} BTC at {current_price:.2f}. SL: {stop_loss:.2f}, TP: {take_profit:.2f}. Balance: {current_balance_usdt:.2f} USDT")
-                else:
-                    write_log(f"[{current_time}] SELL signal ignored: Insufficient BTC balance ({current_balance_btc:.6f}) to open short position or size too small.")
+        signal = signals[i]
+        if signal != SIGNAL_NONE:
+            _open_position(state, signal, int(timestamps[i]), float(close[i]))
+        i += 1
 
 
-    # --- Fin du Backtest : Calcul des métriques de performance ---
-    write_log("\n--- Backtest terminé ---")
-    
-    # Traiter toute position encore ouverte à la fin du backtest
-    if current_open_position:
-        position = current_open_position
-        # Fermer la position au dernier prix du dataset (simule une fermeture manuelle)
-        last_price = df['close'].iloc[-1]
+def _open_position(state, signal, timestamp, current_price):
+    """Ouvre une position long ou short selon le signal, si les soldes le permettent."""
+    if signal == SIGNAL_BUY:
+        # Calcul de la taille de la position en BTC
+        amount_usdt_to_risk = state.balance_usdt * state.position_sizing_pct
+        amount_btc_to_buy = amount_usdt_to_risk / current_price
         
-        if position['type'] == 'long':
-            profit = (last_price - position['entry_price']) * position['amount_btc']
-            current_balance_usdt += position['amount_btc'] * last_price
-            current_balance_btc -= position['amount_btc']
-        elif position['type'] == 'short':
-            profit = (position['entry_price'] - last_price) * position['amount_btc']
-            current_balance_btc += position['amount_btc']
-            current_balance_usdt -= position['amount_btc'] * last_price
-            
-        position.update({
-            'exit_price': last_price,
-            'profit_usd': profit,
-            'exit_time': df['timestamp'].iloc[-1],
-            'status': 'closed_end_of_test'
-        })
-        backtest_trades.append(position)
-        write_log(f"Position ouverte fermée à la fin du backtest: {position['type']} pour {profit:.2f} USDT.")
-
-    final_total_usdt = current_balance_usdt + (current_balance_btc * df['close'].iloc[-1]) # Solde final converti en USDT
+        # Assurez-vous que nous avons assez d'USDT pour l'achat
+        if state.balance_usdt >= amount_usdt_to_risk:
+            stop_loss = current_price * (1 - state.stop_loss_pct)
+            take_profit = current_price * (1 + state.take_profit_pct)
+            state.position = BacktestPosition(len(state.trades) + 1, 'long', timestamp, current_price,
+                                              amount_btc_to_buy, stop_loss, take_profit)
+            state.balance_usdt -= amount_usdt_to_risk # Déduction du solde USDT
+            state.balance_btc += amount_btc_to_buy # Augmentation des BTC possédés
+            if state.journal is not None:
+                state.journal.record(timestamp, 'open', 'long', current_price, amount_btc_to_buy, stop_loss,
+                                     take_profit, 0.0, state.balance_usdt, state.balance_btc)
+        elif state.journal is not None:
+            state.journal.record(timestamp, 'ignored', 'long', current_price, amount_btc_to_buy, None, None,
+                                 0.0, state.balance_usdt, state.balance_btc)
+
+    elif signal == SIGNAL_SELL:
+        # Pour un "short" en backtest spot, on simule une vente de BTC qu'on a déjà
+        # et on gagne si le prix baisse.
+        amount_btc_to_sell = state.balance_btc * state.position_sizing_pct
+        
+        # Simplification: on suppose qu'on a toujours assez de BTC pour "short" avec un certain % du capital BTC
+        # (Dans un vrai short, on emprunterait les BTC)
+        if state.balance_btc >= amount_btc_to_sell and amount_btc_to_sell > 0: # S'assurer d'avoir des BTC pour vendre
+            stop_loss = current_price * (1 + state.stop_loss_pct)
+            take_profit = current_price * (1 - state.take_profit_pct)
+            state.position = BacktestPosition(len(state.trades) + 1, 'short', timestamp, current_price,
+                                              amount_btc_to_sell, stop_loss, take_profit)
+            state.balance_usdt += amount_btc_to_sell * current_price # Ajout USDT de la vente
+            state.balance_btc -= amount_btc_to_sell # Déduction BTC "vendus"
+            if state.journal is not None:
+                state.journal.record(timestamp, 'open', 'short', current_price, amount_btc_to_sell, stop_loss,
+                                     take_profit, 0.0, state.balance_usdt, state.balance_btc)
+        elif state.journal is not None:
+            state.journal.record(timestamp, 'ignored', 'short', current_price, amount_btc_to_sell, None, None,
+                                 0.0, state.balance_usdt, state.balance_btc)
+
+
+def trades_to_dataframe(trades, time_dtype):
+    """Construit le DataFrame des trades fermés à partir des tuples accumulés pendant la simulation."""
+    if not trades:
+        return pd.DataFrame()
+    df_trades = pd.DataFrame.from_records(trades, columns=TRADE_COLUMNS)
+    for column in ('entry_time', 'exit_time'):
+        df_trades[column] = df_trades[column].to_numpy(dtype=np.int64).view(time_dtype)
+    return df_trades
+
+
+def run_backtest(df, short_window=None, long_window=None, stop_loss_pct=None, take_profit_pct=None,
+                 position_sizing_pct=None, journal=None, timeframe=None):
+    """
+    Exécute le backtest sur les données historiques.
+    `df` est un DataFrame OHLCV, ou un dictionnaire de colonnes NumPy (timestamp en int64 ns),
+    par exemple les vues en mémoire mappée de load_mapped_data : elles sont alors utilisées
+    telles quelles, sans copie.
+    Si `timeframe` est fourni (ex: '15m'), les bougies 1m sont d'abord regroupées dans ce timeframe.
+    Les paramètres non fournis prennent la valeur des constantes du module.
+    `journal` est un BacktestJournal (par défaut : niveau JOURNAL_LEVEL, fichier JOURNAL_FILE).
+    """
+    short_window = SHORT_WINDOW if short_window is None else short_window
+    long_window = LONG_WINDOW if long_window is None else long_window
+    if journal is None:
+        journal = BacktestJournal()
+    if timeframe is not None and timeframe != resampler.BASE_TIMEFRAME:
+        if isinstance(df, pd.DataFrame):
+            df = resampler.resample_frame(df, timeframe)
+        else:
+            df = resampler.resample_arrays(df, resampler.check_timeframe(timeframe))
+
+    if isinstance(df, pd.DataFrame):
+        # Pré-calcul des SMA et des signaux sur toute la série (une seule passe vectorisée)
+        df = compute_signals(df, short_window, long_window)
+        # Colonnes en tableaux NumPy simples : plus aucune indexation pandas par bougie
+        time_values = df['timestamp'].to_numpy()
+        close = df['close'].to_numpy(dtype=np.float64)
+        signals = df['signal'].to_numpy()
+    else:
+        time_values = df['timestamp'].view('datetime64[ns]')
+        close = df['close']
+        sma_short = pd.Series(close, copy=False).rolling(window=short_window, min_periods=1).mean().to_numpy()
+        sma_long = pd.Series(close, copy=False).rolling(window=long_window, min_periods=1).mean().to_numpy()
+        signals = crossover_signals(sma_short, sma_long, long_window)
+    if INTRABAR_EXITS:
+        open_ = np.asarray(df['open'], dtype=np.float64)
+        high = np.asarray(df['high'], dtype=np.float64)
+        low = np.asarray(df['low'], dtype=np.float64)
+    else:
+        open_ = high = low = None
+    time_dtype = time_values.dtype
+    timestamps = time_values.view(np.int64)
+
+    journal.time_dtype = time_dtype
+    state = BacktestState(stop_loss_pct=stop_loss_pct, take_profit_pct=take_profit_pct,
+                          position_sizing_pct=position_sizing_pct, journal=journal)
+    journal.summary(f"Démarrage du backtest avec solde initial : {state.balance_usdt:.2f} USDT")
+
+    # Nous commençons à long_window pour avoir suffisamment de données pour les SMA
+    simulate_bars(state, timestamps, close, signals, long_window, open_, high, low, INTRABAR_EXITS)
+
+    return finish_backtest(state, journal, int(timestamps[-1]), float(close[-1]), time_dtype,
+                           bars=(timestamps, close, backtest_metrics.bars_per_year(time_values)))
+
+
+def run_backtest_streaming(chunks, short_window=None, long_window=None, stop_loss_pct=None,
+                           take_profit_pct=None, position_sizing_pct=None, journal=None):
+    """
+    Exécute le backtest morceau par morceau sur un itérable de DataFrames OHLCV chronologiques
+    (par exemple iter_daily_klines()). Seules les long_window dernières bougies et la position
+    ouverte sont conservées d'un morceau à l'autre : la mémoire ne dépend pas de la durée testée,
+    et les trades sont identiques à ceux de run_backtest sur les mêmes données.
+    """
+    long_window = LONG_WINDOW if long_window is None else long_window
+    if journal is None:
+        journal = BacktestJournal()
+    state = BacktestState(stop_loss_pct=stop_loss_pct, take_profit_pct=take_profit_pct,
+                          position_sizing_pct=position_sizing_pct, journal=journal)
+    journal.summary(f"Démarrage du backtest (streaming) avec solde initial : {state.balance_usdt:.2f} USDT")
+
+    history = None # Dernières bougies du morceau précédent, nécessaires aux SMA du morceau suivant
+    columns = ['timestamp', 'open', 'high', 'low', 'close'] if INTRABAR_EXITS else ['timestamp', 'close']
+    time_dtype = None
+    last_timestamp = last_price = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        chunk = chunk[columns]
+        if time_dtype is None:
+            time_dtype = chunk['timestamp'].dtype
+            journal.time_dtype = time_dtype
+        frame = chunk.reset_index(drop=True) if history is None else pd.concat([history, chunk], ignore_index=True)
+        first_new_bar = len(frame) - len(chunk)
+
+        # Tant que l'historique est incomplet, les indices locaux sont les indices globaux :
+        # compute_signals ignore donc bien les long_window premières bougies de la série
+        frame = compute_signals(frame, short_window, long_window)
+        timestamps = frame['timestamp'].to_numpy().view(np.int64)
+        close = frame['close'].to_numpy(dtype=np.float64)
+        if INTRABAR_EXITS:
+            open_ = frame['open'].to_numpy(dtype=np.float64)
+            high = frame['high'].to_numpy(dtype=np.float64)
+            low = frame['low'].to_numpy(dtype=np.float64)
+        else:
+            open_ = high = low = None
+        simulate_bars(state, timestamps, close, frame['signal'].to_numpy(), first_new_bar,
+                      open_, high, low, INTRABAR_EXITS)
+
+        history = frame[columns].iloc[-long_window:].reset_index(drop=True)
+        last_timestamp, last_price = int(timestamps[-1]), float(close[-1])
+
+    if last_timestamp is None:
+        journal.summary("Aucune donnée à backtester.")
+        return pd.DataFrame()
+    return finish_backtest(state, journal, last_timestamp, last_price, time_dtype)
+
+
+def finish_backtest(state, journal, last_timestamp, last_price, time_dtype, bars=None):
+    """
+    Clôture le backtest : ferme la position encore ouverte au dernier prix, écrit le bilan
+    et retourne le DataFrame des trades fermés.
+    `bars` = (timestamps, close, bougies_par_an) active les métriques sur la courbe d'équité
+    (drawdown, Sharpe, Sortino, exposition, durées des trades).
+    """
+    global backtest_trades, current_open_position
+
+    # Traiter toute position encore ouverte à la fin du backtest
+    # (fermée au dernier prix du dataset, simule une fermeture manuelle)
+    if state.position is not None:
+        state.close_position(last_timestamp, last_price, 'closed_end_of_test')
+    journal.close()
+
+    # --- Fin du Backtest : Calcul des métriques de performance ---
+    journal.summary("\n--- Backtest terminé ---")
+
+    final_total_usdt = state.balance_usdt + (state.balance_btc * last_price) # Solde final converti en USDT
     total_profit = final_total_usdt - INITIAL_BALANCE_USDT
     
-    write_log(f"Solde initial: {INITIAL_BALANCE_USDT:.2f} USDT")
-    write_log(f"Solde final (incluant BTC): {final_total_usdt:.2f} USDT")
-    write_log(f"Profit/Perte net: {total_profit:.2f} USDT ({((total_profit / INITIAL_BALANCE_USDT) * 100):.2f}%)")
-    write_log(f"Nombre total de trades fermés: {len(backtest_trades)}")
+    journal.summary(f"Solde initial: {INITIAL_BALANCE_USDT:.2f} USDT")
+    journal.summary(f"Solde final (incluant BTC): {final_total_usdt:.2f} USDT")
+    journal.summary(f"Profit/Perte net: {total_profit:.2f} USDT ({((total_profit / INITIAL_BALANCE_USDT) * 100):.2f}%)")
+    journal.summary(f"Nombre total de trades fermés: {len(state.trades)}")
+    if INTRABAR_EXITS:
+        journal.summary(f"Sorties ambiguës (SL et TP dans la même bougie): {state.ambiguous_exits}")
+
+    # Le DataFrame des trades n'est construit qu'une seule fois, à la fin
+    df_trades = trades_to_dataframe(state.trades, time_dtype)
+    backtest_trades = df_trades.to_dict('records')
+    current_open_position = None
 
     # Calcul des statistiques de performance
-    if backtest_trades:
-        df_trades = pd.DataFrame(backtest_trades)
+    if not df_trades.empty:
         wins = df_trades[df_trades['profit_usd'] > 0]
         losses = df_trades[df_trades['profit_usd'] < 0]
 
@@ -277,10 +691,10 @@ def run_backtest(df):
         total_profit_from_trades = wins['profit_usd'].sum()
         total_loss_from_trades = losses['profit_usd'].sum()
 
-        write_log(f"Trades gagnants: {win_count}")
-        write_log(f"Trades perdants: {loss_count}")
-        write_log(f"Profit total des gagnants: {total_profit_from_trades:.2f} USDT")
-        write_log(f"Perte totale des perdants: {total_loss_from_trades:.2f} USDT")
+        journal.summary(f"Trades gagnants: {win_count}")
+        journal.summary(f"Trades perdants: {loss_count}")
+        journal.summary(f"Profit total des gagnants: {total_profit_from_trades:.2f} USDT")
+        journal.summary(f"Perte totale des perdants: {total_loss_from_trades:.2f} USDT")
 
         if loss_count > 0:
             win_rate = (win_count / (win_count + loss_count)) * 100
@@ -288,44 +702,52 @@ def run_backtest(df):
             avg_loss = losses['profit_usd'].mean() if loss_count > 0 else 0
             risk_reward_ratio = abs(avg_win / avg_loss) if avg_loss != 0 else float('inf')
             
-            write_log(f"Taux de victoire: {win_rate:.2f}%")
-            write_log(f"Gain moyen par trade gagnant: {avg_win:.2f} USDT")
-            write_log(f"Perte moyenne par trade perdant: {avg_loss:.2f} USDT")
-            write_log(f"Ratio Risque/Récompense (Moyenne): {risk_reward_ratio:.2f}")
+            journal.summary(f"Taux de victoire: {win_rate:.2f}%")
+            journal.summary(f"Gain moyen par trade gagnant: {avg_win:.2f} USDT")
+            journal.summary(f"Perte moyenne par trade perdant: {avg_loss:.2f} USDT")
+            journal.summary(f"Ratio Risque/Récompense (Moyenne): {risk_reward_ratio:.2f}")
         else:
-            write_log("Aucune perte enregistrée (peut-être pas assez de trades ou stratégie très efficace !)")
-            write_log("Taux de victoire: 100%")
-            write_log("Ratio Risque/Récompense: Infini")
+            journal.summary("Aucune perte enregistrée (peut-être pas assez de trades ou stratégie très efficace !)")
+            journal.summary("Taux de victoire: 100%")
+            journal.summary("Ratio Risque/Récompense: Infini")
+
+        if bars is not None:
+            timestamps, close, periods_per_year = bars
+            metrics = backtest_metrics.compute_metrics(timestamps, close, backtest_metrics.trade_arrays(state.trades),
+                                                       INITIAL_BALANCE_USDT, periods_per_year)
+            journal.summary(f"Drawdown maximal: {metrics['max_drawdown_usd']:.2f} USDT ({metrics['max_drawdown_pct']:.2f}%), durée max sous le plus-haut: {metrics['max_drawdown_duration_bars']} bougies")
+            journal.summary(f"Sharpe (annualisé): {metrics['sharpe']:.2f} | Sortino (annualisé): {metrics['sortino']:.2f}")
+            journal.summary(f"Exposition: {metrics['exposure_pct']:.2f}% des bougies | Profit factor: {metrics['profit_factor']:.2f}")
+            journal.summary(f"Durée moyenne d'un trade: {metrics['avg_trade_duration_bars']:.1f} bougies. Répartition:")
+            for line in backtest_metrics.format_duration_histogram(metrics):
+                journal.summary(line)
             
         # Potentiellement retourner le DataFrame des trades pour une analyse plus approfondie
         return df_trades
     else:
-        write_log("Aucun trade n'a été exécuté pendant le backtest.")
+        journal.summary("Aucun trade n'a été exécuté pendant le backtest.")
         return pd.DataFrame()
 
 
 # --- Exécution principale du backtester ---
 if __name__ == "__main__":
-    # Nom du fichier de données historiques que data_downloader.py va créer
-    # Assurez-vous que ce nom correspond à celui généré par data_downloader.py
-    # Vous devrez l'ajuster une fois le téléchargement terminé pour inclure les dates réelles du fichier
-    
-    # Pour le moment, utilisez un nom générique ou celui que vous attendez du téléchargeur
-    # Une fois le téléchargement terminé, copiez le nom exact du fichier CSV généré.
-    # Exemple (à ajuster) :
-    # historical_data_filename = "historical_data_BTCUSDT_1m_20220701_to_20250630.csv"
-    
-    # Pour trouver le nom de fichier généré par data_downloader.py :
-    # Regardez dans le dossier où vous exécutez data_downloader.py. 
-    # Le nom sera quelque chose comme : historical_data_BTCUSDT_1m_YYYYMMDD_to_YYYYMMDD.csv
-    # Où YYYYMMDD sont les dates de début et de fin réelles du téléchargement.
-
-    # TEMPORAIRE : Remplacez par le nom réel de votre fichier une fois téléchargé
-    historical_data_filename = "historical_data_BTCUSDT_1m_20220701_to_20250630.csv" # Mettez le nom réel ici !
+    # Les données téléchargées par data_downloader.py sont lues directement dans le stockage
+    # partitionné (dossier market_data). À défaut, on peut encore utiliser un ancien CSV fusionné
+    # ou les fichiers journaliers bruts de temp_data.
+    historical_data_filename = "historical_data_BTCUSDT_1m_20220701_to_20250630.csv" # Ancien CSV fusionné (facultatif)
 
-    # Vérifier si le fichier de données existe
-    if not os.path.exists(historical_data_filename):
-        print(f"ATTENTION: Le fichier de données historiques '{historical_data_filename}' n'existe pas. Veuillez le télécharger avec data_downloader.py d'abord, ou ajustez le nom du fichier.")
+    # Vérifier quelle source de données est disponible
+    if ohlcv_store.OHLCVStore().days('BTCUSDT', '1m'):
+        mapped_data = load_mapped_data()
+        if mapped_data is not None:
+            df_results = run_backtest(mapped_data)
+    elif not os.path.exists(historical_data_filename):
+        if os.path.isdir(DAILY_DATA_DIR) and list_daily_kline_files(DAILY_DATA_DIR):
+            # Pas de fichier fusionné : backtest en streaming directement sur les fichiers journaliers
+            print(f"Le fichier '{historical_data_filename}' n'existe pas. Backtest en streaming sur les fichiers journaliers de '{DAILY_DATA_DIR}'.")
+            df_results = run_backtest_streaming(iter_daily_klines(DAILY_DATA_DIR))
+        else:
+            print(f"ATTENTION: Le fichier de données historiques '{historical_data_filename}' n'existe pas. Veuillez le télécharger avec data_downloader.py d'abord, ou ajustez le nom du fichier.")
     else:
         df_data = load_historical_data(historical_data_filename)
         if not df_data.empty:
@@ -3,9 +3,28 @@ import requests
 import zipfile
 import io
 import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import time # Assurez-vous que time est importé
 
+import kline_parser
+import numpy as np
+from ohlcv_store import OHLCVStore, STORE_DIR, find_gaps, timeframe_to_nanoseconds
+
+# --- Configuration du téléchargement ---
+# L'URL de base peut être redirigée (variable d'environnement) vers un serveur local de test
+BINANCE_DATA_BASE_URL = os.getenv('BINANCE_DATA_BASE_URL', "https://data.binance.vision/data/spot/")
+MAX_IN_FLIGHT = 8 # Nombre maximal de téléchargements simultanés
+REQUESTS_PER_SECOND = 5 # Limite de politesse : nombre maximal de requêtes démarrées par seconde
+KLINE_FLOAT32 = False # OHLCV en float32 : deux fois moins de mémoire, précision suffisante pour des prix à 2 décimales
+VERIFY_CHECKSUMS = True # Vérifie le SHA-256 des archives quand Binance publie un fichier .CHECKSUM
+
+# --- Configuration de la synchronisation incrémentale ---
+# Les partitions journalières et leur manifeste sont gérés par ohlcv_store (dossier STORE_DIR)
+MANIFEST_SAVE_EVERY = 20 # Le manifeste est réécrit toutes les N partitions (et à la fin)
+
 def write_log(message):
     """Écrit un message horodaté dans la console."""
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -20,29 +39,74 @@ def get_binance_data_url(symbol, timeframe, date_type, date_str):
     # Exemple: https://data.binance.vision/data/spot/monthly/klines/BTCUSDT/1m/BTCUSDT-1m-2023-01.zip
     # Exemple: https://data.binance.vision/data/spot/daily/klines/BTCUSDT/1m/BTCUSDT-1m-2023-01-01.zip
     
-    base_url = "https://data.binance.vision/data/spot/"
+    base_url = BINANCE_DATA_BASE_URL
+    if not base_url.endswith('/'):
+        base_url += '/'
     return f"{base_url}{date_type}/klines/{symbol.replace('/', '')}/{timeframe}/{symbol.replace('/', '')}-{timeframe}-{date_str}.zip"
 
-def download_and_extract_zip(url, target_dir="temp_data"):
+class RateLimiter:
+    """Espace les débuts de requêtes d'au moins 1/requests_per_second secondes, entre tous les threads."""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        """Bloque jusqu'au prochain créneau libre."""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def create_session(pool_size=MAX_IN_FLIGHT):
+    """Session HTTP partagée : les connexions keep-alive sont réutilisées d'un fichier à l'autre."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def fetch_checksum(url, session=None, rate_limiter=None):
     """
-    Télécharge un fichier ZIP et extrait son contenu CSV.
-    Retourne le chemin du fichier CSV extrait.
+    Récupère le SHA-256 publié par Binance à côté de l'archive (fichier <url>.CHECKSUM,
+    au format 'sha256  nom.zip'). Retourne None si le fichier n'existe pas ou est illisible.
     """
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
+    try:
+        if rate_limiter is not None:
+            rate_limiter.wait()
+        response = (session or requests).get(url + '.CHECKSUM', timeout=30)
+        response.raise_for_status()
+        return response.text.split()[0].lower()
+    except (requests.exceptions.RequestException, IndexError) as e:
+        write_log(f"Avertissement: Pas de CHECKSUM exploitable pour {url} ({e}), archive non vérifiée.")
+        return None
 
+def download_zip(url, session=None, rate_limiter=None, verify_checksum=VERIFY_CHECKSUMS):
+    """
+    Télécharge un fichier ZIP et retourne son contenu (bytes), sans rien écrire sur le disque.
+    Si verify_checksum est vrai et qu'un .CHECKSUM est publié, le SHA-256 est calculé
+    sur ces mêmes octets et l'archive est rejetée en cas de différence.
+    `session` (requests.Session partagée) et `rate_limiter` sont optionnels.
+    """
     write_log(f"Tentative de téléchargement : {url}")
     try:
-        response = requests.get(url, stream=True, timeout=30) # Ajout d'un timeout
+        if rate_limiter is not None:
+            rate_limiter.wait()
+        response = (session or requests).get(url, timeout=30) # Ajout d'un timeout
         response.raise_for_status() # Lève une exception pour les codes d'erreur HTTP (4xx ou 5xx)
+        content = response.content
 
-        z = zipfile.ZipFile(io.BytesIO(response.content))
-        # Binance klines ZIPs usually contain a single CSV file
-        csv_filename = z.namelist()[0]
-        extracted_path = os.path.join(target_dir, csv_filename)
-        z.extractall(target_dir)
-        write_log(f"Extrait {csv_filename} dans {target_dir}")
-        return extracted_path
+        if verify_checksum:
+            expected = fetch_checksum(url, session, rate_limiter)
+            if expected is not None:
+                actual = hashlib.sha256(content).hexdigest()
+                if actual != expected:
+                    write_log(f"Erreur: SHA-256 invalide pour {url} (attendu {expected}, obtenu {actual}).")
+                    return None
+        return content
 
     except requests.exceptions.Timeout:
         write_log(f"Erreur: Timeout lors du téléchargement de {url}. Réessayez plus tard.")
@@ -54,66 +118,249 @@ def download_and_extract_zip(url, target_dir="temp_data"):
         else:
             write_log(f"Erreur de téléchargement depuis {url}: {e}")
         return None
+    except Exception as e:
+        write_log(f"Erreur inattendue lors du traitement de {url}: {e}")
+        return None
+
+def load_kline_csv(source):
+    """Lit un CSV de klines Binance (chemin ou fichier ouvert) et retourne les colonnes OHLCV, ou None en cas d'erreur."""
+    try:
+        # Lecture typée des 6 colonnes utiles ; l'unité des timestamps (ms ou µs) est détectée par fichier
+        return kline_parser.parse_klines(source, float32=KLINE_FLOAT32)
+    except Exception as e:
+        write_log(f"Erreur lors du traitement du CSV {getattr(source, 'name', source)}: {e}")
+        return None
+
+def read_kline_zip(content, url=''):
+    """Lit le CSV contenu dans une archive ZIP en mémoire (le membre est lu en flux, sans extraction)."""
+    try:
+        with zipfile.ZipFile(io.BytesIO(content)) as z:
+            # Binance klines ZIPs usually contain a single CSV file
+            csv_filename = z.namelist()[0]
+            with z.open(csv_filename) as csv_file:
+                return load_kline_csv(csv_file)
     except zipfile.BadZipFile:
         write_log(f"Erreur: Le fichier téléchargé depuis {url} n'est pas un ZIP valide ou est corrompu.")
         return None
     except IndexError:
         write_log(f"Erreur: Le fichier ZIP depuis {url} ne contient pas de CSV attendu.")
         return None
-    except Exception as e:
-        write_log(f"Erreur inattendue lors du traitement de {url}: {e}")
+
+def fetch_partition(symbol, timeframe, date_type, date_str, session=None, rate_limiter=None):
+    """Télécharge et lit une archive (jour ou mois). Retourne un DataFrame OHLCV ou None."""
+    write_log(f"Traitement de : {date_str}")
+    url = get_binance_data_url(symbol, timeframe, date_type, date_str)
+    content = download_zip(url, session=session, rate_limiter=rate_limiter)
+    if content is not None:
+        return read_kline_zip(content, url)
+    return None
+
+def plan_downloads(start_date, end_date, data_granularity='daily', today=None):
+    """
+    Découpe l'intervalle [start_date, end_date] (datetime, bornes incluses) en archives à télécharger.
+    En 'monthly', chaque mois entièrement couvert et déjà clos utilise l'archive mensuelle ;
+    les mois partiels aux extrémités (et le mois en cours, pas encore publié) passent par les fichiers journaliers.
+    Retourne une liste de (date_type, date_str, premier_jour, dernier_jour), dans l'ordre chronologique.
+    """
+    today = today or datetime.now()
+    current_month_start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    plan = []
+    current_date = start_date
+    while current_date <= end_date:
+        month_start = current_date.replace(day=1)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        month_end = next_month - timedelta(days=1)
+        if (data_granularity == 'monthly' and current_date == month_start and month_end <= end_date
+                and next_month <= current_month_start):
+            plan.append(('monthly', month_start.strftime('%Y-%m'), month_start, month_end))
+            current_date = next_month
+        else:
+            plan.append(('daily', current_date.strftime('%Y-%m-%d'), current_date, current_date))
+            current_date += timedelta(days=1)
+    return plan
+
+def fetch_plan_item(symbol, timeframe, item, session=None, rate_limiter=None):
+    """
+    Télécharge une entrée du plan et ne garde que les bougies de sa période.
+    Si une archive mensuelle est introuvable, on se rabat sur les fichiers journaliers du mois.
+    """
+    date_type, date_str, first_day, last_day = item
+    df_temp = fetch_partition(symbol, timeframe, date_type, date_str, session, rate_limiter)
+    if df_temp is None and date_type == 'monthly':
+        write_log(f"Archive mensuelle {date_str} indisponible, repli sur les fichiers journaliers.")
+        days = []
+        day = first_day
+        while day <= last_day:
+            df_day = fetch_partition(symbol, timeframe, 'daily', day.strftime('%Y-%m-%d'), session, rate_limiter)
+            if df_day is not None:
+                days.append(df_day)
+            day += timedelta(days=1)
+        df_temp = merge_sorted_partitions(days, timeframe)[0] if days else None
+    if df_temp is None or df_temp.empty:
         return None
+    # Une archive ne doit pas déborder sur la période d'une archive voisine (doublons aux frontières mois/jour)
+    in_period = (df_temp['timestamp'] >= first_day) & (df_temp['timestamp'] < last_day + timedelta(days=1))
+    return df_temp[in_period]
+
+def _sorted_unique(timestamps, columns):
+    """Trie et dédoublonne une seule partition (cas anormal : les fichiers Binance sont déjà triés)."""
+    order = np.argsort(timestamps, kind='stable')
+    timestamps = timestamps[order]
+    keep = np.ones(len(timestamps), dtype=bool)
+    keep[1:] = timestamps[1:] != timestamps[:-1]
+    return timestamps[keep], {name: values[order][keep] for name, values in columns.items()}
+
+def _log_gaps(gaps):
+    for first, last, count in gaps:
+        write_log(f"Trou dans les données : {count} bougies manquantes de {pd.Timestamp(first)} à {pd.Timestamp(last)}")
+
+def merge_sorted_partitions(partitions, timeframe, start=None, end=None):
+    """
+    Assemble des partitions OHLCV déjà triées, reçues dans l'ordre chronologique (itérable,
+    consommé au fil de l'eau). Chaque partition est ajoutée à la suite de la précédente :
+    le dédoublonnage ne porte que sur la jonction entre deux partitions, au lieu d'un
+    tri + drop_duplicates sur toute la période. Les trous (bougies manquantes) sont signalés
+    au fur et à mesure. `start` et `end` (int64 ns, optionnels) sont la première et la dernière
+    bougie attendues : les bougies manquantes avant la première reçue ou après la dernière sont
+    aussi des trous. Retourne (DataFrame, liste des trous (début, fin, nombre de bougies)).
+    """
+    step = timeframe_to_nanoseconds(timeframe)
+    chunks = [] # (timestamps int64, {colonne: valeurs}) dans l'ordre
+    gaps = []
+    last_timestamp = None
+    before_start = None if start is None else start - step # Bougie précédant la période, pour le premier trou
+    needs_full_sort = False
+    for df_part in partitions:
+        if df_part is None or df_part.empty:
+            continue
+        columns = {name: series.to_numpy() for name, series in df_part.items()}
+        timestamps = columns.pop('timestamp').astype('datetime64[ns]').view(np.int64)
+        if np.any(timestamps[1:] <= timestamps[:-1]):
+            timestamps, columns = _sorted_unique(timestamps, columns)
+        if last_timestamp is not None and timestamps[0] <= last_timestamp:
+            # Chevauchement à la jonction : on retire les bougies déjà présentes
+            overlap = np.searchsorted(timestamps, last_timestamp, side='right')
+            if not needs_full_sort and np.isin(timestamps[:overlap], chunks[-1][0]).all():
+                timestamps = timestamps[overlap:]
+                columns = {name: values[overlap:] for name, values in columns.items()}
+            else:
+                # Partition qui s'intercale au milieu des données déjà reçues : tri global en fin d'assemblage
+                needs_full_sort = True
+        if len(timestamps) == 0:
+            continue
+        if not needs_full_sort:
+            new_gaps = find_gaps(timestamps, step, before_start if last_timestamp is None else last_timestamp)
+            _log_gaps(new_gaps)
+            gaps.extend(new_gaps)
+            last_timestamp = int(timestamps[-1])
+        chunks.append((timestamps, columns))
 
-def fetch_and_process_historical_data(symbol, timeframe, start_date_str, end_date_str, data_granularity='daily'):
+    if not chunks:
+        if start is not None and end is not None:
+            gaps = [(start, end, (end - start) // step + 1)]
+            _log_gaps(gaps)
+        return pd.DataFrame(), gaps
+    timestamps = np.concatenate([chunk[0] for chunk in chunks])
+    columns = {name: np.concatenate([chunk[1][name] for chunk in chunks]) for name in chunks[0][1]}
+    if needs_full_sort:
+        write_log("Partitions non chronologiques : tri complet des données assemblées.")
+        timestamps, columns = _sorted_unique(timestamps, columns)
+        gaps = find_gaps(timestamps, step, before_start)
+        _log_gaps(gaps)
+    if end is not None and timestamps[-1] < end:
+        new_gaps = find_gaps(np.array([end + step]), step, int(timestamps[-1]))
+        _log_gaps(new_gaps)
+        gaps.extend(new_gaps)
+    # copy=False : les colonnes concaténées deviennent directement celles du DataFrame
+    return pd.DataFrame({'timestamp': timestamps.view('datetime64[ns]'), **columns}, copy=False), gaps
+
+# --- Synchronisation incrémentale ---
+def missing_day_runs(missing_days):
+    """Regroupe des jours manquants (datetime triés) en intervalles contigus [début, fin]."""
+    runs = []
+    for day in missing_days:
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+def sync_historical_data(symbol, timeframe, start_date_str, end_date_str, store_dir=STORE_DIR,
+                         data_granularity='monthly', max_in_flight=MAX_IN_FLIGHT,
+                         requests_per_second=REQUESTS_PER_SECOND):
     """
-    Télécharge et fusionne les données historiques de Binance.
-    data_granularity: 'monthly' or 'daily'
+    Synchronise les partitions journalières de [start_date_str, end_date_str] dans le stockage local.
+    Seuls les jours absents du manifeste, ou dont les fichiers ne correspondent plus à la taille et au
+    SHA-256 enregistrés (partition corrompue), sont téléchargés ; les jours en échec seront retentés
+    à la prochaine synchronisation. Le manifeste est sauvegardé au fil de l'eau : une
+    synchronisation interrompue reprend là où elle s'était arrêtée.
+    Les archives sont téléchargées en parallèle (au plus max_in_flight à la fois, au plus
+    requests_per_second démarrages par seconde) sur une session keep-alive partagée, et assemblées
+    dans l'ordre du plan par merge_sorted_partitions ; les trous de chaque période sont signalés.
+    Retourne le nombre de jours ajoutés.
     """
-    all_dfs = []
-    current_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+    store = OHLCVStore(store_dir)
+    start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
     end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
 
-    write_log(f"Début de la récupération des données pour {symbol} {timeframe} de {start_date_str} à {end_date_str}...")
+    missing_days = []
+    day = start_date
+    while day <= end_date:
+        if not store.has_day(symbol, timeframe, day.strftime('%Y-%m-%d'), verify=True):
+            missing_days.append(day)
+        day += timedelta(days=1)
+    total_days = (end_date - start_date).days + 1
+    write_log(f"Synchronisation {symbol} {timeframe} : {total_days - len(missing_days)}/{total_days} jours déjà présents, "
+              f"{len(missing_days)} à télécharger.")
+    if not missing_days:
+        return 0
 
-    while current_date <= end_date:
-        date_param = current_date.strftime('%Y-%m-%d')
-        write_log(f"Traitement du jour : {date_param}")
-        url = get_binance_data_url(symbol, timeframe, 'daily', date_param)
-        csv_path = download_and_extract_zip(url)
-        
-        # Passe au jour suivant
-        current_date += timedelta(days=1)
-
-        if csv_path:
-            try:
-                # Les CSV de Binance ont une structure spécifique
-                # ['open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume',
-                #  'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore']
-                df_temp = pd.read_csv(csv_path, header=None, names=[
-                    'timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 
-                    'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 
-                    'taker_buy_quote_asset_volume', 'ignore'
-                ])
-                # Nous avons besoin de 'timestamp', 'open', 'high', 'low', 'close', 'volume'
-                df_temp = df_temp[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
-                df_temp['timestamp'] = pd.to_datetime(df_temp['timestamp'], unit='ms')
-                all_dfs.append(df_temp)
-                os.remove(csv_path) # Nettoie le fichier CSV temporaire
-            except Exception as e:
-                write_log(f"Erreur lors du traitement du CSV {csv_path}: {e}")
-        
-        # Petite pause pour ne pas surcharger le serveur
-        time.sleep(0.5) 
-
-    if not all_dfs:
-        write_log("Aucune donnée n'a pu être téléchargée ou traitée pour la période spécifiée.")
-        return pd.DataFrame()
-
-    final_df = pd.concat(all_dfs, ignore_index=True)
-    # Assurez-vous que les données sont triées chronologiquement et uniques
-    final_df = final_df.sort_values('timestamp').drop_duplicates(subset=['timestamp']).reset_index(drop=True)
-    write_log(f"Total de {len(final_df)} bougies téléchargées et fusionnées.")
-    return final_df
+    plan = []
+    for run_start, run_end in missing_day_runs(missing_days):
+        plan.extend(plan_downloads(run_start, run_end, data_granularity))
+
+    added = 0
+    failed = 0
+    gaps = []
+    step = timeframe_to_nanoseconds(timeframe)
+    session = create_session(max_in_flight)
+    rate_limiter = RateLimiter(requests_per_second)
+    try:
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            results = executor.map(lambda item: fetch_plan_item(symbol, timeframe, item, session, rate_limiter), plan)
+            for item, df_temp in zip(plan, results):
+                _, _, first_day, last_day = item
+                period_start = int(pd.Timestamp(first_day).value)
+                period_end = int(pd.Timestamp(last_day + timedelta(days=1)).value)
+                # Assemblage par ajout (dédoublonnage aux jonctions seulement) et trous de la période de l'entrée
+                df_item, item_gaps = merge_sorted_partitions([] if df_temp is None else [df_temp], timeframe,
+                                                             start=period_start, end=period_end - step)
+                gaps.extend(item_gaps)
+                timestamps = df_item['timestamp'].to_numpy().view(np.int64) if not df_item.empty else np.empty(0, np.int64)
+                day = first_day
+                while day <= last_day:
+                    day_str = day.strftime('%Y-%m-%d')
+                    day_start = int(pd.Timestamp(day).value)
+                    begin, stop = np.searchsorted(timestamps, [day_start, day_start + 24 * 3600 * 10**9])
+                    df_day = df_item.iloc[begin:stop] if stop > begin else None
+                    entry = store.write_day(symbol, timeframe, day_str, df_day) if df_day is not None else None
+                    if entry is None:
+                        if df_day is not None:
+                            write_log(f"Partition {day_str} rejetée : bougies hors du jour ou non ordonnées.")
+                        failed += 1
+                    else:
+                        added += 1
+                        if added % MANIFEST_SAVE_EVERY == 0:
+                            store.save_manifest()
+                    day += timedelta(days=1)
+    finally:
+        session.close()
+        store.save_manifest()
+
+    missing = sum(gap[2] for gap in gaps)
+    write_log(f"Synchronisation terminée : {added} jours ajoutés, {failed} jours en échec (retentés à la prochaine synchronisation), "
+              f"{len(gaps)} trous ({missing} bougies manquantes).")
+    return added
 
 def save_data_to_csv(df, filename):
     """Sauvegarde le DataFrame Pandas dans un fichier CSV."""
@@ -134,42 +381,18 @@ if __name__ == "__main__":
     start_date_str = start_date.strftime('%Y-%m-%d')
     end_date_str = end_date.strftime('%Y-%m-%d')
 
-    # Gardons 'daily' pour les 1m, car les fichiers mensuels en 1m sont trop grands
-    data_granularity = 'daily' 
-
-    output_filename = f"historical_data_{symbol_to_fetch.replace('/', '')}_{timeframe_to_fetch}_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.csv"
-    temp_download_dir = "temp_binance_data" # Répertoire temporaire pour les ZIP et CSV extraits
-
-    if os.path.exists(output_filename):
-        write_log(f"Le fichier de données '{output_filename}' existe déjà. Chargement des données existantes.")
-        df_historical = pd.read_csv(output_filename)
-        df_historical['timestamp'] = pd.to_datetime(df_historical['timestamp'])
-    else:
-        df_historical = fetch_and_process_historical_data(
-            symbol_to_fetch, 
-            timeframe_to_fetch, 
-            start_date_str, 
-            end_date_str, 
-            data_granularity=data_granularity
-        )
-        
-        if not df_historical.empty:
-            save_data_to_csv(df_historical, output_filename)
-        else:
-            write_log("Aucune donnée récupérée pour le backtesting. Vérifiez vos paramètres ou la connexion.")
-
-    # Nettoyage du dossier temporaire
-    if os.path.exists(temp_download_dir):
-        import shutil
-        try:
-            shutil.rmtree(temp_download_dir)
-            write_log(f"Dossier temporaire '{temp_download_dir}' supprimé.")
-        except OSError as e:
-            write_log(f"Erreur lors de la suppression du dossier temporaire '{temp_download_dir}': {e}")
+    # Archives mensuelles pour les mois complets, fichiers journaliers pour les mois partiels
+    data_granularity = 'monthly' 
 
+    # Synchronisation incrémentale : seuls les jours absents du manifeste sont téléchargés,
+    # une extension de la période d'un jour ne retélécharge donc qu'un seul fichier.
+    sync_historical_data(symbol_to_fetch, timeframe_to_fetch, start_date_str, end_date_str,
+                         data_granularity=data_granularity)
+    # Les partitions sont lues directement par le backtester (plus de CSV monolithique)
+    df_historical = OHLCVStore().query(symbol_to_fetch, timeframe_to_fetch, start_date_str, end_date_str)
 
     if not df_historical.empty:
-        write_log(f"Prêt pour le backtesting avec {len(df_historical)} bougies de {symbol_to_fetch} en {timeframe_to_fetch}.")
+        write_log(f"Prêt pour le backtesting avec {len(df_historical)} bougies de {symbol_to_fetch} en {timeframe_to_fetch} (stockage '{STORE_DIR}').")
         write_log(f"Données du {df_historical['timestamp'].min()} au {df_historical['timestamp'].max()}")
     else:
         write_log("Aucune donnée historique n'est disponible pour le backtesting.")
\ No newline at end of file
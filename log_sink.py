@@ -0,0 +1,233 @@
+import atexit
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# --- Écriture du log en tâche de fond ---
+# write() se contente de déposer (heure, message) dans une file bornée : l'horodatage, le
+# formatage, l'affichage console et l'écriture fichier sont faits par un thread dédié, par lots.
+# Une console ou un disque lent ne retarde donc jamais la boucle de trading. Si la file est
+# pleine, le message est abandonné et compté (dropped) ; le nombre de messages perdus est
+# écrit dans le log dès que le thread rattrape son retard. Le fichier (UTF-8) reste ouvert et
+# tourne par taille en octets (LOG_MAX_BYTES) ou par durée (LOG_ROTATE_INTERVAL) : fichier.1, ...
+# Après close(), write() écrit directement, dans le thread appelant (messages de fin de programme).
+
+LOG_QUEUE_SIZE = 10000 # Messages en attente au plus
+LOG_BATCH_SIZE = 256 # Messages écrits par lot
+LOG_FLUSH_INTERVAL = 0.5 # Secondes d'attente du thread quand la file est vide
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_ROTATE_INTERVAL = 24 * 3600
+LOG_BACKUP_COUNT = 5
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_STOP = object() # Marqueur de fin pour le thread d'écriture
+
+
+class LogSink:
+    """
+    Log asynchrone vers `path` (et `stream`, la console par défaut, si echo=True).
+    write() ne bloque jamais ; flush() attend que la file soit vide ; close() vide la file puis
+    arrête le thread (appelé aussi à la sortie du programme s'il ne l'a pas été avant).
+    """
+
+    def __init__(self, path, echo=True, stream=None, queue_size=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, max_bytes=LOG_MAX_BYTES, rotate_interval=LOG_ROTATE_INTERVAL,
+                 backup_count=LOG_BACKUP_COUNT):
+        self.path = path
+        self.echo = echo
+        self.stream = stream
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0 # Messages abandonnés, file pleine
+        self.rotations = 0
+        self._reported_dropped = 0
+        self._file = None
+        self._size = 0
+        self._opened_at = None
+        self._closed = False
+        self._lock = threading.Lock() # Ordonne write() et close() : aucun message déposé après l'arrêt du thread
+        self._thread = threading.Thread(target=self._run, name='log-sink', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, message):
+        """
+        Dépose un message dans la file sans attendre (abandonné et compté si elle est pleine).
+        Après close(), le message est écrit directement (compté comme perdu si l'écriture échoue).
+        """
+        with self._lock:
+            if not self._closed:
+                try:
+                    self.queue.put_nowait((time.time(), message))
+                except queue.Full:
+                    self.dropped += 1
+                return
+            try:
+                self._write_batch([(time.time(), message)])
+            except Exception as e:
+                self.dropped += 1
+                sys.stderr.write(f"Erreur d'écriture du log {self.path}: {e}\n")
+            finally:
+                self._close_file()
+
+    def flush(self):
+        """Attend que tous les messages déposés soient écrits."""
+        if not self._closed:
+            self.queue.join()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.queue.put(_STOP)
+        self._thread.join()
+        self._close_file()
+        atexit.unregister(self.close) # Un sink fermé n'a plus à être gardé jusqu'à la sortie
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # --- Thread d'écriture ---
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is _STOP
+            try:
+                self._write_batch(batch[:-1] if stop else batch)
+            except Exception as e:
+                sys.stderr.write(f"Erreur d'écriture du log {self.path}: {e}\n")
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        lines = [f"[{datetime.fromtimestamp(created).strftime(TIMESTAMP_FORMAT)}] {message}\n" for created, message in batch]
+        dropped = self.dropped
+        if dropped != self._reported_dropped:
+            lines.append(f"[{datetime.now().strftime(TIMESTAMP_FORMAT)}] {dropped - self._reported_dropped} messages de log perdus (file pleine)\n")
+            self._reported_dropped = dropped
+        if not lines:
+            return
+        text = ''.join(lines)
+        if self.echo:
+            stream = self.stream or sys.stdout
+            stream.write(text)
+            stream.flush()
+        size = len(text.encode('utf-8')) # Octets écrits : les accents comptent double
+        f = self._log_file(size)
+        f.write(text)
+        f.flush()
+        self._size += size
+
+    def _log_file(self, incoming):
+        """Fichier de log courant, après rotation si la taille ou la durée maximale est atteinte."""
+        if self._file is not None:
+            too_big = self._size > 0 and self._size + incoming > self.max_bytes
+            too_old = time.time() - self._opened_at >= self.rotate_interval
+            if too_big or too_old:
+                self._rotate()
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._size = self._file.tell()
+            self._opened_at = time.time()
+        return self._file
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+# --- Mesure du coût côté appelant ---
+
+def legacy_write_log(path, message, stream):
+    """Ancien write_log : horodatage, affichage et ouverture/écriture/fermeture du fichier à chaque message."""
+    timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    log_message = f"[{timestamp}] {message}"
+    print(log_message, file=stream)
+    with open(path, 'a') as f:
+        f.write(log_message + '\n')
+
+
+class SlowStream:
+    """Console qui met `delay` secondes à afficher chaque lot (terminal bloqué, pipe plein...)."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+
+    def flush(self):
+        pass
+
+
+def _percentiles(durations):
+    durations = sorted(durations)
+    return {
+        'mean_us': sum(durations) / len(durations) / 1000,
+        'p99_us': durations[int(len(durations) * 0.99)] / 1000,
+        'max_us': durations[-1] / 1000,
+    }
+
+
+def benchmark(messages=5000, stall_messages=20000, stall_delay=0.05):
+    """
+    Coût par appel (µs) de l'ancien write_log et de LogSink.write, console redirigée vers
+    /dev/null, puis de LogSink.write avec une console bloquée `stall_delay` s par lot.
+    """
+    message = "Solde USDT: 10000.00 | BTC: 0.000000 | Total USDT: 10000.00 | Positions ouvertes: 0"
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull:
+        path = os.path.join(directory, 'legacy.log')
+        durations = []
+        for _ in range(messages):
+            start = time.perf_counter_ns()
+            legacy_write_log(path, message, devnull)
+            durations.append(time.perf_counter_ns() - start)
+        results['legacy'] = dict(_percentiles(durations), dropped=0)
+
+        for name, stream, count in (('sink', devnull, messages), ('sink_stalled', SlowStream(stall_delay), stall_messages)):
+            sink = LogSink(os.path.join(directory, f'{name}.log'), stream=stream)
+            durations = []
+            for _ in range(count):
+                start = time.perf_counter_ns()
+                sink.write(message)
+                durations.append(time.perf_counter_ns() - start)
+            sink.close()
+            results[name] = dict(_percentiles(durations), dropped=sink.dropped)
+    return results
+
+
+if __name__ == "__main__":
+    for name, stats in benchmark().items():
+        print(f"{name:>13} : moyenne {stats['mean_us']:.2f} µs | p99 {stats['p99_us']:.2f} µs | "
+              f"max {stats['max_us']:.0f} µs | perdus {stats['dropped']}")
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import kline_parser
+
+# --- Stockage local des bougies OHLCV, partitionné par symbole / timeframe / jour ---
+# Chaque partition est un dossier contenant une colonne par fichier .npy à largeur fixe
+# (timestamp en int64 ns, prix et volume en float64) : le chargement est une simple
+# lecture binaire, sans parsing texte, et une requête par dates n'ouvre que les jours utiles.
+# Le manifeste (manifest.json) liste les partitions présentes et vérifiées.
+# Pour les backtests, une plage de jours peut aussi être consolidée en un fichier par colonne
+# (dossier _mapped) ouvert en mémoire mappée : tous les processus qui l'ouvrent partagent
+# le même cache de pages au lieu d'avoir chacun leur copie des données.
+
+STORE_DIR = "market_data"
+MANIFEST_FILENAME = "manifest.json"
+MAPPED_DIR = "_mapped" # Plages consolidées pour la lecture en mémoire mappée
+FINGERPRINT_FILENAME = "fingerprint.txt"
+STORE_COLUMNS = kline_parser.KLINE_COLUMNS
+DATE_FORMAT = '%Y-%m-%d'
+TIMEFRAME_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def timeframe_to_nanoseconds(timeframe):
+    """Durée d'une bougie en nanosecondes ('1m' -> 60e9, '4h' -> 14400e9)."""
+    return int(timeframe[:-1]) * TIMEFRAME_SECONDS[timeframe[-1]] * 10**9
+
+
+def find_gaps(timestamps, step, previous=None):
+    """
+    Trous d'une série de timestamps int64 (ns) triée : liste de (première bougie manquante,
+    dernière bougie manquante, nombre de bougies manquantes), en ns.
+    `previous` est le dernier timestamp de la série précédente, pour détecter un trou à la jonction.
+    """
+    if previous is not None:
+        timestamps = np.concatenate(([previous], timestamps))
+    if len(timestamps) < 2:
+        return []
+    deltas = np.diff(timestamps)
+    holes = np.flatnonzero(deltas > step)
+    return [(int(timestamps[i]) + step, int(timestamps[i + 1]) - step, int(deltas[i] // step) - 1) for i in holes]
+
+
+def open_mapped(directory, columns=STORE_COLUMNS):
+    """
+    Ouvre les colonnes d'une plage consolidée (voir OHLCVStore.map_range) en mémoire mappée,
+    en lecture seule. Les tableaux retournés sont des vues sur le cache de pages : aucune copie.
+    """
+    return {column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode='r') for column in columns}
+
+
+class OHLCVStore:
+    """
+    Accès au stockage partitionné. Le manifeste est gardé en mémoire : write_day le met à jour,
+    save_manifest l'écrit sur le disque (l'appelant choisit la fréquence des sauvegardes).
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.manifest = self._load_manifest()
+
+    # --- Manifeste ---
+    def _manifest_path(self):
+        return os.path.join(self.root, MANIFEST_FILENAME)
+
+    def _load_manifest(self):
+        path = self._manifest_path()
+        if not os.path.exists(path):
+            return {'partitions': {}}
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Manifeste {path} illisible ({e}), les partitions seront revérifiées.")
+            return {'partitions': {}}
+
+    def save_manifest(self):
+        """Écrit le manifeste de façon atomique (fichier temporaire puis remplacement)."""
+        os.makedirs(self.root, exist_ok=True)
+        path = self._manifest_path()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _entries(self, symbol, timeframe):
+        return self.manifest['partitions'].get(symbol.replace('/', ''), {}).get(timeframe, {})
+
+    def entry(self, symbol, timeframe, day_str):
+        """Entrée de manifeste d'une partition (rows, size, sha256, ...) ou None."""
+        return self._entries(symbol, timeframe).get(day_str)
+
+    def days(self, symbol, timeframe, start_date_str=None, end_date_str=None):
+        """Jours présents au manifeste, triés, éventuellement bornés (bornes incluses)."""
+        return sorted(day for day in self._entries(symbol, timeframe)
+                      if (start_date_str is None or day >= start_date_str)
+                      and (end_date_str is None or day <= end_date_str))
+
+    # --- Partitions ---
+    def partition_dir(self, symbol, timeframe, day_str):
+        return os.path.join(self.root, symbol.replace('/', ''), timeframe, day_str)
+
+    def column_path(self, symbol, timeframe, day_str, column):
+        return os.path.join(self.partition_dir(symbol, timeframe, day_str), f"{column}.npy")
+
+    def has_day(self, symbol, timeframe, day_str, verify=False):
+        """
+        Une partition est valide si elle figure au manifeste et que ses fichiers ont la taille enregistrée.
+        Avec verify=True, le SHA-256 des colonnes est aussi recalculé et comparé à celui du manifeste
+        (partition réécrite ou corrompue à taille égale).
+        """
+        entry = self.entry(symbol, timeframe, day_str)
+        if entry is None:
+            return False
+        size = 0
+        for column in STORE_COLUMNS:
+            path = self.column_path(symbol, timeframe, day_str, column)
+            if not os.path.exists(path):
+                return False
+            size += os.path.getsize(path)
+        if size != entry['size']:
+            return False
+        return not verify or self.partition_digest(symbol, timeframe, day_str) == entry['sha256']
+
+    def partition_digest(self, symbol, timeframe, day_str):
+        """SHA-256 des valeurs des colonnes d'une partition, calculé comme dans write_day. None si illisible."""
+        digest = hashlib.sha256()
+        try:
+            for column in STORE_COLUMNS:
+                digest.update(np.load(self.column_path(symbol, timeframe, day_str, column)).tobytes())
+        except (OSError, ValueError) as e:
+            print(f"Partition {symbol} {timeframe} {day_str} illisible: {e}")
+            return None
+        return digest.hexdigest()
+
+    def write_day(self, symbol, timeframe, day_str, df_day):
+        """
+        Écrit une partition journalière et l'ajoute au manifeste (en mémoire).
+        Les colonnes sont écrites dans un dossier temporaire renommé à la fin.
+        Retourne l'entrée de manifeste, ou None si les bougies ne sont pas cohérentes avec le jour.
+        """
+        timestamps = df_day['timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64)
+        day_start = np.datetime64(day_str, 'ns').astype(np.int64)
+        day_end = np.datetime64(day_str, 'ns').astype(np.int64) + 24 * 3600 * 10**9
+        if (len(timestamps) == 0 or timestamps[0] < day_start or timestamps[-1] >= day_end
+                or np.any(np.diff(timestamps) <= 0)):
+            return None
+
+        target = self.partition_dir(symbol, timeframe, day_str)
+        tmp_dir = target + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        digest = hashlib.sha256()
+        size = 0
+        for column in STORE_COLUMNS:
+            values = timestamps if column == 'timestamp' else df_day[column].to_numpy(dtype=np.float64)
+            path = os.path.join(tmp_dir, f"{column}.npy")
+            np.save(path, np.ascontiguousarray(values))
+            digest.update(values.tobytes())
+            size += os.path.getsize(path)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp_dir, target)
+
+        entry = {'rows': len(timestamps), 'size': size, 'sha256': digest.hexdigest(),
+                 'first': int(timestamps[0]), 'last': int(timestamps[-1]),
+                 'written_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        partitions = self.manifest['partitions']
+        partitions.setdefault(symbol.replace('/', ''), {}).setdefault(timeframe, {})[day_str] = entry
+        return entry
+
+    def read_day(self, symbol, timeframe, day_str, columns=STORE_COLUMNS):
+        """Colonnes d'une partition, sous forme de dictionnaire de tableaux NumPy."""
+        return {column: np.load(self.column_path(symbol, timeframe, day_str, column)) for column in columns}
+
+    def query(self, symbol, timeframe, start_date_str=None, end_date_str=None, columns=STORE_COLUMNS):
+        """
+        Bougies de [start_date_str, end_date_str] (jours inclus, tout le stockage par défaut).
+        Seules les partitions de la période sont ouvertes. Retourne un DataFrame (timestamp en datetime64[ns]).
+        """
+        days = self.days(symbol, timeframe, start_date_str, end_date_str)
+        if not days:
+            return pd.DataFrame(columns=list(columns))
+        parts = [self.read_day(symbol, timeframe, day, columns) for day in days]
+        data = {column: np.concatenate([part[column] for part in parts]) for column in columns}
+        if 'timestamp' in data:
+            data['timestamp'] = data['timestamp'].view('datetime64[ns]')
+        return pd.DataFrame(data)
+
+    def map_range(self, symbol, timeframe, start_date_str=None, end_date_str=None):
+        """
+        Consolide les partitions de la plage en un fichier .npy par colonne et retourne son dossier.
+        Le dossier est réutilisé tant que les partitions qu'il contient n'ont pas changé
+        (empreinte des sha256 du manifeste), sinon il est reconstruit.
+        """
+        days = self.days(symbol, timeframe, start_date_str, end_date_str)
+        if not days:
+            raise ValueError(f"Aucune partition {symbol} {timeframe} entre {start_date_str} et {end_date_str}")
+        entries = [self.entry(symbol, timeframe, day) for day in days]
+        fingerprint = hashlib.sha256(''.join(f"{day}:{entry['sha256']};" for day, entry in zip(days, entries))
+                                     .encode()).hexdigest()
+        target = os.path.join(self.root, MAPPED_DIR, symbol.replace('/', ''), timeframe, f"{days[0]}_{days[-1]}")
+        fingerprint_path = os.path.join(target, FINGERPRINT_FILENAME)
+        if os.path.exists(fingerprint_path):
+            with open(fingerprint_path, 'r') as f:
+                if f.read().strip() == fingerprint:
+                    return target
+
+        # Reconstruction : les partitions sont recopiées une à une dans des fichiers pré-alloués
+        total_rows = sum(entry['rows'] for entry in entries)
+        tmp_dir = target + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for column in STORE_COLUMNS:
+            dtype = np.int64 if column == 'timestamp' else np.float64
+            output = np.lib.format.open_memmap(os.path.join(tmp_dir, f"{column}.npy"), mode='w+',
+                                               dtype=dtype, shape=(total_rows,))
+            position = 0
+            for day in days:
+                values = np.load(self.column_path(symbol, timeframe, day, column), mmap_mode='r')
+                output[position:position + len(values)] = values
+                position += len(values)
+            output.flush()
+            del output
+        with open(os.path.join(tmp_dir, FINGERPRINT_FILENAME), 'w') as f:
+            f.write(fingerprint)
+        # Les processus qui ont déjà mappé l'ancienne version gardent leurs pages jusqu'à fermeture
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp_dir, target)
+        return target
+
+    def open_range(self, symbol, timeframe, start_date_str=None, end_date_str=None, columns=STORE_COLUMNS):
+        """Colonnes de la plage en mémoire mappée (vues NumPy en lecture seule, sans copie)."""
+        return open_mapped(self.map_range(symbol, timeframe, start_date_str, end_date_str), columns)
+
+    def import_daily_files(self, paths, symbol, timeframe):
+        """Importe des CSV journaliers Binance bruts (ex: ceux de temp_data) dans le stockage."""
+        imported = 0
+        for path in paths:
+            df_day = kline_parser.parse_klines(path)
+            if df_day.empty:
+                continue
+            day_str = str(df_day['timestamp'].iloc[0].date())
+            if self.write_day(symbol, timeframe, day_str, df_day) is not None:
+                imported += 1
+        self.save_manifest()
+        return imported
+
+
+if __name__ == "__main__":
+    # Usage : python ohlcv_store.py import [dossier] [symbole] [timeframe]
+    #         python ohlcv_store.py bench [symbole] [timeframe]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'bench'
+    if command == 'import':
+        import backtester
+        source_dir = sys.argv[2] if len(sys.argv) > 2 else backtester.DAILY_DATA_DIR
+        symbol = sys.argv[3] if len(sys.argv) > 3 else 'BTCUSDT'
+        timeframe = sys.argv[4] if len(sys.argv) > 4 else '1m'
+        store = OHLCVStore()
+        count = store.import_daily_files(backtester.list_daily_kline_files(source_dir, symbol, timeframe), symbol, timeframe)
+        print(f"{count} jours importés dans {store.root}")
+    else:
+        symbol = sys.argv[2] if len(sys.argv) > 2 else 'BTCUSDT'
+        timeframe = sys.argv[3] if len(sys.argv) > 3 else '1m'
+        start = time.perf_counter()
+        df = OHLCVStore().query(symbol, timeframe)
+        elapsed = time.perf_counter() - start
+        print(f"{len(df)} bougies chargées en {elapsed:.3f}s ({len(df) / max(elapsed, 1e-9):,.0f} bougies/s)")
@@ -0,0 +1,222 @@
+import argparse
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import backtest_metrics
+import backtester
+from backtester import write_log
+import resampler
+from ohlcv_store import OHLCVStore, open_mapped
+from sma_cache import SMACache, DEFAULT_MEMORY_BUDGET_MB
+
+# --- Balayage de paramètres en parallèle pour le backtester ---
+# Les colonnes OHLCV sont ouvertes en mémoire mappée (mmap) par chaque processus :
+# directement depuis une plage consolidée du stockage (OHLCVStore.map_range), ou depuis
+# des fichiers .npy temporaires si l'on part d'un DataFrame. Les données ne sont jamais
+# sérialisées vers les workers, et tous les processus partagent le même cache de pages.
+# Chaque worker garde un SMACache : les combinaisons qui partagent une fenêtre
+# réutilisent le même tableau de SMA au lieu de refaire un rolling().mean().
+
+SHARED_COLUMNS = ('timestamp', 'open', 'high', 'low', 'close')
+RESULT_COLUMNS = ['short_window', 'long_window', 'stop_loss_pct', 'take_profit_pct', 'position_sizing_pct',
+                  'final_balance_usdt', 'total_profit_usdt', 'total_profit_pct', 'trades', 'wins', 'losses',
+                  'win_rate', 'avg_win', 'avg_loss', 'profit_factor', 'max_drawdown_pct',
+                  'max_drawdown_duration_bars', 'sharpe', 'sortino', 'exposure_pct']
+
+# Données partagées, ouvertes une fois par worker (voir _init_worker)
+_worker_data = None
+
+
+def parse_range(text, cast=float):
+    """
+    Convertit une plage de paramètres en liste de valeurs.
+    Formats acceptés : '7' (valeur seule), '5,7,9' (liste) ou 'début:fin:pas' (fin incluse).
+    """
+    if ':' in text:
+        parts = text.split(':')
+        if len(parts) != 3:
+            raise argparse.ArgumentTypeError(f"Plage invalide '{text}' (attendu début:fin:pas)")
+        start, stop, step = (float(p) for p in parts)
+        if step <= 0:
+            raise argparse.ArgumentTypeError(f"Le pas de la plage '{text}' doit être positif")
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        # Arrondi pour éviter les 0.0030000000000000005 produits par l'accumulation de pas flottants
+        return [cast(round(start + k * step, 10)) for k in range(count)]
+    return [cast(value) for value in text.split(',')]
+
+
+def build_grid(short_windows, long_windows, stop_loss_pcts, take_profit_pcts, position_sizing_pcts):
+    """Produit toutes les combinaisons valides (fenêtre courte strictement inférieure à la longue)."""
+    return [combo for combo in itertools.product(short_windows, long_windows, stop_loss_pcts,
+                                                 take_profit_pcts, position_sizing_pcts)
+            if combo[0] < combo[1]]
+
+
+def export_shared_arrays(df, target_dir):
+    """
+    Écrit les colonnes OHLC + timestamp dans target_dir pour les workers. Le timestamp est
+    converti en int64 ns, l'unité du stockage (map_range) que tous les lecteurs supposent :
+    un CSV lu par pandas est en datetime64[us].
+    """
+    timestamps = df['timestamp'].to_numpy().astype('datetime64[ns]')
+    np.save(os.path.join(target_dir, 'timestamp.npy'), timestamps.view(np.int64))
+    for column in SHARED_COLUMNS[1:]:
+        np.save(os.path.join(target_dir, f'{column}.npy'), df[column].to_numpy(dtype=np.float64))
+
+
+def _init_worker(data_dir, intrabar, sma_cache_mb, periods_per_year):
+    """Ouvre les colonnes partagées en mémoire mappée (lecture seule) dans le worker."""
+    global _worker_data
+    _worker_data = {column: np.load(os.path.join(data_dir, f'{column}.npy'), mmap_mode='r')
+                    for column in SHARED_COLUMNS}
+    _worker_data['intrabar'] = intrabar
+    _worker_data['periods_per_year'] = periods_per_year
+    _worker_data['sma_cache'] = SMACache(_worker_data['close'], memory_budget_mb=sma_cache_mb)
+
+
+def run_combination(data, short_window, long_window, stop_loss_pct, take_profit_pct, position_sizing_pct):
+    """Exécute un backtest silencieux pour une combinaison et retourne sa ligne de résultats."""
+    close = data['close']
+    timestamps = data['timestamp']
+    sma_cache = data['sma_cache']
+    sma_short = sma_cache.get(short_window)
+    sma_long = sma_cache.get(long_window)
+    signals = backtester.crossover_signals(sma_short, sma_long, long_window)
+
+    state = backtester.BacktestState(stop_loss_pct=stop_loss_pct, take_profit_pct=take_profit_pct,
+                                     position_sizing_pct=position_sizing_pct)
+    intrabar = data['intrabar']
+    backtester.simulate_bars(state, timestamps, close, signals, long_window,
+                             data['open'] if intrabar else None, data['high'] if intrabar else None,
+                             data['low'] if intrabar else None, intrabar)
+    if state.position is not None:
+        state.close_position(int(timestamps[-1]), float(close[-1]), 'closed_end_of_test')
+
+    final_balance = state.balance_usdt + state.balance_btc * float(close[-1])
+    total_profit = final_balance - backtester.INITIAL_BALANCE_USDT
+    trades = backtest_metrics.trade_arrays(state.trades)
+    metrics = backtest_metrics.compute_metrics(timestamps, close, trades, backtester.INITIAL_BALANCE_USDT,
+                                               data['periods_per_year'])
+    profits = trades['profit_usd']
+    wins = profits[profits > 0]
+    losses = profits[profits < 0]
+    return (short_window, long_window, stop_loss_pct, take_profit_pct, position_sizing_pct,
+            final_balance, total_profit, total_profit / backtester.INITIAL_BALANCE_USDT * 100,
+            len(profits), len(wins), len(losses),
+            len(wins) / (len(wins) + len(losses)) * 100 if len(wins) + len(losses) else 0.0,
+            wins.mean() if len(wins) else 0.0, losses.mean() if len(losses) else 0.0,
+            metrics['profit_factor'], metrics['max_drawdown_pct'], metrics['max_drawdown_duration_bars'],
+            metrics['sharpe'], metrics['sortino'], metrics['exposure_pct'])
+
+
+def _run_combination_in_worker(combo):
+    return run_combination(_worker_data, *combo)
+
+
+def run_sweep(data, grid, workers=None, intrabar=None, sort_by='total_profit_usdt', progress_every=100,
+              sma_cache_mb=DEFAULT_MEMORY_BUDGET_MB, timeframe=None):
+    """
+    Exécute tous les backtests de `grid` sur un pool de processus et retourne le tableau
+    des résultats trié par `sort_by` (décroissant). Les résultats sont consommés au fil de l'eau.
+    `data` est un DataFrame OHLCV, ou le dossier d'une plage consolidée du stockage
+    (OHLCVStore.map_range) que les workers ouvrent directement, sans copie intermédiaire.
+    Si `timeframe` est fourni, les bougies sont d'abord regroupées dans ce timeframe (voir resampler).
+    """
+    intrabar = backtester.INTRABAR_EXITS if intrabar is None else intrabar
+    workers = workers or os.cpu_count() or 1
+    if timeframe is not None and timeframe != resampler.BASE_TIMEFRAME:
+        if not isinstance(data, pd.DataFrame):
+            data = pd.DataFrame(open_mapped(data))
+            data['timestamp'] = data['timestamp'].to_numpy().view('datetime64[ns]')
+        data = resampler.resample_frame(data, timeframe)
+    if isinstance(data, pd.DataFrame):
+        data_dir = tempfile.mkdtemp(prefix='sweep_data_')
+        temporary = True
+    else:
+        data_dir = data
+        temporary = False
+    rows = []
+    best = None
+    start_time = time.time()
+    try:
+        if temporary:
+            export_shared_arrays(data, data_dir)
+        timestamps = np.load(os.path.join(data_dir, 'timestamp.npy'), mmap_mode='r')
+        periods_per_year = backtest_metrics.bars_per_year(timestamps.view('datetime64[ns]'))
+        write_log(f"Balayage de {len(grid)} combinaisons sur {len(timestamps)} bougies avec {workers} processus...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data_dir, intrabar, sma_cache_mb, periods_per_year)) as pool:
+            futures = [pool.submit(_run_combination_in_worker, combo) for combo in grid]
+            for future in as_completed(futures):
+                row = future.result()
+                rows.append(row)
+                score = row[RESULT_COLUMNS.index(sort_by)]
+                if best is None or score > best[RESULT_COLUMNS.index(sort_by)]:
+                    best = row
+                if len(rows) % progress_every == 0 or len(rows) == len(grid):
+                    elapsed = time.time() - start_time
+                    write_log(f"{len(rows)}/{len(grid)} combinaisons ({len(rows) / elapsed:.1f}/s). "
+                              f"Meilleure jusqu'ici: short={best[0]} long={best[1]} SL={best[2]} TP={best[3]} "
+                              f"sizing={best[4]} -> {sort_by}={best[RESULT_COLUMNS.index(sort_by)]:.2f}")
+    finally:
+        if temporary:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    results = pd.DataFrame.from_records(rows, columns=RESULT_COLUMNS)
+    return results.sort_values(sort_by, ascending=False, kind='stable').reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Balayage parallèle des paramètres de la stratégie de croisement de SMA.")
+    parser.add_argument('data_file', nargs='?', default=None, help="Fichier CSV de données historiques (par défaut : le stockage de data_downloader.py)")
+    parser.add_argument('--symbol', default='BTCUSDT', help="Symbole à lire dans le stockage")
+    parser.add_argument('--timeframe', default='1m', help="Timeframe des bougies (ex: 5m, 15m, 1h ; dérivé des bougies 1m si absent du stockage)")
+    parser.add_argument('--start', default=None, help="Premier jour (YYYY-MM-DD) lu dans le stockage")
+    parser.add_argument('--end', default=None, help="Dernier jour (YYYY-MM-DD) lu dans le stockage")
+    parser.add_argument('--short', default=str(backtester.SHORT_WINDOW), help="Fenêtres SMA courtes, ex: 5:15:1 ou 5,7,9")
+    parser.add_argument('--long', default=str(backtester.LONG_WINDOW), help="Fenêtres SMA longues, ex: 20:60:5")
+    parser.add_argument('--stop-loss', default=str(backtester.STOP_LOSS_PCT), help="Stop loss en fraction, ex: 0.002:0.006:0.001")
+    parser.add_argument('--take-profit', default=str(backtester.TAKE_PROFIT_PCT), help="Take profit en fraction, ex: 0.003:0.01:0.001")
+    parser.add_argument('--sizing', default=str(backtester.POSITION_SIZING_PCT), help="Part du capital par trade, ex: 0.01,0.02")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus (défaut: nombre de CPU)")
+    parser.add_argument('--intrabar', action='store_true', help="Sorties SL/TP sur high/low au lieu de la clôture")
+    parser.add_argument('--sma-cache-mb', type=float, default=DEFAULT_MEMORY_BUDGET_MB, help="Budget mémoire du cache de SMA par processus (Mo)")
+    parser.add_argument('--sort-by', default='total_profit_usdt', choices=RESULT_COLUMNS[5:], help="Colonne de classement")
+    parser.add_argument('--top', type=int, default=20, help="Nombre de lignes affichées à la fin")
+    parser.add_argument('--output', default='sweep_results.csv', help="Fichier CSV des résultats complets")
+    args = parser.parse_args()
+
+    grid = build_grid(parse_range(args.short, int), parse_range(args.long, int), parse_range(args.stop_loss),
+                      parse_range(args.take_profit), parse_range(args.sizing))
+    if not grid:
+        write_log("Aucune combinaison valide (la fenêtre courte doit être inférieure à la longue).")
+    else:
+        if args.data_file is None:
+            # Plage du stockage consolidée puis mappée par chaque worker (une seule empreinte mémoire)
+            try:
+                store = resampler.store_for_timeframe(OHLCVStore(), args.symbol, args.timeframe, args.start, args.end)
+                sweep_data = store.map_range(args.symbol, args.timeframe, args.start, args.end)
+            except ValueError as e:
+                write_log(f"Erreur: {e}")
+                sweep_data = None
+        else:
+            sweep_data = backtester.load_historical_data(args.data_file)
+            if sweep_data.empty:
+                sweep_data = None
+            elif args.timeframe != resampler.BASE_TIMEFRAME:
+                sweep_data = resampler.resample_frame(sweep_data, args.timeframe)
+        if sweep_data is None:
+            write_log("Impossible d'exécuter le balayage car aucune donnée historique n'a pu être chargée.")
+        else:
+            df_results = run_sweep(sweep_data, grid, workers=args.workers, intrabar=args.intrabar or None,
+                                   sort_by=args.sort_by, sma_cache_mb=args.sma_cache_mb)
+            df_results.to_csv(args.output, index=False)
+            write_log(f"Résultats complets sauvegardés dans {args.output}")
+            print(df_results.head(args.top).to_string(index=False))
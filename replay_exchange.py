@@ -0,0 +1,410 @@
+import argparse
+import itertools
+import os
+import time
+
+import ccxt
+import numpy as np
+import pandas as pd
+
+import backtester
+import scalping_bot as bot
+
+# --- Exchange de rejeu pour faire tourner scalping_bot hors ligne ---
+# ReplayExchange reproduit le sous-ensemble de l'API ccxt utilisé par le bot (fetch_ohlcv,
+# fetch_ticker, fetch_balance, create_order, market, amount_to_precision, fetch_time) en
+# rejouant des klines historiques sous une horloge virtuelle : les attentes du bot avancent
+# l'horloge au lieu de dormir, un mois de bougies 1m est traité en quelques secondes.
+# Une bougie n'est publiée qu'à sa clôture et le prix du ticker est la clôture de la dernière
+# bougie publiée : les décisions du bot se font sur les mêmes prix que le backtest en mode
+# clôture, ce qui permet de comparer ses trades à ceux de backtester.run_backtest.
+# Les OCO (endpoint orderList/oco, fetch_open_orders, fetch_order, cancel_order) sont simulés :
+# leurs jambes sont exécutées sur le low/high des bougies publiées après leur création, comme
+# le backtest en mode intrabar. run_replay les désactive par défaut (SL/TP surveillés par le bot).
+# inject() simule les pannes : ordre refusé, réponse perdue, endpoint indisponible.
+
+REPLAY_JOURNAL_FILE = 'replay_trades.jsonl'
+REPLAY_SNAPSHOT_FILE = 'replay_trades_snapshot.json'
+REPLAY_ARCHIVE_FILE = 'replay_trades_closed.jsonl'
+REPLAY_LOG_FILE = 'replay_activity.log'
+AMOUNT_PRECISION = 5 # Pas de quantité BTC de la paire BTCUSDT sur Binance
+PRICE_PRECISION = 2
+MIN_AMOUNT = 0.00001
+# Écart de prix de sortie toléré face au backtest : les niveaux des OCO sont arrondis au pas de prix
+EXIT_PRICE_TOLERANCE = 0.5 * 10 ** -PRICE_PRECISION
+
+
+class ReplayFinished(BaseException):
+    """
+    Fin des données rejouées. Hérite de BaseException (comme KeyboardInterrupt) pour traverser
+    les `except Exception` de la boucle du bot et l'arrêter.
+    """
+
+
+class VirtualClock:
+    """Horloge virtuelle (secondes epoch) : sleep() avance le temps sans attendre, jusqu'à `end`."""
+
+    def __init__(self, start, end=None):
+        self.now = float(start)
+        self.end = end
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0.0)
+        if self.end is not None and self.now > self.end:
+            raise ReplayFinished()
+
+
+class ReplayExchange:
+    """
+    Exchange compatible ccxt (sous-ensemble utilisé par scalping_bot) rejouant des bougies OHLCV.
+    `data` : DataFrame OHLCV ou dictionnaire de colonnes NumPy (timestamp datetime64 ou int64 ns).
+    Les ordres au marché sont exécutés au prix du ticker ; `fills` garde l'historique des exécutions.
+    """
+
+    rateLimit = 50
+
+    def __init__(self, data, clock, balances=None, symbol=bot.symbol, timeframe=bot.timeframe):
+        timestamps = np.asarray(data['timestamp'])
+        if timestamps.dtype.kind == 'M':
+            timestamps = timestamps.astype('datetime64[ns]').view(np.int64)
+        self.timestamps = timestamps // 1_000_000 # Temps d'ouverture en ms, comme ccxt
+        self.columns = [np.asarray(data[column], dtype=np.float64) for column in ('open', 'high', 'low', 'close', 'volume')]
+        self.clock = clock
+        self.symbol = symbol
+        self.period_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        if balances is None:
+            balances = {'USDT': float(backtester.INITIAL_BALANCE_USDT), 'BTC': 0.0}
+        self.balances = dict(balances)
+        self.fills = []
+        self.orders = {} # Jambes OCO par identifiant, au format ccxt
+        self.order_lists = {} # OCO par orderListId : jambes, sens, prochaine bougie à examiner
+        self.faults = {} # Pannes injectées par méthode : (exception, après l'effet ?)
+        self._ids = itertools.count(1)
+        self._market = {
+            'id': symbol.replace('/', ''),
+            'symbol': symbol,
+            'precision': {'amount': AMOUNT_PRECISION, 'price': PRICE_PRECISION},
+            'limits': {'amount': {'min': MIN_AMOUNT}},
+        }
+
+    # --- Données de marché ---
+
+    def milliseconds(self):
+        return int(round(self.clock.time() * 1000))
+
+    def published(self):
+        """Nombre de bougies clôturées à l'heure virtuelle courante."""
+        return int(np.searchsorted(self.timestamps, self.milliseconds() - self.period_ms, side='right'))
+
+    def last_bar(self):
+        """Index de la dernière bougie clôturée (-1 si aucune)."""
+        return self.published() - 1
+
+    def set_sandbox_mode(self, enabled):
+        pass
+
+    def load_markets(self):
+        return {self.symbol: self._market}
+
+    def market(self, symbol):
+        return self._market
+
+    def fetch_time(self):
+        return self.milliseconds()
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None):
+        end = self.published()
+        if since is None:
+            start = max(end - limit, 0) if limit else 0
+        else:
+            start = int(np.searchsorted(self.timestamps, since, side='left'))
+            if limit:
+                end = min(end, start + limit)
+        return [[int(self.timestamps[i])] + [float(column[i]) for column in self.columns] for i in range(start, end)]
+
+    def fetch_ticker(self, symbol):
+        self._match_brackets()
+        i = self.last_bar()
+        if i < 0:
+            raise ccxt.ExchangeError("Aucune bougie publiée à l'heure virtuelle courante")
+        close = float(self.columns[3][i])
+        return {'symbol': symbol, 'timestamp': self.milliseconds(), 'last': close, 'close': close}
+
+    def fetch_balance(self):
+        self._match_brackets()
+        return {
+            'free': dict(self.balances),
+            'used': {currency: 0.0 for currency in self.balances},
+            'total': dict(self.balances),
+        }
+
+    # --- Ordres ---
+
+    def amount_to_precision(self, symbol, amount):
+        """Troncature au pas de quantité, comme ccxt pour Binance (chaîne de caractères)."""
+        factor = 10 ** AMOUNT_PRECISION
+        return f"{np.floor(float(amount) * factor + 1e-9) / factor:.{AMOUNT_PRECISION}f}"
+
+    def price_to_precision(self, symbol, price):
+        return f"{float(price):.{PRICE_PRECISION}f}"
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        if type != 'market':
+            raise ccxt.NotSupported(f"Ordre {type} non simulé par ReplayExchange")
+        amount = float(amount)
+        fill_price = self.fetch_ticker(symbol)['last']
+        cost = amount * fill_price
+        base, quote = symbol.split('/')
+        if side == 'buy':
+            if self.balances[quote] < cost:
+                raise ccxt.InsufficientFunds(f"Solde {quote} insuffisant: {self.balances[quote]:.2f} < {cost:.2f}")
+            self.balances[quote] -= cost
+            self.balances[base] += amount
+        else:
+            if self.balances[base] < amount:
+                raise ccxt.InsufficientFunds(f"Solde {base} insuffisant: {self.balances[base]:.8f} < {amount:.8f}")
+            self.balances[base] -= amount
+            self.balances[quote] += cost
+        order = {
+            'id': str(next(self._ids)),
+            'timestamp': self.milliseconds(),
+            'bar_time': int(self.timestamps[self.last_bar()]), # Bougie dont la clôture fixe le prix
+            'symbol': symbol,
+            'type': type,
+            'side': side,
+            'amount': amount,
+            'filled': amount,
+            'price': fill_price,
+            'average': fill_price,
+            'cost': cost,
+            'status': 'closed',
+        }
+        self.fills.append(order)
+        return order
+
+    # --- Ordres OCO ---
+
+    def inject(self, method, error, after=False):
+        """Le prochain appel de `method` lève `error`, avant son effet ou, si after=True, après (réponse perdue)."""
+        self.faults[method] = (error, after)
+
+    def _fault(self, method, after=False):
+        fault = self.faults.get(method)
+        if fault is not None and fault[1] == after:
+            del self.faults[method]
+            raise fault[0]
+
+    def private_post_orderlist_oco(self, params):
+        """POST /api/v3/orderList/oco : une jambe au-dessus du prix courant, une en dessous."""
+        self._fault('private_post_orderlist_oco')
+        self._match_brackets()
+        if params['symbol'] != self._market['id']:
+            raise ccxt.BadSymbol(f"Symbole inconnu: {params['symbol']}")
+        last = self.fetch_ticker(self.symbol)['last']
+        side = params['side']
+        amount = float(params['quantity'])
+        legs = {}
+        for position in ('above', 'below'):
+            order_type = params[position + 'Type']
+            level = float(params[position + ('StopPrice' if order_type.startswith('STOP_LOSS') else 'Price')])
+            if (position == 'above') != (level > last):
+                raise ccxt.InvalidOrder(f"Jambe {position} de l'OCO à {level} incompatible avec le prix {last}")
+            legs[position] = (order_type, level, params.get(position + 'ClientOrderId'))
+        base, quote = self.symbol.split('/')
+        if side == 'SELL' and self.balances[base] < amount:
+            raise ccxt.InsufficientFunds(f"Solde {base} insuffisant pour l'OCO: {self.balances[base]:.8f} < {amount:.8f}")
+        if side == 'BUY' and self.balances[quote] < amount * legs['above'][1]:
+            raise ccxt.InsufficientFunds(f"Solde {quote} insuffisant pour l'OCO")
+
+        list_id = next(self._ids)
+        reports = []
+        ids = {}
+        for position, (order_type, level, client_id) in legs.items():
+            order_id = str(next(self._ids))
+            info = {'orderId': order_id, 'orderListId': list_id, 'clientOrderId': client_id, 'symbol': params['symbol'],
+                    'side': side, 'type': order_type, 'origQty': params['quantity']}
+            self.orders[order_id] = {
+                'id': order_id, 'clientOrderId': client_id, 'timestamp': self.milliseconds(), 'symbol': self.symbol,
+                'type': order_type.lower(), 'side': side.lower(), 'amount': amount, 'filled': 0.0,
+                'price': level if order_type == 'LIMIT_MAKER' else None,
+                'stopPrice': level if order_type.startswith('STOP_LOSS') else None,
+                'average': None, 'status': 'open', 'info': info,
+            }
+            ids['sl' if order_type.startswith('STOP_LOSS') else 'tp'] = order_id
+            reports.append(info)
+        self.order_lists[list_id] = {'legs': ids, 'side': side, 'next_bar': self.published(), 'status': 'open'}
+        self._fault('private_post_orderlist_oco', after=True)
+        return {'orderListId': list_id, 'orderReports': reports}
+
+    def _match_brackets(self):
+        """Exécute les jambes touchées par les bougies publiées depuis le dernier examen de chaque OCO."""
+        published = self.published()
+        for order_list in self.order_lists.values():
+            if order_list['status'] != 'open' or order_list['next_bar'] >= published:
+                continue
+            stop_loss = self.orders[order_list['legs']['sl']]['stopPrice']
+            take_profit = self.orders[order_list['legs']['tp']]['price']
+            open_, high, low, close = (column[:published] for column in self.columns[:4])
+            exit = backtester.resolve_exit(order_list['next_bar'], order_list['side'] == 'SELL', stop_loss, take_profit,
+                                           low, high, open_, close, intrabar=True)
+            order_list['next_bar'] = published
+            if exit is not None:
+                i, status, price, _ = exit
+                self._fill_bracket(order_list, 'sl' if status == 'closed_sl' else 'tp', i, float(price))
+
+    def _fill_bracket(self, order_list, leg, bar, price):
+        order = self.orders[order_list['legs'][leg]]
+        amount = order['amount']
+        base, quote = self.symbol.split('/')
+        sign = 1 if order['side'] == 'buy' else -1
+        self.balances[base] += sign * amount
+        self.balances[quote] -= sign * amount * price
+        order.update({'status': 'closed', 'filled': amount, 'average': price, 'cost': amount * price,
+                      'bar_time': int(self.timestamps[bar]), 'lastTradeTimestamp': int(self.timestamps[bar]) + self.period_ms})
+        for other in order_list['legs'].values():
+            if self.orders[other]['status'] == 'open':
+                self.orders[other]['status'] = 'canceled' # L'exécution d'une jambe annule l'autre
+        order_list['status'] = 'closed'
+        self.fills.append(dict(order, price=price))
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        self._fault('fetch_open_orders')
+        self._match_brackets()
+        return [dict(order) for order in self.orders.values() if order['status'] == 'open']
+
+    def fetch_order(self, id, symbol=None, params=None):
+        self._fault('fetch_order')
+        self._match_brackets()
+        if id not in self.orders:
+            raise ccxt.OrderNotFound(f"Ordre {id} inconnu")
+        return dict(self.orders[id])
+
+    def cancel_order(self, id, symbol=None, params=None):
+        """Annule une jambe OCO : comme sur Binance, toute la liste est annulée."""
+        self._fault('cancel_order')
+        self._match_brackets()
+        if id not in self.orders:
+            raise ccxt.OrderNotFound(f"Ordre {id} inconnu")
+        order = self.orders[id]
+        if order['status'] != 'open':
+            raise ccxt.OrderNotFound(f"Ordre {id} déjà {order['status']}")
+        order_list = self.order_lists[order['info']['orderListId']]
+        for leg in order_list['legs'].values():
+            self.orders[leg]['status'] = 'canceled'
+        order_list['status'] = 'canceled'
+        return dict(self.orders[id])
+
+
+def run_replay(data, monitor_interval=bot.MONITOR_INTERVAL, balances=None,
+               journal_file=REPLAY_JOURNAL_FILE, snapshot_file=REPLAY_SNAPSHOT_FILE,
+               archive_file=REPLAY_ARCHIVE_FILE, log_file=REPLAY_LOG_FILE, brackets=False):
+    """
+    Fait tourner scalping_bot.main sur `data` sous horloge virtuelle, de la première clôture où
+    les SMA sont calculables jusqu'à la dernière bougie. Retourne l'exchange de rejeu (fills, soldes).
+    Le journal des trades (journal_file, snapshot_file, archive_file) et le log du bot (log_file) sont réinitialisés.
+    Avec brackets=True, les positions sont protégées par des OCO simulés au lieu de la surveillance locale.
+    """
+    clock = VirtualClock(0)
+    replay = ReplayExchange(data, clock, balances)
+    period = replay.period_ms / 1000
+    history = bot.long_window + 5 # Bougies demandées par le bot au démarrage
+    if len(replay.timestamps) <= history:
+        raise ValueError(f"Au moins {history + 1} bougies sont nécessaires au rejeu")
+    clock.now = replay.timestamps[history - 1] / 1000 + period
+    clock.end = replay.timestamps[-1] / 1000 + period + bot.CLOSE_DELAY
+
+    # Le bot repart d'un état vierge, branché sur l'exchange de rejeu et l'horloge virtuelle
+    for path in (journal_file, snapshot_file, archive_file, log_file):
+        if os.path.exists(path):
+            os.remove(path)
+    bot.exchange = replay
+    bot.USE_EXCHANGE_BRACKETS = brackets
+    bot.trade_log_file = None # Pas de reprise de l'historique réel
+    bot.trade_journal_file = journal_file
+    bot.trade_snapshot_file = snapshot_file
+    bot.trade_archive_file = archive_file
+    bot.activity_log_file = log_file
+    bot.snapshots = bot.SnapshotProvider(clock=clock.time)
+    bot.sma_state = bot.IncrementalSMA(bot.short_window, bot.long_window)
+    bot.open_positions.clear()
+    bot.last_signal = None
+    bot.current_position_type = None
+    scheduler = bot.CandleScheduler(bot.timeframe, monitor_interval=monitor_interval, clock=clock.time)
+    try:
+        bot.main(scheduler=scheduler, sleep=clock.sleep)
+    except ReplayFinished:
+        bot.journal.close()
+        bot.close_log()
+    return replay
+
+
+def replay_trades(replay):
+    """
+    Trades fermés du rejeu au format de run_backtest : les exécutions vont par paires
+    (entrée, sortie) et les temps sont ceux des bougies dont la clôture a fixé le prix.
+    """
+    rows = []
+    for trade, (entry, exit) in zip(bot.closed_trades, zip(replay.fills[::2], replay.fills[1::2])):
+        rows.append({
+            'type': trade['type'],
+            'entry_time': pd.Timestamp(entry['bar_time'], unit='ms'),
+            'entry_price': entry['price'],
+            'amount_btc': entry['amount'],
+            'exit_time': pd.Timestamp(exit['bar_time'], unit='ms'),
+            'exit_price': exit['price'],
+            'profit_usd': trade['profit_usd'],
+            'status': trade['status'],
+        })
+    return pd.DataFrame(rows)
+
+
+def compare_trades(live, backtest):
+    """
+    Aligne les trades du rejeu et du backtest sur (entry_time, type). La colonne 'source' vaut
+    'both', 'live_only' ou 'backtest_only' ; les écarts de prix de sortie sont dans 'exit_price_diff'.
+    """
+    keys = ['entry_time', 'type']
+    columns = keys + ['entry_price', 'amount_btc', 'exit_time', 'exit_price', 'status']
+    backtest = backtest[columns].copy()
+    backtest['entry_time'] = backtest['entry_time'].astype('datetime64[ns]')
+    backtest['exit_time'] = backtest['exit_time'].astype('datetime64[ns]')
+    live = live[columns].copy()
+    live['entry_time'] = live['entry_time'].astype('datetime64[ns]')
+    live['exit_time'] = live['exit_time'].astype('datetime64[ns]')
+    merged = live.merge(backtest, on=keys, how='outer', suffixes=('_live', '_backtest'), indicator='source')
+    merged['source'] = merged['source'].map({'both': 'both', 'left_only': 'live_only', 'right_only': 'backtest_only'})
+    merged['exit_price_diff'] = merged['exit_price_live'] - merged['exit_price_backtest']
+    return merged.sort_values(keys).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rejoue scalping_bot sur des klines historiques et compare ses trades au backtest.")
+    parser.add_argument('--start', help="Premier jour (YYYY-MM-DD)")
+    parser.add_argument('--end', help="Dernier jour (YYYY-MM-DD)")
+    parser.add_argument('--data-dir', default=backtester.DAILY_DATA_DIR)
+    parser.add_argument('--monitor-interval', type=float, default=bot.MONITOR_INTERVAL)
+    parser.add_argument('--brackets', action='store_true', help="OCO simulés, comparés au backtest en mode intrabar")
+    args = parser.parse_args()
+
+    data = pd.concat(backtester.iter_daily_klines(args.data_dir, start_date=args.start, end_date=args.end), ignore_index=True)
+    started = time.perf_counter()
+    replay = run_replay(data, monitor_interval=args.monitor_interval, brackets=args.brackets)
+    elapsed = time.perf_counter() - started
+    live = replay_trades(replay)
+    print(f"Rejeu de {len(data)} bougies en {elapsed:.1f} s ({len(data) / elapsed:,.0f} bougies/s) : {len(live)} trades fermés")
+
+    backtester.INTRABAR_EXITS = args.brackets
+    backtest = backtester.run_backtest(data, journal=backtester.BacktestJournal(backtester.JOURNAL_SILENT))
+    if live.empty or backtest.empty:
+        print("Pas de trades à comparer.")
+    else:
+        diff = compare_trades(live, backtest)
+        print(diff['source'].value_counts().to_string())
+        divergent = diff[(diff['source'] != 'both') | (diff['exit_price_diff'].abs() > EXIT_PRICE_TOLERANCE)]
+        if divergent.empty:
+            print("Trades identiques au backtest.")
+        else:
+            print(f"Première divergence :\n{divergent.iloc[0].to_string()}")
@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from ohlcv_store import OHLCVStore, STORE_COLUMNS, timeframe_to_nanoseconds
+
+# --- Rééchantillonnage des bougies 1m vers des timeframes supérieurs ---
+# Les bougies d'un multiple de 1m (5m, 15m, 1h, ...) sont dérivées du stockage 1m en une
+# seule passe vectorisée (reduceat sur les frontières de bougies), sans nouveau téléchargement.
+# Les séries dérivées sont mises en cache par (timeframe, jour) dans un stockage séparé
+# (dossier _derived) ; chaque partition dérivée garde le sha256 de la partition 1m d'origine
+# et est recalculée dès que celle-ci change.
+
+BASE_TIMEFRAME = '1m'
+DERIVED_DIR = "_derived"
+DAY_NS = 24 * 3600 * 10**9
+
+
+def check_timeframe(timeframe, base_timeframe=BASE_TIMEFRAME):
+    """Durée de la bougie en ns ; lève ValueError si ce n'est pas un multiple du timeframe de base."""
+    step = timeframe_to_nanoseconds(timeframe)
+    base_step = timeframe_to_nanoseconds(base_timeframe)
+    if step < base_step or step % base_step != 0:
+        raise ValueError(f"Le timeframe {timeframe} n'est pas un multiple de {base_timeframe}")
+    return step
+
+
+def resample_arrays(columns, step):
+    """
+    Agrège des colonnes OHLCV (timestamp int64 ns trié, open/high/low/close/volume) en bougies
+    de `step` ns alignées sur l'epoch. Les bougies sans aucune donnée ne sont pas créées.
+    Retourne un dictionnaire de colonnes.
+    """
+    timestamps = np.asarray(columns['timestamp'], dtype=np.int64)
+    if len(timestamps) == 0:
+        return {column: np.asarray(columns[column])[:0] for column in STORE_COLUMNS}
+    buckets = timestamps - timestamps % step
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.append(starts[1:], len(timestamps)) - 1
+    return {
+        'timestamp': buckets[starts],
+        'open': np.asarray(columns['open'])[starts],
+        'high': np.maximum.reduceat(np.asarray(columns['high']), starts),
+        'low': np.minimum.reduceat(np.asarray(columns['low']), starts),
+        'close': np.asarray(columns['close'])[ends],
+        'volume': np.add.reduceat(np.asarray(columns['volume']), starts),
+    }
+
+
+def resample_frame(df, timeframe, base_timeframe=BASE_TIMEFRAME):
+    """Rééchantillonne un DataFrame OHLCV (timestamp datetime64) vers `timeframe`."""
+    step = check_timeframe(timeframe, base_timeframe)
+    columns = {column: df[column].to_numpy() for column in STORE_COLUMNS}
+    columns['timestamp'] = columns['timestamp'].astype('datetime64[ns]').view(np.int64)
+    resampled = resample_arrays(columns, step)
+    resampled['timestamp'] = resampled['timestamp'].view('datetime64[ns]')
+    return pd.DataFrame(resampled)
+
+
+def derived_store(store):
+    """Stockage des bougies dérivées associé à `store`."""
+    return OHLCVStore(os.path.join(store.root, DERIVED_DIR))
+
+
+def update_derived(store, symbol, timeframe, start_date_str=None, end_date_str=None, base_timeframe=BASE_TIMEFRAME):
+    """
+    Met à jour le cache des bougies `timeframe` dérivées des partitions `base_timeframe` de la plage :
+    seules les partitions absentes du cache ou dont la partition de base a changé sont recalculées.
+    Retourne le stockage dérivé. Le timeframe doit diviser une journée (bougies contenues dans un jour).
+    """
+    step = check_timeframe(timeframe, base_timeframe)
+    if DAY_NS % step != 0:
+        raise ValueError(f"Le timeframe {timeframe} ne divise pas une journée : utilisez resample_frame")
+    cache = derived_store(store)
+    updated = 0
+    for day in store.days(symbol, base_timeframe, start_date_str, end_date_str):
+        source_sha256 = store.entry(symbol, base_timeframe, day)['sha256']
+        entry = cache.entry(symbol, timeframe, day)
+        if entry is not None and entry.get('source_sha256') == source_sha256 and cache.has_day(symbol, timeframe, day):
+            continue
+        columns = store.read_day(symbol, base_timeframe, day)
+        resampled = resample_arrays(columns, step)
+        resampled['timestamp'] = resampled['timestamp'].view('datetime64[ns]')
+        entry = cache.write_day(symbol, timeframe, day, pd.DataFrame(resampled))
+        if entry is not None:
+            entry['source_sha256'] = source_sha256
+            updated += 1
+    if updated:
+        cache.save_manifest()
+    return cache
+
+
+def store_for_timeframe(store, symbol, timeframe, start_date_str=None, end_date_str=None):
+    """
+    Stockage à interroger pour `timeframe` : le stockage principal s'il contient ce timeframe
+    (ou s'il s'agit du timeframe de base), sinon le cache des bougies dérivées, mis à jour au besoin.
+    """
+    if timeframe == BASE_TIMEFRAME or store.days(symbol, timeframe, start_date_str, end_date_str):
+        return store
+    return update_derived(store, symbol, timeframe, start_date_str, end_date_str)
@@ -4,7 +4,12 @@ import pandas as pd
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+from collections import deque, namedtuple
+from types import MappingProxyType
+from fractions import Fraction
 import json # Pour enregistrer les trades en format JSON
+import trade_journal
+from log_sink import LogSink
 
 load_dotenv()
 
@@ -36,11 +41,38 @@ timeframe = '1m'
 short_window = 7
 long_window = 25
 
-trade_log_file = 'trades.json' # Changement de format pour une meilleure analyse
+trade_log_file = 'trades.json' # Ancien historique complet, repris au premier démarrage avec le journal
+trade_journal_file = 'trades.jsonl' # Journal des ouvertures/fermetures de positions (voir trade_journal.py)
+trade_snapshot_file = 'trades_snapshot.json' # Instantané compacté du journal
+trade_archive_file = 'trades_closed.jsonl' # Archive des trades fermés (ajout seul)
+activity_log_file = 'bot_activity.log'
 stop_loss_pct = 0.003  # 0.3% stop loss
 take_profit_pct = 0.005  # 0.5% take profit
 position_sizing_pct = 0.01 # 1% du solde USD pour chaque trade d'achat
 
+# Durée de validité (secondes) de chaque donnée de l'instantané du marché : une donnée encore
+# valide n'est pas redemandée à l'exchange. Le solde n'évolue que par nos ordres (le cache est
+# invalidé après chaque ordre), il peut donc être gardé plus longtemps que le prix. Les bougies
+# ne sont demandées qu'aux clôtures, et toujours redemandées : la bougie qui vient de clôturer
+# ne peut pas être dans le cache.
+SNAPSHOT_TTLS = {
+    'ohlcv': 0.0,
+    'ticker': 2.0,
+    'balance': 30.0,
+}
+
+# Ordonnancement : les signaux ne sont évalués qu'à la clôture de chaque bougie (heure du serveur),
+# les SL/TP sont surveillés à une cadence plus rapide, et seulement tant que des positions sont ouvertes.
+CLOSE_DELAY = 0.5 # Secondes après la clôture, le temps que l'exchange publie la bougie finale
+MONITOR_INTERVAL = 2.0 # Secondes entre deux vérifications SL/TP
+CLOCK_RESYNC_INTERVAL = 3600 # Secondes entre deux recalages sur l'heure du serveur (fetch_time)
+
+# Protection des positions par un ordre OCO côté exchange (stop-loss au marché + take-profit limite) :
+# les sorties ne dépendent plus de la surveillance SL/TP du bot. Si l'exchange ne propose pas
+# l'OCO (ou le refuse), la position reste surveillée localement par manage_positions.
+USE_EXCHANGE_BRACKETS = True
+BRACKET_METHOD = 'private_post_orderlist_oco' # Endpoint Binance POST /api/v3/orderList/oco (non unifié par ccxt)
+
 # --- Stockage des données de trading ---
 # Gardons un historique des trades fermés pour l'analyse
 closed_trades = []
@@ -51,12 +83,14 @@ open_positions = {} # Utilisation d'un dictionnaire pour un accès plus facile p
 # Variables de contrôle du bot
 last_signal = None # Pour éviter de répéter les trades sur le même signal
 current_position_type = None # Pour savoir si nous sommes actuellement en "long" ou "short" (conceptuellement)
+journal = None # TradeJournal ouvert par recover_state()
+activity_log = None # LogSink de activity_log_file, ouvert au premier message
 
 # --- Fonctions utilitaires ---
 
 def load_closed_trades():
-    """Charge l'historique des trades fermés depuis le fichier JSON."""
-    if os.path.exists(trade_log_file):
+    """Charge l'historique des trades fermés depuis l'ancien fichier JSON (migration vers le journal)."""
+    if trade_log_file and os.path.exists(trade_log_file):
         with open(trade_log_file, 'r') as f:
             try:
                 return json.load(f)
@@ -64,19 +98,50 @@ def load_closed_trades():
                 return []
     return []
 
-def save_closed_trades():
-    """Sauvegarde l'historique des trades fermés dans le fichier JSON."""
-    with open(trade_log_file, 'w') as f:
-        json.dump(closed_trades, f, indent=4)
+def recover_state():
+    """
+    Ouvre le journal des trades et reconstruit closed_trades et open_positions tels qu'ils
+    étaient à l'arrêt du bot (positions ouvertes et OCO compris).
+    """
+    global journal, closed_trades, current_position_type
+    journal = trade_journal.TradeJournal(trade_journal_file, trade_snapshot_file, trade_archive_file)
+    closed_trades, positions = journal.load(legacy_trades=load_closed_trades())
+    open_positions.clear()
+    open_positions.update(positions)
+    # Le sens de la dernière position ouverte évite de reprendre deux fois la même direction
+    history = closed_trades + list(open_positions.values())
+    if history:
+        current_position_type = max(history, key=lambda position: position['entry_time'])['type']
+    for pos_id, position in open_positions.items():
+        write_log(f"Position {position['type'].upper()} reprise (ID: {pos_id}) - Entrée: {position['entry_price']:.2f}, SL: {position['stop_loss']:.2f}, TP: {position['take_profit']:.2f}")
+
+def record_trade_event(event, position):
+    """Ajoute l'ouverture, la mise à jour ou la fermeture d'une position au journal."""
+    if journal is not None:
+        journal.record(event, position)
+
+def sync_journal():
+    """Rend durables sur disque les derniers événements du journal (fsync groupé)."""
+    if journal is not None:
+        journal.sync()
 
 def write_log(message):
-    """Écrit un message horodaté dans la console et un fichier de log."""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_message = f"[{timestamp}] {message}"
-    print(log_message)
-    # Optionnel: Écrire aussi dans un fichier texte séparé pour les logs d'exécution
-    with open('bot_activity.log', 'a') as f:
-        f.write(log_message + '\n')
+    """
+    Confie le message au thread d'écriture du log (console et activity_log_file, horodatés),
+    sans attendre : l'affichage et le disque ne ralentissent pas la boucle de trading.
+    """
+    global activity_log
+    if activity_log is None or activity_log.path != activity_log_file:
+        close_log()
+        activity_log = LogSink(activity_log_file)
+    activity_log.write(message)
+
+def close_log():
+    """Écrit les messages en attente et ferme le log."""
+    global activity_log
+    if activity_log is not None:
+        activity_log.close()
+        activity_log = None
 
 def fetch_ohlcv():
     """Récupère les données OHLCV pour le symbole et la timeframe spécifiés."""
@@ -98,6 +163,241 @@ def fetch_ohlcv():
         write_log(f"Erreur inattendue lors de la récupération OHLCV: {e}")
         return pd.DataFrame()
 
+class IncrementalSMA:
+    """
+    État des deux SMA mis à jour bougie par bougie, sans DataFrame.
+    Les bougies fermées sont gardées dans un buffer circulaire de long_window valeurs, avec la somme
+    glissante de chaque fenêtre ; la dernière bougie reçue (en cours de formation) est provisoire
+    et sa clôture est remplacée à chaque mise à jour. Les sommes sont des Fraction exactes :
+    aucune dérive d'arrondi, et chaque moyenne est l'arrondi correct de la vraie moyenne.
+    Les signaux sont ceux de check_signals sur le DataFrame renvoyé par fetch_ohlcv
+    (bougie en cours comprise).
+    """
+
+    def __init__(self, short_window, long_window):
+        self.short_window = short_window
+        self.long_window = long_window
+        self.closes = deque(maxlen=long_window) # Clôtures des bougies fermées
+        self.short_sum = Fraction(0) # Somme des short_window dernières bougies fermées
+        self.long_sum = Fraction(0) # Somme des long_window dernières bougies fermées
+        self.last_timestamp = None # Horodatage (ms) de la bougie en cours
+        self.current_close = None
+
+    def _commit(self, close):
+        """Ajoute une bougie fermée et met à jour les deux sommes glissantes en O(1)."""
+        count = len(self.closes)
+        if count >= self.short_window:
+            self.short_sum -= Fraction(self.closes[count - self.short_window])
+        if count == self.long_window:
+            self.long_sum -= Fraction(self.closes[0])
+        self.closes.append(close)
+        self.short_sum += Fraction(close)
+        self.long_sum += Fraction(close)
+
+    def update(self, candles):
+        """Intègre des bougies [timestamp, open, high, low, close, volume] reçues dans l'ordre."""
+        for candle in candles:
+            timestamp, close = candle[0], float(candle[4])
+            if self.last_timestamp is None or timestamp > self.last_timestamp:
+                if self.current_close is not None:
+                    self._commit(self.current_close) # La bougie précédente est désormais fermée
+                self.last_timestamp = timestamp
+                self.current_close = close
+            elif timestamp == self.last_timestamp:
+                self.current_close = close # Bougie en cours mise à jour
+
+    def is_ready(self):
+        """Autant de données que check_signals : long_window bougies fermées + la bougie en cours."""
+        return len(self.closes) == self.long_window and self.current_close is not None
+
+    def _window_mean(self, window, window_sum):
+        """SMA de la bougie en cours : la plus ancienne bougie de la fenêtre fermée est remplacée par la bougie en cours."""
+        oldest = Fraction(self.closes[len(self.closes) - window])
+        return float((window_sum - oldest + Fraction(self.current_close)) / window)
+
+    def check_signal(self):
+        """'buy', 'sell' ou None, selon les mêmes règles de croisement que check_signals."""
+        if not self.is_ready():
+            return None
+        current_sma_short = self._window_mean(self.short_window, self.short_sum)
+        current_sma_long = self._window_mean(self.long_window, self.long_sum)
+        prev_sma_short = float(self.short_sum / self.short_window)
+        prev_sma_long = float(self.long_sum / self.long_window)
+        if current_sma_short > current_sma_long and prev_sma_short <= prev_sma_long:
+            return 'buy'
+        elif current_sma_short < current_sma_long and prev_sma_short >= prev_sma_long:
+            return 'sell'
+        return None
+
+sma_state = IncrementalSMA(short_window, long_window)
+
+def fetch_new_candles():
+    """
+    Récupère uniquement les bougies nouvelles depuis la bougie en cours (since=last_timestamp),
+    ou l'historique nécessaire aux SMA au premier appel. Retourne une liste brute, ou [] en cas d'erreur.
+    """
+    try:
+        if sma_state.last_timestamp is None:
+            return exchange.fetch_ohlcv(symbol, timeframe, limit=long_window + 5) or []
+        return exchange.fetch_ohlcv(symbol, timeframe, since=sma_state.last_timestamp) or []
+    except ccxt.NetworkError as e:
+        write_log(f"Erreur réseau lors de la récupération OHLCV: {e}")
+        return []
+    except ccxt.ExchangeError as e:
+        write_log(f"Erreur d'échange lors de la récupération OHLCV: {e}")
+        return []
+    except Exception as e:
+        write_log(f"Erreur inattendue lors de la récupération OHLCV: {e}")
+        return []
+
+# --- Instantané du marché ---
+# Un instantané par itération regroupe bougies, prix, soldes et informations de marché :
+# il est passé tel quel aux fonctions de signal, de risque et d'ordre, qui n'appellent plus l'exchange.
+MarketSnapshot = namedtuple('MarketSnapshot', ['time', 'candles', 'price', 'usd_balance', 'btc_balance', 'market', 'min_amount'])
+
+class SnapshotProvider:
+    """
+    Construit les instantanés du marché en ne réinterrogeant chaque endpoint que lorsque sa
+    donnée a dépassé sa durée de validité (SNAPSHOT_TTLS). request_counts compte les appels REST.
+    """
+
+    def __init__(self, ttls=None, clock=time.monotonic):
+        self.ttls = dict(SNAPSHOT_TTLS if ttls is None else ttls)
+        self.clock = clock
+        self.request_counts = {endpoint: 0 for endpoint in self.ttls}
+        self._values = {}
+        self._fetched_at = {}
+        self._market = None
+
+    def _expired(self, endpoint, now):
+        return endpoint not in self._values or now - self._fetched_at[endpoint] >= self.ttls[endpoint]
+
+    def _store(self, endpoint, value, now):
+        self._values[endpoint] = value
+        self._fetched_at[endpoint] = now
+        self.request_counts[endpoint] += 1
+
+    def invalidate(self, endpoint=None):
+        """Force le rafraîchissement d'un endpoint (ou de tous) au prochain instantané."""
+        if endpoint is None:
+            self._values.clear()
+        else:
+            self._values.pop(endpoint, None)
+
+    def market(self):
+        """Informations de la paire (précision, minimums), lues une seule fois : elles ne changent pas."""
+        if self._market is None:
+            self._market = MappingProxyType(exchange.market(symbol))
+        return self._market
+
+    def fetchers(self):
+        """Fonction de récupération de chaque endpoint de l'instantané."""
+        return {
+            'ohlcv': fetch_new_candles,
+            'ticker': lambda: exchange.fetch_ticker(symbol),
+            'balance': fetch_balances,
+        }
+
+    def _snapshot(self, now, refreshed):
+        """Instantané des valeurs en cache. Les bougies n'y figurent que si elles viennent d'être récupérées."""
+        candles = self._values['ohlcv'] if 'ohlcv' in refreshed else [] # Sinon déjà intégrées à l'état des SMA
+        usd_balance, btc_balance = self._values['balance']
+        if usd_balance == 0 and btc_balance == 0:
+            self.invalidate('balance') # Échec de lecture (ou compte vide) : ne pas le garder en cache
+        market = self.market()
+        return MarketSnapshot(now, tuple(tuple(candle) for candle in candles), self._values['ticker']['last'],
+                              usd_balance, btc_balance, market, market['limits']['amount']['min'])
+
+    def _to_refresh(self, fetchers, now, candles):
+        """Endpoints expirés ; sans les bougies si candles=False (surveillance SL/TP seule)."""
+        return [endpoint for endpoint in fetchers
+                if (candles or endpoint != 'ohlcv') and self._expired(endpoint, now)]
+
+    def take(self, candles=True):
+        """Instantané courant : seuls les endpoints expirés sont réinterrogés, l'un après l'autre."""
+        now = self.clock()
+        fetchers = self.fetchers()
+        refreshed = self._to_refresh(fetchers, now, candles)
+        for endpoint in refreshed:
+            self._store(endpoint, fetchers[endpoint](), now)
+        return self._snapshot(now, refreshed)
+
+snapshots = SnapshotProvider()
+
+# --- Ordonnancement sur la clôture des bougies ---
+
+class CandleScheduler:
+    """
+    Calcule le prochain réveil de la boucle : 'close' juste après chaque clôture de bougie
+    (évaluation des signaux), ou 'monitor' toutes les monitor_interval secondes entre deux
+    clôtures quand des positions sont ouvertes. Les heures sont celles du serveur : le décalage
+    avec l'horloge locale est mesuré par fetch_time (milieu de l'aller-retour).
+    """
+
+    def __init__(self, timeframe, monitor_interval=MONITOR_INTERVAL, close_delay=CLOSE_DELAY,
+                 resync_interval=CLOCK_RESYNC_INTERVAL, clock=time.time):
+        self.period = ccxt.Exchange.parse_timeframe(timeframe)
+        self.monitor_interval = monitor_interval
+        self.close_delay = close_delay
+        self.resync_interval = resync_interval
+        self.clock = clock
+        self.offset = 0.0 # Heure serveur - heure locale (s)
+        self.synced_at = None
+        self.next_close = None # Prochaine clôture à traiter (s, heure serveur)
+
+    def set_server_time(self, server_ms, sent, received):
+        """Recale l'horloge sur une heure serveur reçue entre les instants locaux sent et received."""
+        self.offset = server_ms / 1000 - (sent + received) / 2
+        self.synced_at = received
+
+    def needs_sync(self):
+        return self.synced_at is None or self.clock() - self.synced_at >= self.resync_interval
+
+    def sync(self):
+        """Recale l'horloge sur l'heure du serveur de l'exchange."""
+        sent = self.clock()
+        server_ms = exchange.fetch_time()
+        self.set_server_time(server_ms, sent, self.clock())
+
+    def now(self):
+        return self.clock() + self.offset
+
+    def next_event(self, monitoring):
+        """
+        Retourne (événement, clôture, attente en secondes). Au premier appel, la dernière clôture
+        est traitée immédiatement ; après un retard, seule la clôture la plus récente l'est.
+        """
+        now = self.now()
+        last_close = now // self.period * self.period
+        if self.next_close is None or self.next_close < last_close:
+            self.next_close = last_close
+        wait = self.next_close + self.close_delay - now
+        if monitoring and wait > self.monitor_interval:
+            return 'monitor', None, self.monitor_interval
+        close = self.next_close
+        self.next_close = close + self.period
+        return 'close', close, max(wait, 0.0)
+
+def closed_candles(candles, close):
+    """Bougies ouvertes avant la clôture `close` (s) : celle qui vient de s'ouvrir est ignorée."""
+    close_ms = int(close * 1000)
+    return [candle for candle in candles if candle[0] < close_ms]
+
+def close_signal(close):
+    """
+    Signal de croisement à la clôture `close` (s), une fois les bougies intégrées à sma_state.
+    None si les SMA ne sont pas encore calculables (démarrage) ou si l'exchange n'a pas encore
+    publié la bougie qui vient de clôturer : le signal serait celui de la clôture précédente.
+    """
+    if not sma_state.is_ready():
+        write_log(f"Pas assez de données pour l'analyse. Attente {timeframe}...")
+        return None
+    expected = int(close * 1000) - ccxt.Exchange.parse_timeframe(timeframe) * 1000
+    if sma_state.last_timestamp < expected:
+        write_log(f"Bougie du {pd.Timestamp(expected, unit='ms')} pas encore publiée : signal de cette clôture non évalué.")
+        return None
+    return sma_state.check_signal()
+
 def calculate_moving_averages(df):
     """Calcule les moyennes mobiles simples."""
     if len(df) < long_window: # S'assurer d'avoir assez de données
@@ -146,8 +446,8 @@ def fetch_balances():
         write_log(f"Erreur inattendue lors de la récupération des soldes: {e}")
         return 0, 0
 
-def place_order(side, amount):
-    """Place un ordre au marché et gère les erreurs."""
+def place_order(side, amount, market=None):
+    """Place un ordre au marché et gère les erreurs. `market` : informations de la paire (instantané)."""
     try:
         # ccxt gère souvent la précision, mais on peut ajouter un arrondi si nécessaire
         # info = exchange.market(symbol) # Pour obtenir les infos sur le trading pair, lot size, etc.
@@ -155,7 +455,8 @@ def place_order(side, amount):
         
         # Pour une meilleure gestion des arrondis et minima de Binance
         # Récupérer les informations sur la paire pour la précision
-        market = exchange.market(symbol)
+        if market is None:
+            market = exchange.market(symbol)
         amount_precision = market['precision']['amount']
         min_amount = market['limits']['amount']['min']
 
@@ -168,6 +469,7 @@ def place_order(side, amount):
             return None
 
         order = exchange.create_order(symbol, 'market', side, formatted_amount)
+        snapshots.invalidate('balance') # Le solde a changé : il sera relu au prochain instantané
         return order
     except ccxt.InsufficientFunds as e:
         write_log(f"Fonds insuffisants pour placer un ordre {side} de {amount}: {e}")
@@ -192,14 +494,16 @@ def place_order(side, amount):
         write_log(f"Erreur inattendue lors de l'ordre {side}: {e}")
         return None
 
-def get_position_size(usd_balance, current_price):
-    """Calcule la taille de la position en BTC basée sur un pourcentage du solde USD."""
+def get_position_size(usd_balance, current_price, client=None):
+    """
+    Calcule la taille de la position en BTC basée sur un pourcentage du solde USD.
+    `client` : exchange dont la précision est utilisée (celui du module par défaut).
+    """
     size_in_usd = usd_balance * position_sizing_pct
     size_in_btc = size_in_usd / current_price
     
     # Arrondir à la précision requise par l'échange pour BTC
-    market = exchange.market(symbol)
-    size_in_btc = exchange.amount_to_precision(symbol, size_in_btc)
+    size_in_btc = (client or exchange).amount_to_precision(symbol, size_in_btc)
     
     return float(size_in_btc) # Retourner en float pour les calculs
 
@@ -212,218 +516,380 @@ def calculate_win_loss_ratio():
         return wins # Si pas de pertes, le ratio est le nombre de victoires
     return wins / losses
 
-def manage_positions():
+# Messages de déclenchement par (type de position, statut de fermeture)
+EXIT_MESSAGES = {
+    ('long', 'closed_sl'): "STOP LOSS touché pour position LONG (ID: {pos_id}). Vente immédiate à {price:.2f}",
+    ('long', 'closed_tp'): "TAKE PROFIT touché pour position LONG (ID: {pos_id}). Vente à {price:.2f}",
+    ('short', 'closed_sl'): "STOP LOSS touché pour position SHORT (ID: {pos_id}). Achat immédiat à {price:.2f}",
+    ('short', 'closed_tp'): "TAKE PROFIT touché pour position SHORT (ID: {pos_id}). Achat à {price:.2f}",
+}
+
+def exit_orders(snapshot):
+    """
+    Vérifie les stop-loss et take-profit des positions ouvertes au prix de l'instantané.
+    Retourne la liste des fermetures à exécuter : (pos_id, side, status).
     """
-    Gère les positions ouvertes : vérifie les stop-loss et take-profit,
+    current_price = snapshot.price
+    exits = []
+    for pos_id, position in open_positions.items():
+        # Vérifier si la position est toujours "open" et n'est pas déjà protégée par un OCO sur l'exchange
+        if position['status'] != 'open' or not watched_locally(position):
+            continue
+        if position['type'] == 'long': # Position d'achat
+            if current_price <= position['stop_loss']:
+                exits.append((pos_id, 'sell', 'closed_sl'))
+            elif current_price >= position['take_profit']:
+                exits.append((pos_id, 'sell', 'closed_tp'))
+        elif position['type'] == 'short': # Position de vente (spot)
+            # Note: Pour le trading spot, une "position short" est conceptuellement "être en USDT" et attendre d'acheter BTC à bas prix.
+            # Cela signifie que vous avez vendu vos BTC précédemment et attendez de les racheter.
+            # La logique SL/TP est inversée par rapport à un long : SL si le prix monte, TP s'il baisse.
+            if current_price >= position['stop_loss']:
+                exits.append((pos_id, 'buy', 'closed_sl'))
+            elif current_price <= position['take_profit']:
+                exits.append((pos_id, 'buy', 'closed_tp'))
+    for pos_id, side, status in exits:
+        write_log(EXIT_MESSAGES[(open_positions[pos_id]['type'], status)].format(pos_id=pos_id, price=current_price))
+    return exits
+
+def close_position(pos_id, order, price, status):
+    """Enregistre la fermeture d'une position après l'ordre de sortie (ou son échec)."""
+    position = open_positions[pos_id]
+    kind = position['type'].upper()
+    reason = 'SL' if status == 'closed_sl' else 'TP'
+    if not order:
+        write_log(f"Échec de l'ordre de fermeture {reason} pour position {kind} (ID: {pos_id}).")
+        return
+    if position['type'] == 'long':
+        profit_usd = (price - position['entry_price']) * position['amount']
+    else:
+        profit_usd = (position['entry_price'] - price) * position['amount']
+    position.update({
+        'exit_price': price,
+        'profit_usd': profit_usd,
+        'exit_time': datetime.now().isoformat(),
+        'status': status
+    })
+    closed_trades.append(position)
+    del open_positions[pos_id] # Supprimer de la liste des positions ouvertes
+    record_trade_event('close', position)
+    write_log(f"{kind} fermé ({reason}) - Profit: {profit_usd:.2f} USDT")
+
+def manage_positions(snapshot):
+    """
+    Gère les positions ouvertes : vérifie les stop-loss et take-profit au prix de l'instantané,
     et ferme les positions si les conditions sont remplies.
     """
-    global open_positions, closed_trades
+    for pos_id, side, status in exit_orders(snapshot):
+        order = place_order(side, open_positions[pos_id]['amount'], snapshot.market)
+        close_position(pos_id, order, snapshot.price, status)
 
-    ticker = exchange.fetch_ticker(symbol)
-    current_price = ticker['last']
+def entry_order(signal, snapshot, client=None):
+    """
+    Décide d'ouvrir une nouvelle position sur le signal. Retourne (side, size) ou None.
+    Évite d'ouvrir plusieurs positions du même type et de changer de direction trop vite.
+    `client` : exchange qui passera l'ordre (celui du module par défaut), pour la précision de la taille.
+    """
+    usd_balance, btc_balance = snapshot.usd_balance, snapshot.btc_balance
+    current_price = snapshot.price
+    if signal == 'buy' and current_position_type != 'long' and not open_positions: # S'il n'y a pas de position ouverte
+        size = get_position_size(usd_balance, current_price, client)
+        if size <= snapshot.min_amount:
+            write_log(f"Taille d'ACHAT ({size:.6f}) trop faible pour placer un ordre.")
+        # Vérifier si on a assez d'USDT pour l'achat
+        elif usd_balance < current_price * size:
+            write_log(f"Fonds USDT insuffisants pour ACHAT. Solde: {usd_balance:.2f} USDT, Nécessaire: {current_price * size:.2f} USDT")
+        else:
+            return 'buy', size
+    elif signal == 'sell' and current_position_type != 'short' and not open_positions: # S'il n'y a pas de position ouverte
+        # Pour une vente SPOT, la taille est le montant de BTC que vous possédez et êtes prêt à vendre
+        size = btc_balance * position_sizing_pct # Vendre un % de votre BTC
+        if size <= snapshot.min_amount:
+            write_log(f"Taille de VENTE ({size:.6f}) trop faible pour placer un ordre.")
+        elif btc_balance < size:
+            write_log(f"Fonds BTC insuffisants pour VENTE. Solde: {btc_balance:.6f} BTC, Nécessaire: {size:.6f} BTC")
+        else:
+            return 'sell', size
+    return None
 
-    # Itérer sur une copie des clés pour éviter les problèmes de modification en boucle
-    for pos_id in list(open_positions.keys()):
-        position = open_positions[pos_id]
-        
-        # Vérifier si la position est toujours "open"
-        if position['status'] == 'open':
-            if position['type'] == 'long': # Position d'achat
-                # Vérifier Stop Loss
-                if current_price <= position['stop_loss']:
-                    write_log(f"STOP LOSS touché pour position LONG (ID: {pos_id}). Vente immédiate à {current_price:.2f}")
-                    order = place_order('sell', position['amount'])
-                    if order:
-                        profit_usd = (current_price - position['entry_price']) * position['amount']
-                        position.update({
-                            'exit_price': current_price,
-                            'profit_usd': profit_usd,
-                            'exit_time': datetime.now().isoformat(),
-                            'status': 'closed_sl'
-                        })
-                        closed_trades.append(position)
-                        del open_positions[pos_id] # Supprimer de la liste des positions ouvertes
-                        write_log(f"LONG fermé (SL) - Profit: {profit_usd:.2f} USDT")
-                    else:
-                        write_log(f"Échec de l'ordre de fermeture SL pour position LONG (ID: {pos_id}).")
-                
-                # Vérifier Take Profit
-                elif current_price >= position['take_profit']:
-                    write_log(f"TAKE PROFIT touché pour position LONG (ID: {pos_id}). Vente à {current_price:.2f}")
-                    order = place_order('sell', position['amount'])
-                    if order:
-                        profit_usd = (current_price - position['entry_price']) * position['amount']
-                        position.update({
-                            'exit_price': current_price,
-                            'profit_usd': profit_usd,
-                            'exit_time': datetime.now().isoformat(),
-                            'status': 'closed_tp'
-                        })
-                        closed_trades.append(position)
-                        del open_positions[pos_id]
-                        write_log(f"LONG fermé (TP) - Profit: {profit_usd:.2f} USDT")
-                    else:
-                        write_log(f"Échec de l'ordre de fermeture TP pour position LONG (ID: {pos_id}).")
-
-            elif position['type'] == 'short': # Position de vente (spot)
-                # Note: Pour le trading spot, une "position short" est conceptuellement "être en USDT" et attendre d'acheter BTC à bas prix.
-                # Cela signifie que vous avez vendu vos BTC précédemment et attendez de les racheter.
-                # La logique SL/TP est inversée par rapport à un long.
-                
-                # Vérifier Stop Loss (le prix est monté, on rachète à perte)
-                if current_price >= position['stop_loss']:
-                    write_log(f"STOP LOSS touché pour position SHORT (ID: {pos_id}). Achat immédiat à {current_price:.2f}")
-                    order = place_order('buy', position['amount'])
-                    if order:
-                        profit_usd = (position['entry_price'] - current_price) * position['amount']
-                        position.update({
-                            'exit_price': current_price,
-                            'profit_usd': profit_usd,
-                            'exit_time': datetime.now().isoformat(),
-                            'status': 'closed_sl'
-                        })
-                        closed_trades.append(position)
-                        del open_positions[pos_id]
-                        write_log(f"SHORT fermé (SL) - Profit: {profit_usd:.2f} USDT")
-                    else:
-                        write_log(f"Échec de l'ordre de fermeture SL pour position SHORT (ID: {pos_id}).")
-                
-                # Vérifier Take Profit (le prix a baissé, on rachète avec profit)
-                elif current_price <= position['take_profit']:
-                    write_log(f"TAKE PROFIT touché pour position SHORT (ID: {pos_id}). Achat à {current_price:.2f}")
-                    order = place_order('buy', position['amount'])
-                    if order:
-                        profit_usd = (position['entry_price'] - current_price) * position['amount']
-                        position.update({
-                            'exit_price': current_price,
-                            'profit_usd': profit_usd,
-                            'exit_time': datetime.now().isoformat(),
-                            'status': 'closed_tp'
-                        })
-                        closed_trades.append(position)
-                        del open_positions[pos_id]
-                        write_log(f"SHORT fermé (TP) - Profit: {profit_usd:.2f} USDT")
-                    else:
-                        write_log(f"Échec de l'ordre de fermeture TP pour position SHORT (ID: {pos_id}).")
-
-def main():
-    """Fonction principale du bot de trading."""
-    global last_signal, current_position_type, closed_trades
+def open_position(side, order, price):
+    """Enregistre la position ouverte par l'ordre d'entrée (ou son échec)."""
+    global current_position_type
+    if not order:
+        write_log("Échec de l'ordre d'achat." if side == 'buy' else "Échec de l'ordre de vente.")
+        return
+    pos_id = str(datetime.now().timestamp()) # ID unique pour la position
+    if side == 'buy':
+        position_type = 'long'
+        stop_loss = price * (1 - stop_loss_pct)
+        take_profit = price * (1 + take_profit_pct)
+    else:
+        position_type = 'short'
+        stop_loss = price * (1 + stop_loss_pct) # SL pour un short est au-dessus du prix d'entrée
+        take_profit = price * (1 - take_profit_pct) # TP pour un short est en dessous du prix d'entrée
+    open_positions[pos_id] = {
+        'id': pos_id,
+        'type': position_type,
+        'amount': float(order['amount']), # Assurez-vous que c'est le montant réel exécuté
+        'entry_price': float(order['price']), # Assurez-vous que c'est le prix réel exécuté
+        'stop_loss': stop_loss,
+        'take_profit': take_profit,
+        'status': 'open',
+        'entry_time': datetime.now().isoformat()
+    }
+    current_position_type = position_type
+    record_trade_event('open', open_positions[pos_id])
+    action = 'ACHAT' if side == 'buy' else 'VENTE'
+    write_log(f"ORDRE EXÉCUTÉ - {action} {order['amount']} BTC à {order['price']:.2f}. SL: {stop_loss:.2f}, TP: {take_profit:.2f}")
+    return pos_id
+
+# --- Ordres OCO côté exchange ---
+
+def supports_brackets(client=None):
+    """L'exchange propose-t-il l'endpoint OCO utilisé pour protéger les positions ?"""
+    return USE_EXCHANGE_BRACKETS and hasattr(client or exchange, BRACKET_METHOD)
+
+def bracket_client_ids(pos_id):
+    """Identifiants client des jambes de l'OCO d'une position : {'sl': id, 'tp': id}."""
+    return {'sl': f"oco-{pos_id}-sl", 'tp': f"oco-{pos_id}-tp"}
+
+def bracket_params(position, market, client=None):
+    """
+    Paramètres de l'OCO de sortie d'une position : la jambe au-dessus du prix est le TP d'un long
+    (LIMIT_MAKER) ou le SL d'un short (STOP_LOSS), et inversement pour la jambe en dessous.
+    Chaque jambe porte un identifiant client dérivé de la position (voir find_bracket).
+    """
+    client = client or exchange
+    client_ids = bracket_client_ids(position['id'])
+    take_profit = {'Type': 'LIMIT_MAKER', 'Price': client.price_to_precision(symbol, position['take_profit']),
+                   'ClientOrderId': client_ids['tp']}
+    stop_loss = {'Type': 'STOP_LOSS', 'StopPrice': client.price_to_precision(symbol, position['stop_loss']),
+                 'ClientOrderId': client_ids['sl']}
+    above, below = (take_profit, stop_loss) if position['type'] == 'long' else (stop_loss, take_profit)
+    params = {
+        'symbol': market['id'],
+        'side': 'SELL' if position['type'] == 'long' else 'BUY',
+        'quantity': client.amount_to_precision(symbol, position['amount']),
+    }
+    params.update({'above' + key: value for key, value in above.items()})
+    params.update({'below' + key: value for key, value in below.items()})
+    return params
+
+def bracket_legs(response):
+    """Identifiants des deux jambes de l'OCO créé : {'sl': id, 'tp': id}."""
+    legs = {}
+    for report in response['orderReports']:
+        leg = 'sl' if report['type'].startswith('STOP_LOSS') else 'tp'
+        legs[leg] = str(report['orderId'])
+    return legs
+
+def attach_bracket(pos_id, response):
+    """Enregistre l'OCO accepté par l'exchange sur la position."""
+    position = open_positions[pos_id]
+    position['bracket_orders'] = bracket_legs(response)
+    position['oco_id'] = str(response['orderListId'])
+    record_trade_event('update', position)
+    write_log(f"Position {position['type'].upper()} (ID: {pos_id}) protégée par OCO {position['oco_id']} sur l'exchange.")
+
+def find_bracket(pos_id, open_orders):
+    """
+    Cherche parmi les ordres ouverts (format ccxt) les jambes de l'OCO d'une position, reconnues
+    à leur identifiant client. Retourne une réponse au format de l'endpoint OCO, ou None.
+    """
+    client_ids = set(bracket_client_ids(pos_id).values())
+    reports = [order['info'] for order in open_orders if order.get('clientOrderId') in client_ids]
+    if not reports:
+        return None
+    return {'orderListId': reports[0]['orderListId'], 'orderReports': reports}
+
+def resolve_bracket(pos_id, open_orders):
+    """
+    Tranche le sort d'un OCO dont la réponse de création a été perdue : s'il figure parmi les
+    ordres ouverts, il est rattaché à la position, sinon elle repasse en surveillance locale.
+    """
+    position = open_positions[pos_id]
+    was_pending = position.pop('bracket_pending', False)
+    response = find_bracket(pos_id, open_orders)
+    if response is not None:
+        attach_bracket(pos_id, response)
+        return
+    if was_pending:
+        record_trade_event('update', position)
+    write_log(f"Aucun OCO trouvé sur l'exchange pour la position (ID: {pos_id}), surveillance locale des SL/TP.")
+
+def mark_bracket_pending(pos_id, error):
+    """
+    Ordres ouverts illisibles après une réponse d'OCO perdue : l'OCO a peut-être été accepté, la
+    position n'est donc pas surveillée localement (double sortie) et sera revérifiée par reconcile_brackets.
+    """
+    position = open_positions[pos_id]
+    if not position.get('bracket_pending'):
+        position['bracket_pending'] = True
+        record_trade_event('update', position)
+    write_log(f"État de l'OCO de la position (ID: {pos_id}) inconnu ({error}), nouvelle vérification à la prochaine clôture.")
+
+def protect_position(pos_id, market):
+    """
+    Place l'OCO de sortie d'une position ; s'il est refusé, elle reste surveillée localement.
+    Après une erreur réseau (l'exchange a pu accepter l'OCO sans que la réponse arrive), l'OCO
+    est d'abord cherché parmi les ordres ouverts.
+    """
+    if not supports_brackets():
+        return
+    try:
+        response = getattr(exchange, BRACKET_METHOD)(bracket_params(open_positions[pos_id], market))
+    except ccxt.NetworkError as e:
+        write_log(f"Réponse de l'OCO perdue pour la position (ID: {pos_id}), recherche sur l'exchange: {e}")
+        try:
+            resolve_bracket(pos_id, exchange.fetch_open_orders(symbol))
+        except Exception as check_error:
+            mark_bracket_pending(pos_id, check_error)
+        return
+    except Exception as e:
+        write_log(f"OCO refusé pour la position (ID: {pos_id}), surveillance locale des SL/TP: {e}")
+        return
+    attach_bracket(pos_id, response)
+
+def settle_bracket(pos_id, orders):
+    """
+    Rapproche une position de l'état de ses ordres OCO ({'sl': ordre, 'tp': ordre}).
+    Retourne True si la position a été fermée par l'exchange.
+    """
+    for leg, status in (('sl', 'closed_sl'), ('tp', 'closed_tp')):
+        order = orders[leg]
+        if order['status'] == 'closed' and order.get('filled'):
+            write_log(f"Ordre {leg.upper()} exécuté par l'exchange pour la position (ID: {pos_id}).")
+            close_position(pos_id, order, order.get('average') or order['price'], status)
+            return True
+    if not any(order['status'] == 'open' for order in orders.values()):
+        # Les deux jambes ont été annulées ou ont expiré : retour à la surveillance locale
+        write_log(f"OCO de la position (ID: {pos_id}) annulé sur l'exchange, surveillance locale des SL/TP.")
+        del open_positions[pos_id]['bracket_orders']
+        record_trade_event('update', open_positions[pos_id])
+    return False
+
+def protected_positions():
+    return {pos_id: position for pos_id, position in open_positions.items() if position.get('bracket_orders')}
+
+def pending_brackets():
+    """Positions dont l'OCO a peut-être été accepté (réponse perdue, voir mark_bracket_pending)."""
+    return [pos_id for pos_id, position in open_positions.items() if position.get('bracket_pending')]
+
+def reconcile_brackets():
+    """
+    Vérifie l'état des OCO : un seul appel (ordres ouverts) tant que toutes les jambes sont actives,
+    puis le détail des ordres d'une position dont une jambe a quitté le carnet. Les OCO en attente
+    (mark_bracket_pending) sont tranchés sur les mêmes ordres ouverts.
+    Une erreur de l'exchange est journalisée sans interrompre la clôture : les OCO restent en
+    place et sont revérifiés à la clôture suivante, la surveillance locale et l'entrée continuent.
+    """
+    pending = pending_brackets()
+    if not pending and not protected_positions():
+        return
+    try:
+        open_orders = exchange.fetch_open_orders(symbol)
+    except (ccxt.NetworkError, ccxt.ExchangeError) as e:
+        write_log(f"Erreur lors de la lecture des ordres ouverts, OCO revérifiés à la prochaine clôture: {e}")
+        return
+    for pos_id in pending:
+        resolve_bracket(pos_id, open_orders)
+    open_ids = {order['id'] for order in open_orders}
+    for pos_id, position in protected_positions().items():
+        legs = position['bracket_orders']
+        if all(order_id in open_ids for order_id in legs.values()):
+            continue
+        try:
+            orders = {leg: exchange.fetch_order(order_id, symbol) for leg, order_id in legs.items()}
+        except (ccxt.NetworkError, ccxt.ExchangeError) as e:
+            write_log(f"Erreur lors de la lecture de l'OCO de la position (ID: {pos_id}), nouvelle vérification à la prochaine clôture: {e}")
+            continue
+        if settle_bracket(pos_id, orders):
+            snapshots.invalidate('balance')
+
+def watched_locally(position):
+    """Position dont les SL/TP sont surveillés par le bot : ni OCO actif, ni OCO peut-être accepté."""
+    return not position.get('bracket_orders') and not position.get('bracket_pending')
+
+def needs_monitoring():
+    """Des positions ouvertes ne sont protégées que par la surveillance locale des SL/TP."""
+    return any(watched_locally(position) for position in open_positions.values())
+
+def report_status(snapshot):
+    """Affichage des soldes et des statistiques des trades fermés."""
+    usd_balance, btc_balance = snapshot.usd_balance, snapshot.btc_balance
+    total_balance = usd_balance + btc_balance * snapshot.price
+    write_log(f"Solde USDT: {usd_balance:.2f} | BTC: {btc_balance:.6f} | Total USDT: {total_balance:.2f} | Positions ouvertes: {len(open_positions)}")
+
+    if closed_trades:
+        ratio = calculate_win_loss_ratio()
+        total_profit_loss = sum(t.get('profit_usd', 0) for t in closed_trades)
+        write_log(f"Trades fermés: {len(closed_trades)} | Ratio G/P: {ratio:.2f} | Profit/Perte Total: {total_profit_loss:.2f} USDT")
+
+def main(scheduler=None, sleep=time.sleep):
+    """
+    Fonction principale du bot de trading.
+    `scheduler` et `sleep` permettent de la faire tourner sur une horloge virtuelle (voir replay_exchange.py).
+    """
+    global last_signal
     write_log("Démarrage du bot de trading...")
     
-    # Charger les trades fermés existants au démarrage
-    closed_trades = load_closed_trades()
+    # Reprendre les trades fermés et les positions ouvertes depuis le journal
+    recover_state()
+
+    scheduler = scheduler or CandleScheduler(timeframe)
 
     while True:
         try:
-            # 1. Récupérer les données et calculer les indicateurs
-            df = fetch_ohlcv()
-            if df.empty or len(df) < long_window:
-                write_log(f"Pas assez de données pour l'analyse. Attente {timeframe}...")
-                time.sleep(exchange.rateLimit / 1000) # Attendre un peu
+            if scheduler.needs_sync():
+                scheduler.sync()
+
+            # Attente du prochain événement : clôture de bougie, ou surveillance SL/TP entre deux clôtures
+            event, close, wait = scheduler.next_event(monitoring=needs_monitoring())
+            sleep(wait)
+            if event == 'monitor':
+                manage_positions(snapshots.take(candles=False))
+                sync_journal()
                 continue
 
-            df = calculate_moving_averages(df)
-            signal = check_signals(df)
-            
-            # Récupérer les soldes et le prix actuel pour les décisions
-            usd_balance, btc_balance = fetch_balances()
-            ticker = exchange.fetch_ticker(symbol)
-            current_price = ticker['last']
+            # 1. Instantané du marché (bougies, prix, soldes) puis mise à jour des indicateurs (O(1) par bougie) :
+            # la dernière bougie prise en compte est celle qui vient de clôturer
+            snapshot = snapshots.take()
+            sma_state.update(closed_candles(snapshot.candles, close))
+            signal = close_signal(close) # None tant que les SMA ne sont pas prêtes : les positions restent gérées
             
-            # 2. Gérer les positions ouvertes (SL/TP)
-            manage_positions()
-
-            # 3. Décider d'ouvrir une nouvelle position
-            # Logique pour éviter d'ouvrir plusieurs positions du même type et de changer de direction trop vite
-            if signal == 'buy' and current_position_type != 'long' and not open_positions: # S'il n'y a pas de position ouverte
-                size = get_position_size(usd_balance, current_price)
-                if size > exchange.market(symbol)['limits']['amount']['min']:
-                    # Vérifier si on a assez d'USDT pour l'achat
-                    if usd_balance >= current_price * size:
-                        order = place_order('buy', size)
-                        if order:
-                            pos_id = str(datetime.now().timestamp()) # ID unique pour la position
-                            stop_loss = current_price * (1 - stop_loss_pct)
-                            take_profit = current_price * (1 + take_profit_pct)
-                            open_positions[pos_id] = {
-                                'id': pos_id,
-                                'type': 'long',
-                                'amount': float(order['amount']), # Assurez-vous que c'est le montant réel exécuté
-                                'entry_price': float(order['price']), # Assurez-vous que c'est le prix réel exécuté
-                                'stop_loss': stop_loss,
-                                'take_profit': take_profit,
-                                'status': 'open',
-                                'entry_time': datetime.now().isoformat()
-                            }
-                            current_position_type = 'long'
-                            write_log(f"ORDRE EXÉCUTÉ - ACHAT {order['amount']} BTC à {order['price']:.2f}. SL: {stop_loss:.2f}, TP: {take_profit:.2f}")
-                        else:
-                            write_log("Échec de l'ordre d'achat.")
-                    else:
-                        write_log(f"Fonds USDT insuffisants pour ACHAT. Solde: {usd_balance:.2f} USDT, Nécessaire: {current_price * size:.2f} USDT")
-                else:
-                    write_log(f"Taille d'ACHAT ({size:.6f}) trop faible pour placer un ordre.")
-
-            elif signal == 'sell' and current_position_type != 'short' and not open_positions: # S'il n'y a pas de position ouverte
-                # Pour une vente SPOT, la taille est le montant de BTC que vous possédez et êtes prêt à vendre
-                size = btc_balance * position_sizing_pct # Vendre un % de votre BTC
-                if size > exchange.market(symbol)['limits']['amount']['min']:
-                    if btc_balance >= size:
-                        order = place_order('sell', size)
-                        if order:
-                            pos_id = str(datetime.now().timestamp())
-                            stop_loss = current_price * (1 + stop_loss_pct) # SL pour un short est au-dessus du prix d'entrée
-                            take_profit = current_price * (1 - take_profit_pct) # TP pour un short est en dessous du prix d'entrée
-                            open_positions[pos_id] = {
-                                'id': pos_id,
-                                'type': 'short',
-                                'amount': float(order['amount']),
-                                'entry_price': float(order['price']),
-                                'stop_loss': stop_loss,
-                                'take_profit': take_profit,
-                                'status': 'open',
-                                'entry_time': datetime.now().isoformat()
-                            }
-                            current_position_type = 'short'
-                            write_log(f"ORDRE EXÉCUTÉ - VENTE {order['amount']} BTC à {order['price']:.2f}. SL: {stop_loss:.2f}, TP: {take_profit:.2f}")
-                        else:
-                            write_log("Échec de l'ordre de vente.")
-                    else:
-                        write_log(f"Fonds BTC insuffisants pour VENTE. Solde: {btc_balance:.6f} BTC, Nécessaire: {size:.6f} BTC")
-                else:
-                    write_log(f"Taille de VENTE ({size:.6f}) trop faible pour placer un ordre.")
+            # 2. Gérer les positions ouvertes : sorties exécutées par les OCO, puis SL/TP surveillés localement
+            reconcile_brackets()
+            manage_positions(snapshot)
+
+            # 3. Décider d'ouvrir une nouvelle position, protégée par un OCO sur l'exchange
+            entry = entry_order(signal, snapshot)
+            if entry:
+                side, size = entry
+                pos_id = open_position(side, place_order(side, size, snapshot.market), snapshot.price)
+                if pos_id:
+                    protect_position(pos_id, snapshot.market)
 
             # Mise à jour du last_signal pour éviter les trades multiples sur le même signal si la position n'a pas été ouverte
             last_signal = signal
             
             # 4. Affichage des informations en temps réel
-            total_balance = usd_balance + btc_balance * current_price
-            write_log(f"Solde USDT: {usd_balance:.2f} | BTC: {btc_balance:.6f} | Total USDT: {total_balance:.2f} | Positions ouvertes: {len(open_positions)}")
+            report_status(snapshot)
 
-            if closed_trades:
-                ratio = calculate_win_loss_ratio()
-                total_profit_loss = sum(t.get('profit_usd', 0) for t in closed_trades)
-                write_log(f"Trades fermés: {len(closed_trades)} | Ratio G/P: {ratio:.2f} | Profit/Perte Total: {total_profit_loss:.2f} USDT")
-
-            # 5. Sauvegarder les trades fermés régulièrement
-            save_closed_trades()
-            
-            # 6. Attente avant la prochaine itération
-            time.sleep(5)
+            # 5. Rendre durables les événements de trading de cette clôture
+            sync_journal()
 
         except ccxt.DDoSProtection as e:
             write_log(f"Protection DDoS activée. Attente prolongée: {e}")
-            time.sleep(exchange.rateLimit / 1000 * 2) # Attendre plus longtemps
+            sleep(exchange.rateLimit / 1000 * 2) # Attendre plus longtemps
         except ccxt.NetworkError as e:
             write_log(f"Erreur réseau générale: {e}. Nouvelle tentative dans 10s.")
-            time.sleep(10)
+            sleep(10)
         except ccxt.ExchangeError as e:
             write_log(f"Erreur d'échange générale: {e}. Nouvelle tentative dans 10s.")
-            time.sleep(10)
+            sleep(10)
         except Exception as e:
             write_log(f"Erreur inattendue dans la boucle principale: {e}. Nouvelle tentative dans 10s.")
-            time.sleep(10)
+            sleep(10)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
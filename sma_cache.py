@@ -0,0 +1,113 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# --- Cache de moyennes mobiles simples (SMA) pour toutes les fenêtres ---
+# Une seule passe de sommes cumulées sur les clôtures permet ensuite d'obtenir la SMA
+# de n'importe quelle fenêtre en O(1) par bougie. Les sommes cumulées repartent de zéro
+# tous les ANCHOR_INTERVAL bougies (ré-ancrage) : les valeurs additionnées restent petites,
+# donc l'erreur d'arrondi ne dérive pas sur 1.5M de bougies. Elle reste de l'ordre de 1e-15
+# en relatif, comme celle de pandas.rolling().mean() : backtester.crossover_signals traite
+# un écart de cet ordre comme une égalité, les croisements sont donc ceux de run_backtest.
+
+ANCHOR_INTERVAL = 4096 # Nombre de bougies entre deux ré-ancrages des sommes cumulées
+DEFAULT_MEMORY_BUDGET_MB = 512 # Mémoire maximale occupée par les SMA matérialisées
+
+
+class SMACache:
+    """
+    Calcule et mémorise les SMA (min_periods=1, comme dans le backtester) de la série `close`.
+    Les tableaux matérialisés sont gardés dans un LRU borné par `memory_budget_mb`.
+    """
+
+    def __init__(self, close, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, anchor_interval=ANCHOR_INTERVAL):
+        self.close = np.asarray(close, dtype=np.float64)
+        self.anchor_interval = anchor_interval
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._smas = OrderedDict()
+        self._build_prefix_sums()
+
+    def _build_prefix_sums(self):
+        """
+        Sommes cumulées par blocs de anchor_interval bougies (une seule passe sur les clôtures).
+        Dans chaque bloc on cumule l'écart à la première clôture du bloc (son ancre), pas le prix
+        brut : les sommes restent de l'ordre de quelques milliers et gardent toute leur précision.
+        """
+        n = len(self.close)
+        k = self.anchor_interval
+        block_count = n // k + 1 # Les indices de préfixe vont de 0 à n inclus
+        anchors = self.close[::k]
+        padded = np.zeros(block_count * k, dtype=np.float64)
+        padded[:n] = self.close - np.repeat(anchors, k)[:n]
+        blocks = padded.reshape(block_count, k)
+        inclusive = np.cumsum(blocks, axis=1)
+        # local[p] = somme des écarts depuis le début du bloc de p jusqu'à p-1 (0 à chaque ancrage)
+        local = np.zeros_like(inclusive)
+        local[:, 1:] = inclusive[:, :-1]
+        self._local = local.ravel()[:n + 1]
+        positions = np.arange(n + 1, dtype=np.int64)
+        blocks_of = positions // k
+        self._anchor_at = np.append(anchors, anchors[-1])[blocks_of] # Ancre du bloc de chaque indice
+        self._block_of = blocks_of
+        self._rest_of_block = inclusive[:, -1][blocks_of] - self._local # Écarts de p jusqu'à la fin du bloc
+        self._into_block = positions - blocks_of * k # Nombre de bougies entre le début du bloc et p
+
+        # Longueur de la série de valeurs identiques se terminant à chaque bougie
+        changes = np.flatnonzero(np.diff(self.close) != 0) + 1
+        run_start = np.zeros(n, dtype=np.int64)
+        run_start[changes] = changes
+        np.maximum.accumulate(run_start, out=run_start)
+        self._same_value_run = np.arange(n, dtype=np.int64) - run_start + 1
+
+    def compute(self, window):
+        """Calcule la SMA d'une fenêtre sans passer par le cache."""
+        n = len(self.close)
+        if window > self.anchor_interval or window > n:
+            # Fenêtre plus longue qu'un bloc : calcul direct, rare pour des bougies 1m
+            return pd.Series(self.close).rolling(window=window, min_periods=1).mean().to_numpy()
+
+        sma = np.empty(n, dtype=np.float64)
+        # Fenêtres incomplètes du début de série (min_periods=1)
+        sma[:window - 1] = np.cumsum(self.close[:window - 1]) / np.arange(1, window)
+
+        # Fenêtres complètes [start, end) : au plus une frontière de bloc traversée
+        start = slice(0, n + 1 - window)
+        end = slice(window, n + 1)
+        anchor = self._anchor_at[start]
+        crosses = self._block_of[end] != self._block_of[start]
+        sums = np.where(crosses,
+                        self._rest_of_block[start] + self._local[end]
+                        + self._into_block[end] * (self._anchor_at[end] - anchor),
+                        self._local[end] - self._local[start])
+        sums += window * anchor
+        sma[window - 1:] = sums / window
+
+        # Fenêtre de valeurs toutes identiques : la moyenne est exactement cette valeur (comme pandas)
+        flat = self._same_value_run[window - 1:] >= window
+        sma[window - 1:][flat] = self.close[window - 1:][flat]
+        return sma
+
+    def get(self, window):
+        """Retourne la SMA de `window` (tableau en lecture seule), calculée au besoin et mémorisée."""
+        sma = self._smas.get(window)
+        if sma is not None:
+            self._smas.move_to_end(window)
+            self.hits += 1
+            return sma
+        self.misses += 1
+        sma = self.compute(window)
+        sma.flags.writeable = False
+        self._smas[window] = sma
+        self.memory_used += sma.nbytes
+        # Éviction des SMA les moins récemment utilisées au-delà du budget mémoire
+        while self.memory_used > self.memory_budget and len(self._smas) > 1:
+            _, evicted = self._smas.popitem(last=False)
+            self.memory_used -= evicted.nbytes
+        return sma
+
+    def __len__(self):
+        return len(self._smas)
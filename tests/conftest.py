@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kline_server import KlineArchiveServer  # noqa: E402
+
+
+@pytest.fixture
+def kline_server(monkeypatch):
+    """Serveur d'archives local ; data_downloader télécharge depuis lui pendant le test."""
+    import data_downloader
+    server = KlineArchiveServer().start()
+    monkeypatch.setattr(data_downloader, 'BINANCE_DATA_BASE_URL', server.base_url)
+    yield server
+    server.stop()
@@ -0,0 +1,114 @@
+import calendar
+import functools
+import hashlib
+import io
+import os
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Serveur local imitant data.binance.vision ---
+# Sert les archives de klines (daily/monthly) et leurs .CHECKSUM à partir des CSV journaliers
+# de temp_data : une archive journalière contient le CSV du jour, une archive mensuelle les CSV
+# de tous les jours du mois (introuvable si un jour manque, comme un mois pas encore publié).
+# Le serveur note chaque requête et chaque connexion cliente, et peut simuler des archives
+# absentes, des .CHECKSUM absents ou faux.
+
+TEMP_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'temp_data')
+
+
+@functools.lru_cache(maxsize=None)
+def build_archive(data_dir, symbol, timeframe, date_type, date_str):
+    """Contenu (bytes) de l'archive ZIP `date_type`/`date_str`, ou None si des données manquent."""
+    if date_type == 'daily':
+        days = [date_str]
+    else:
+        year, month = map(int, date_str.split('-'))
+        days = [f"{date_str}-{day:02d}" for day in range(1, calendar.monthrange(year, month)[1] + 1)]
+    paths = [os.path.join(data_dir, f"{symbol}-{timeframe}-{day}.csv") for day in days]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as z:
+        with z.open(f"{symbol}-{timeframe}-{date_str}.csv", 'w') as member:
+            for path in paths:
+                with open(path, 'rb') as f:
+                    member.write(f.read())
+    return buffer.getvalue()
+
+
+class KlineArchiveServer:
+    """
+    Serveur HTTP (thread de fond) sur 127.0.0.1, port libre. `base_url` remplace
+    data_downloader.BINANCE_DATA_BASE_URL. Les ensembles `missing`, `no_checksum` et
+    `bad_checksums` contiennent des noms d'archives (ex: 'BTCUSDT-1m-2025-02.zip').
+    """
+
+    def __init__(self, data_dir=TEMP_DATA_DIR):
+        self.data_dir = data_dir
+        self.missing = set() # Archives absentes (404)
+        self.no_checksum = set() # Archives sans .CHECKSUM publié (404)
+        self.bad_checksums = set() # Archives dont le .CHECKSUM publié est faux
+        self.requests = [] # (heure time.monotonic() de réception, chemin)
+        self.connections = set() # (adresse, port) des connexions clientes
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def paths(self):
+        return [path for _, path in self.requests]
+
+    def respond(self, path):
+        """(statut, corps) pour `path` de la forme /{daily|monthly}/klines/{symbole}/{timeframe}/{fichier}."""
+        parts = path.strip('/').split('/')
+        if len(parts) != 5 or parts[0] not in ('daily', 'monthly') or parts[1] != 'klines':
+            return 404, b''
+        date_type, _, symbol, timeframe, filename = parts
+        checksum = filename.endswith('.CHECKSUM')
+        archive_name = filename[:-len('.CHECKSUM')] if checksum else filename
+        prefix = f"{symbol}-{timeframe}-"
+        if not archive_name.startswith(prefix) or not archive_name.endswith('.zip') or archive_name in self.missing:
+            return 404, b''
+        content = build_archive(self.data_dir, symbol, timeframe, date_type, archive_name[len(prefix):-len('.zip')])
+        if content is None:
+            return 404, b''
+        if not checksum:
+            return 200, content
+        if archive_name in self.no_checksum:
+            return 404, b''
+        digest = hashlib.sha256(content).hexdigest()
+        if archive_name in self.bad_checksums:
+            digest = hashlib.sha256(content + b'corrompu').hexdigest()
+        return 200, f"{digest}  {archive_name}\n".encode()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # Connexions keep-alive, comme le vrai serveur
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests.append((time.monotonic(), self.path))
+                    server.connections.add(self.client_address)
+                status, body = server.respond(self.path)
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,106 @@
+import asyncio
+import math
+
+import ccxt
+import pytest
+
+import async_bot
+import scalping_bot as bot
+
+PRICE = 101.0
+
+
+class MarketsRequiredExchange:
+    """
+    Exchange asynchrone factice qui, comme ccxt, refuse d'arrondir une quantité tant que
+    load_markets() n'a pas été appelé. Les ordres passés sont gardés dans `orders`.
+    """
+
+    rateLimit = 50
+
+    def __init__(self, candles):
+        self.candles = candles
+        self.markets = None
+        self.orders = []
+
+    async def load_markets(self):
+        self.markets = {bot.symbol: self.market(bot.symbol)}
+        return self.markets
+
+    def market(self, market_symbol):
+        return {'id': 'BTCUSDT', 'symbol': market_symbol, 'precision': {'amount': 5, 'price': 2},
+                'limits': {'amount': {'min': 0.00001}}}
+
+    def amount_to_precision(self, market_symbol, amount):
+        if self.markets is None:
+            raise ccxt.ExchangeError("binance markets not loaded")
+        return f"{math.floor(float(amount) * 1e5) / 1e5:.5f}"
+
+    async def fetch_ohlcv(self, market_symbol, tf, since=None, limit=None):
+        return [list(candle) for candle in self.candles]
+
+    async def fetch_ticker(self, market_symbol):
+        return {'last': PRICE}
+
+    async def fetch_balance(self):
+        return {'total': {'USDT': 10000.0, 'BTC': 0.0}}
+
+    async def create_order(self, market_symbol, order_type, side, amount, price=None, params=None):
+        order = {'id': str(len(self.orders) + 1), 'side': side, 'amount': float(amount), 'price': PRICE,
+                 'average': PRICE, 'filled': float(amount), 'status': 'closed'}
+        self.orders.append(order)
+        return order
+
+
+@pytest.fixture
+def fresh_bot(monkeypatch, tmp_path):
+    """État du bot remis à zéro ; l'exchange synchrone du module ne doit pas servir."""
+    monkeypatch.setattr(bot, 'exchange', None)
+    monkeypatch.setattr(bot, 'sma_state', bot.IncrementalSMA(bot.short_window, bot.long_window))
+    monkeypatch.setattr(bot, 'open_positions', {})
+    monkeypatch.setattr(bot, 'closed_trades', [])
+    monkeypatch.setattr(bot, 'current_position_type', None)
+    monkeypatch.setattr(bot, 'last_signal', None)
+    monkeypatch.setattr(bot, 'journal', None)
+    monkeypatch.setattr(bot, 'activity_log_file', str(tmp_path / 'activity.log'))
+    yield
+    bot.close_log()
+
+
+def test_buy_tick_sizes_order_with_async_client(fresh_bot):
+    # long_window bougies plates puis une hausse : croisement haussier à la clôture de la dernière
+    candles = [[60_000 * i, 100.0, 100.0, 100.0, 100.0, 1.0] for i in range(bot.long_window)]
+    candles.append([60_000 * bot.long_window, 100.0, PRICE, 100.0, PRICE, 1.0])
+    candles.append([60_000 * (bot.long_window + 1), PRICE, PRICE, PRICE, PRICE, 1.0]) # Bougie qui vient de s'ouvrir
+    exchange = MarketsRequiredExchange(candles)
+
+    async def tick():
+        await exchange.load_markets()
+        provider = async_bot.AsyncSnapshotProvider(exchange)
+        return await async_bot.run_tick(provider, close=(bot.long_window + 1) * 60)
+
+    assert asyncio.run(tick()) == 'buy'
+    expected_size = math.floor(10000.0 * bot.position_sizing_pct / PRICE * 1e5) / 1e5
+    assert [(order['side'], order['amount']) for order in exchange.orders] == [('buy', expected_size)]
+    [position] = bot.open_positions.values()
+    assert position['type'] == 'long' and position['amount'] == expected_size
+    assert position['stop_loss'] == pytest.approx(PRICE * (1 - bot.stop_loss_pct))
+    assert bot.current_position_type == 'long'
+
+
+def test_positions_are_managed_while_sma_warm_up(fresh_bot):
+    # Redémarrage avec une position ouverte et trop peu de bougies pour les SMA : le SL est quand même géré
+    bot.open_positions['1'] = {'id': '1', 'type': 'long', 'amount': 0.5, 'entry_price': 110.0,
+                               'stop_loss': 105.0, 'take_profit': 120.0, 'status': 'open',
+                               'entry_time': '2025-01-01T00:00:00'}
+    exchange = MarketsRequiredExchange([[60_000 * i, PRICE, PRICE, PRICE, PRICE, 1.0] for i in range(3)])
+
+    async def tick():
+        await exchange.load_markets()
+        return await async_bot.run_tick(async_bot.AsyncSnapshotProvider(exchange), close=3 * 60)
+
+    assert asyncio.run(tick()) is None
+    assert not bot.sma_state.is_ready()
+    assert [(order['side'], order['amount']) for order in exchange.orders] == [('sell', 0.5)]
+    assert bot.open_positions == {}
+    assert [trade['status'] for trade in bot.closed_trades] == ['closed_sl']
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+import time
+
+import data_downloader
+from kline_server import KlineArchiveServer, TEMP_DATA_DIR
+from ohlcv_store import OHLCVStore
+
+SYMBOL = 'BTC/USDT'
+TIMEFRAME = '1m'
+BARS_PER_DAY = 1440
+
+
+def archive_url(date_type, date_str):
+    return data_downloader.get_binance_data_url(SYMBOL, TIMEFRAME, date_type, date_str)
+
+
+def test_download_zip_accepts_archive_matching_its_checksum(kline_server):
+    content = data_downloader.download_zip(archive_url('daily', '2025-01-02'))
+    assert content is not None
+    assert f"{hashlib.sha256(content).hexdigest()}  BTCUSDT-1m-2025-01-02.zip\n".encode() == \
+        kline_server.respond('/daily/klines/BTCUSDT/1m/BTCUSDT-1m-2025-01-02.zip.CHECKSUM')[1]
+    assert len(data_downloader.read_kline_zip(content)) == BARS_PER_DAY
+
+
+def test_download_zip_rejects_archive_with_wrong_checksum(kline_server):
+    kline_server.bad_checksums.add('BTCUSDT-1m-2025-01-02.zip')
+    assert data_downloader.download_zip(archive_url('daily', '2025-01-02')) is None
+
+
+def test_download_zip_without_published_checksum_is_kept(kline_server):
+    kline_server.no_checksum.add('BTCUSDT-1m-2025-01-02.zip')
+    assert data_downloader.download_zip(archive_url('daily', '2025-01-02')) is not None
+
+
+def test_download_zip_returns_none_for_missing_archive(kline_server):
+    assert data_downloader.download_zip(archive_url('daily', '2031-01-01')) is None
+
+
+def test_rate_limiter_spaces_request_starts_across_threads():
+    limiter = data_downloader.RateLimiter(50)
+    starts = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(5):
+            limiter.wait()
+            with lock:
+                starts.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Les créneaux sont espacés de 1/50 s : 20 démarrages couvrent au moins 19 intervalles
+    assert len(starts) == 20
+    assert max(starts) - min(starts) >= 19 / 50 - 0.01
+
+
+def test_sync_downloads_plan_over_pooled_rate_limited_session(kline_server, tmp_path):
+    added = data_downloader.sync_historical_data(SYMBOL, TIMEFRAME, '2025-01-30', '2025-03-02', store_dir=str(tmp_path),
+                                                 data_granularity='monthly', max_in_flight=2, requests_per_second=40)
+    assert added == 32
+    archives = sorted(path.rsplit('/', 1)[1] for path in kline_server.paths() if path.endswith('.zip'))
+    assert archives == ['BTCUSDT-1m-2025-01-30.zip', 'BTCUSDT-1m-2025-01-31.zip', 'BTCUSDT-1m-2025-02.zip',
+                        'BTCUSDT-1m-2025-03-01.zip', 'BTCUSDT-1m-2025-03-02.zip']
+    # Session keep-alive partagée : pas plus de connexions que de téléchargements simultanés
+    assert len(kline_server.connections) <= 2
+    # Limiteur : les 10 requêtes (archives et .CHECKSUM) démarrent à 1/40 s d'intervalle au moins
+    times = sorted(received for received, _ in kline_server.requests)
+    assert len(times) == 10
+    assert times[-1] - times[0] >= 9 / 40 - 0.02
+    df = OHLCVStore(str(tmp_path)).query(SYMBOL, TIMEFRAME, '2025-01-30', '2025-03-02')
+    assert len(df) == 32 * BARS_PER_DAY
+
+
+def test_sync_merges_partitions_and_reports_gaps(monkeypatch, tmp_path, capsys):
+    # 2025-01-02 privé de 10 bougies au milieu et des 5 dernières ; 2025-01-03 absent
+    data_dir = tmp_path / 'archives'
+    data_dir.mkdir()
+    for day_str, dropped in (('2025-01-01', []), ('2025-01-02', list(range(600, 610)) + list(range(1435, 1440)))):
+        with open(os.path.join(TEMP_DATA_DIR, f'BTCUSDT-1m-{day_str}.csv')) as f:
+            lines = [line for i, line in enumerate(f) if i not in dropped]
+        (data_dir / f'BTCUSDT-1m-{day_str}.csv').write_text(''.join(lines))
+    server = KlineArchiveServer(str(data_dir)).start()
+    monkeypatch.setattr(data_downloader, 'BINANCE_DATA_BASE_URL', server.base_url)
+    try:
+        added = data_downloader.sync_historical_data(SYMBOL, TIMEFRAME, '2025-01-01', '2025-01-03',
+                                                     store_dir=str(tmp_path / 'store'), data_granularity='daily',
+                                                     requests_per_second=None)
+    finally:
+        server.stop()
+    assert added == 2
+    output = capsys.readouterr().out
+    assert "10 bougies manquantes de 2025-01-02 10:00:00 à 2025-01-02 10:09:00" in output
+    assert "5 bougies manquantes de 2025-01-02 23:55:00 à 2025-01-02 23:59:00" in output
+    assert f"{BARS_PER_DAY} bougies manquantes de 2025-01-03 00:00:00 à 2025-01-03 23:59:00" in output
+    assert f"1 jours en échec (retentés à la prochaine synchronisation), 3 trous ({15 + BARS_PER_DAY} bougies manquantes)" in output
+    store = OHLCVStore(str(tmp_path / 'store'))
+    assert store.entry(SYMBOL, TIMEFRAME, '2025-01-02')['rows'] == BARS_PER_DAY - 15
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pandas as pd
+
+import data_downloader
+
+SYMBOL = 'BTC/USDT'
+TIMEFRAME = '1m'
+BARS_PER_DAY = 1440
+
+
+def day(text):
+    return datetime.strptime(text, '%Y-%m-%d')
+
+
+def test_plan_uses_monthly_archives_for_full_closed_months_only():
+    plan = data_downloader.plan_downloads(day('2025-01-30'), day('2025-04-02'), 'monthly', today=day('2025-06-15'))
+    assert [(date_type, date_str) for date_type, date_str, _, _ in plan] == [
+        ('daily', '2025-01-30'), ('daily', '2025-01-31'),
+        ('monthly', '2025-02'), ('monthly', '2025-03'),
+        ('daily', '2025-04-01'), ('daily', '2025-04-02'),
+    ]
+    assert plan[2][2:] == (day('2025-02-01'), day('2025-02-28'))
+
+
+def test_plan_keeps_current_month_and_daily_granularity_on_daily_files():
+    current = data_downloader.plan_downloads(day('2025-06-01'), day('2025-06-30'), 'monthly', today=day('2025-06-15'))
+    assert {date_type for date_type, _, _, _ in current} == {'daily'}
+    assert len(current) == 30
+    daily = data_downloader.plan_downloads(day('2025-02-01'), day('2025-03-31'), 'daily', today=day('2025-06-15'))
+    assert len(daily) == 59 and {date_type for date_type, _, _, _ in daily} == {'daily'}
+
+
+def test_plan_item_is_clipped_to_its_period(kline_server):
+    df = data_downloader.fetch_plan_item(SYMBOL, TIMEFRAME, ('monthly', '2025-02', day('2025-02-10'), day('2025-02-11')))
+    assert len(df) == 2 * BARS_PER_DAY
+    assert df['timestamp'].min() == pd.Timestamp('2025-02-10')
+    assert df['timestamp'].max() == pd.Timestamp('2025-02-11 23:59')
+
+
+def test_missing_monthly_archive_falls_back_to_daily_files(kline_server):
+    kline_server.missing.add('BTCUSDT-1m-2025-02.zip')
+    df = data_downloader.fetch_plan_item(SYMBOL, TIMEFRAME, ('monthly', '2025-02', day('2025-02-01'), day('2025-02-28')))
+    assert len(df) == 28 * BARS_PER_DAY
+    daily_requests = [path for path in kline_server.paths() if path.startswith('/daily/') and path.endswith('.zip')]
+    assert len(daily_requests) == 28
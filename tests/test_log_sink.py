@@ -0,0 +1,45 @@
+import atexit
+import os
+
+from log_sink import LogSink
+
+
+def test_rotation_counts_bytes_of_accented_messages(tmp_path):
+    path = str(tmp_path / 'activity.log')
+    message = "Réponse de l'OCO perdue : état à vérifier " + 'é' * 200
+    sink = LogSink(path, echo=False, max_bytes=4096)
+    for _ in range(40):
+        sink.write(message)
+        sink.flush()
+    sink.close()
+    assert sink.rotations > 0
+    for name in os.listdir(tmp_path):
+        assert os.path.getsize(tmp_path / name) <= 4096
+
+
+def test_closed_sink_is_no_longer_registered_at_exit(tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, 'register', registered.append)
+    monkeypatch.setattr(atexit, 'unregister', registered.remove)
+    sink = LogSink(str(tmp_path / 'activity.log'), echo=False)
+    assert registered == [sink.close]
+    sink.close()
+    assert registered == []
+
+
+def test_write_after_close_is_written_synchronously(tmp_path):
+    path = tmp_path / 'activity.log'
+    sink = LogSink(str(path), echo=False)
+    sink.write("avant la fermeture")
+    sink.close()
+    sink.write("après la fermeture")
+    assert sink.dropped == 0
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert [line.split('] ', 1)[1] for line in lines] == ["avant la fermeture", "après la fermeture"]
+
+
+def test_failed_write_after_close_is_counted_as_dropped(tmp_path):
+    sink = LogSink(str(tmp_path / 'missing' / 'activity.log'), echo=False)
+    sink.close()
+    sink.write("après la fermeture")
+    assert sink.dropped == 1
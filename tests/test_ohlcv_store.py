@@ -0,0 +1,33 @@
+import numpy as np
+
+import data_downloader
+from ohlcv_store import OHLCVStore
+
+SYMBOL = 'BTC/USDT'
+TIMEFRAME = '1m'
+
+
+def test_same_size_corruption_is_detected_and_repaired_by_sync(kline_server, tmp_path):
+    store_dir = str(tmp_path)
+    assert data_downloader.sync_historical_data(SYMBOL, TIMEFRAME, '2025-01-01', '2025-01-03', store_dir=store_dir,
+                                                data_granularity='daily', requests_per_second=None) == 3
+    store = OHLCVStore(store_dir)
+    original = store.read_day(SYMBOL, TIMEFRAME, '2025-01-02')['close']
+
+    # Une clôture réécrite en place : même taille de fichier, contenu différent
+    path = store.column_path(SYMBOL, TIMEFRAME, '2025-01-02', 'close')
+    corrupted = original.copy()
+    corrupted[100] += 1.0
+    np.save(path, corrupted)
+    assert store.has_day(SYMBOL, TIMEFRAME, '2025-01-02')
+    assert not store.has_day(SYMBOL, TIMEFRAME, '2025-01-02', verify=True)
+    assert store.has_day(SYMBOL, TIMEFRAME, '2025-01-01', verify=True)
+
+    kline_server.requests.clear()
+    assert data_downloader.sync_historical_data(SYMBOL, TIMEFRAME, '2025-01-01', '2025-01-03', store_dir=store_dir,
+                                                data_granularity='daily', requests_per_second=None) == 1
+    assert [path for path in kline_server.paths() if path.endswith('.zip')] == \
+        ['/daily/klines/BTCUSDT/1m/BTCUSDT-1m-2025-01-02.zip']
+    repaired = OHLCVStore(store_dir)
+    assert repaired.has_day(SYMBOL, TIMEFRAME, '2025-01-02', verify=True)
+    np.testing.assert_array_equal(repaired.read_day(SYMBOL, TIMEFRAME, '2025-01-02')['close'], original)
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester
+import parameter_sweep
+
+
+@pytest.fixture
+def csv_frame(tmp_path):
+    """Deux jours de bougies 1m relus depuis un CSV, comme `parameter_sweep.py fichier.csv` (timestamp datetime64[us])."""
+    data = pd.concat(backtester.iter_daily_klines(start_date='2025-01-01', end_date='2025-01-02'), ignore_index=True)
+    path = tmp_path / 'historical.csv'
+    data[['timestamp', 'open', 'high', 'low', 'close', 'volume']].to_csv(path, index=False)
+    return backtester.load_historical_data(str(path))
+
+
+def test_export_shared_arrays_stores_nanoseconds(csv_frame, tmp_path):
+    parameter_sweep.export_shared_arrays(csv_frame, str(tmp_path))
+    timestamps = np.load(os.path.join(tmp_path, 'timestamp.npy'))
+    assert timestamps.dtype == np.int64
+    expected = csv_frame['timestamp'].to_numpy().astype('datetime64[ns]')
+    assert np.array_equal(timestamps.view('datetime64[ns]'), expected)
+
+
+def test_sweep_metrics_match_backtest_on_csv_frame(csv_frame, monkeypatch):
+    # Métriques calculées par run_backtest, capturées au passage
+    computed = []
+    compute_metrics = backtester.backtest_metrics.compute_metrics
+    monkeypatch.setattr(backtester.backtest_metrics, 'compute_metrics',
+                        lambda *args: computed.append(compute_metrics(*args)) or computed[-1])
+    backtester.run_backtest(csv_frame, journal=backtester.BacktestJournal(level=backtester.JOURNAL_SILENT))
+    monkeypatch.undo()
+    [expected] = computed
+
+    grid = [(backtester.SHORT_WINDOW, backtester.LONG_WINDOW, backtester.STOP_LOSS_PCT, backtester.TAKE_PROFIT_PCT,
+             backtester.POSITION_SIZING_PCT)]
+    [row] = parameter_sweep.run_sweep(csv_frame, grid, workers=1, intrabar=False).to_dict('records')
+    assert row['trades'] > 0
+    for metric in ('sharpe', 'sortino', 'max_drawdown_pct', 'exposure_pct', 'profit_factor'):
+        assert row[metric] == pytest.approx(expected[metric]), metric
@@ -0,0 +1,154 @@
+import ccxt
+import numpy as np
+import pytest
+
+import scalping_bot as bot
+from replay_exchange import ReplayExchange, VirtualClock
+
+PERIOD = 60
+ENTRY = 100.0
+STOP_LOSS = 98.0
+TAKE_PROFIT = 102.0
+AMOUNT = 0.5
+
+
+def flat_bars(count, spikes=None):
+    """`count` bougies 1m plates à ENTRY ; `spikes` : {index: (low, high)}."""
+    low = np.full(count, ENTRY)
+    high = np.full(count, ENTRY)
+    for i, (bar_low, bar_high) in (spikes or {}).items():
+        low[i], high[i] = bar_low, bar_high
+    return {'timestamp': np.arange(count, dtype=np.int64) * PERIOD * 1_000_000_000, 'open': np.full(count, ENTRY),
+            'high': high, 'low': low, 'close': np.full(count, ENTRY), 'volume': np.ones(count)}
+
+
+def replay_bot(monkeypatch, tmp_path, data, published=3):
+    """Bot branché sur un ReplayExchange dont `published` bougies sont clôturées, avec une position LONG ouverte."""
+    clock = VirtualClock(published * PERIOD)
+    replay = ReplayExchange(data, clock, balances={'USDT': 0.0, 'BTC': AMOUNT})
+    monkeypatch.setattr(bot, 'exchange', replay)
+    monkeypatch.setattr(bot, 'USE_EXCHANGE_BRACKETS', True)
+    monkeypatch.setattr(bot, 'snapshots', bot.SnapshotProvider(clock=clock.time))
+    monkeypatch.setattr(bot, 'open_positions', {'1': {
+        'id': '1', 'type': 'long', 'amount': AMOUNT, 'entry_price': ENTRY, 'stop_loss': STOP_LOSS,
+        'take_profit': TAKE_PROFIT, 'status': 'open', 'entry_time': '2025-01-01T00:00:00'}})
+    monkeypatch.setattr(bot, 'closed_trades', [])
+    monkeypatch.setattr(bot, 'journal', None)
+    monkeypatch.setattr(bot, 'activity_log_file', str(tmp_path / 'activity.log'))
+    return replay, clock
+
+
+@pytest.fixture(autouse=True)
+def flush_log():
+    yield
+    bot.close_log()
+
+
+def test_filled_take_profit_leg_closes_position(monkeypatch, tmp_path):
+    replay, clock = replay_bot(monkeypatch, tmp_path, flat_bars(10, {5: (ENTRY, 103.0)}))
+    bot.protect_position('1', replay.market(bot.symbol))
+    position = bot.open_positions['1']
+    assert set(position['bracket_orders']) == {'sl', 'tp'}
+    assert not bot.needs_monitoring()
+
+    bot.reconcile_brackets() # Les deux jambes sont encore dans le carnet
+    assert '1' in bot.open_positions
+
+    clock.now = 6 * PERIOD # La bougie 5 (high 103) est clôturée : la jambe TP est exécutée
+    bot.reconcile_brackets()
+    assert bot.open_positions == {}
+    [trade] = bot.closed_trades
+    assert trade['status'] == 'closed_tp' and trade['exit_price'] == TAKE_PROFIT
+    assert trade['profit_usd'] == pytest.approx((TAKE_PROFIT - ENTRY) * AMOUNT)
+    assert replay.balances == {'USDT': pytest.approx(TAKE_PROFIT * AMOUNT), 'BTC': 0.0}
+    assert replay.fetch_order(position['bracket_orders']['sl'])['status'] == 'canceled'
+    assert replay.fetch_open_orders(bot.symbol) == []
+
+
+def test_rejected_bracket_leaves_position_watched_locally(monkeypatch, tmp_path):
+    replay, clock = replay_bot(monkeypatch, tmp_path, flat_bars(10, {5: (97.0, ENTRY)}))
+    bot.open_positions['1']['take_profit'] = 99.0 # Jambe « au-dessus » sous le prix courant : refusée par l'exchange
+    bot.protect_position('1', replay.market(bot.symbol))
+    assert 'bracket_orders' not in bot.open_positions['1']
+    assert replay.fetch_open_orders(bot.symbol) == []
+    assert bot.needs_monitoring()
+
+    clock.now = 6 * PERIOD
+    bot.open_positions['1']['take_profit'] = TAKE_PROFIT
+    bot.manage_positions(bot.snapshots.take(candles=False)) # Prix 100 : ni SL ni TP
+    assert '1' in bot.open_positions
+
+
+def test_cancelled_bracket_falls_back_to_local_monitoring(monkeypatch, tmp_path):
+    replay, clock = replay_bot(monkeypatch, tmp_path, flat_bars(10))
+    bot.protect_position('1', replay.market(bot.symbol))
+    legs = bot.open_positions['1']['bracket_orders']
+    replay.cancel_order(legs['sl'], bot.symbol) # Annulation manuelle : toute la liste est annulée
+    assert replay.fetch_order(legs['tp'])['status'] == 'canceled'
+
+    bot.reconcile_brackets()
+    position = bot.open_positions['1']
+    assert 'bracket_orders' not in position and position['status'] == 'open'
+    assert bot.needs_monitoring()
+
+    bot.open_positions['1']['stop_loss'] = ENTRY # Le SL surveillé localement vend au marché
+    bot.manage_positions(bot.snapshots.take(candles=False))
+    assert [trade['status'] for trade in bot.closed_trades] == ['closed_sl']
+    assert replay.balances == {'USDT': pytest.approx(ENTRY * AMOUNT), 'BTC': 0.0}
+
+
+def test_lost_bracket_response_is_found_among_open_orders(monkeypatch, tmp_path):
+    replay, clock = replay_bot(monkeypatch, tmp_path, flat_bars(10))
+    replay.inject(bot.BRACKET_METHOD, ccxt.RequestTimeout("binance POST orderList/oco timed out"), after=True)
+    bot.protect_position('1', replay.market(bot.symbol))
+    position = bot.open_positions['1']
+    [order_list_id] = replay.order_lists
+    assert position['oco_id'] == str(order_list_id)
+    assert sorted(position['bracket_orders'].values()) == sorted(order['id'] for order in replay.fetch_open_orders(bot.symbol))
+    assert not bot.needs_monitoring() # Pas de seconde sortie surveillée localement
+
+
+def test_bracket_lost_before_reaching_exchange_falls_back_to_local_monitoring(monkeypatch, tmp_path):
+    replay, clock = replay_bot(monkeypatch, tmp_path, flat_bars(10))
+    replay.inject(bot.BRACKET_METHOD, ccxt.NetworkError("connection reset"))
+    bot.protect_position('1', replay.market(bot.symbol))
+    assert replay.order_lists == {}
+    assert bot.watched_locally(bot.open_positions['1'])
+
+
+def test_unknown_bracket_state_is_resolved_at_next_reconcile(monkeypatch, tmp_path):
+    replay, clock = replay_bot(monkeypatch, tmp_path, flat_bars(10, {5: (ENTRY, 103.0)}))
+    replay.inject(bot.BRACKET_METHOD, ccxt.RequestTimeout("binance POST orderList/oco timed out"), after=True)
+    replay.inject('fetch_open_orders', ccxt.ExchangeNotAvailable("binance 503"))
+    bot.protect_position('1', replay.market(bot.symbol))
+    position = bot.open_positions['1']
+    assert position['bracket_pending'] and 'bracket_orders' not in position
+    assert not bot.needs_monitoring()
+
+    bot.reconcile_brackets()
+    assert 'bracket_pending' not in position and set(position['bracket_orders']) == {'sl', 'tp'}
+
+    clock.now = 6 * PERIOD
+    bot.reconcile_brackets()
+    assert [trade['status'] for trade in bot.closed_trades] == ['closed_tp']
+
+
+def test_bracket_check_failure_does_not_skip_local_exits(monkeypatch, tmp_path):
+    replay, clock = replay_bot(monkeypatch, tmp_path, flat_bars(10, {5: (ENTRY, 103.0)}))
+    bot.protect_position('1', replay.market(bot.symbol))
+    # Seconde position surveillée localement, dont le SL est atteint au prix courant
+    bot.open_positions['2'] = dict(bot.open_positions['1'], id='2', amount=0.1, stop_loss=ENTRY)
+    del bot.open_positions['2']['bracket_orders']
+    replay.balances['BTC'] += 0.1
+
+    replay.inject('fetch_open_orders', ccxt.RateLimitExceeded("binance 429"))
+    bot.reconcile_brackets()
+    bot.manage_positions(bot.snapshots.take(candles=False))
+    assert [trade['id'] for trade in bot.closed_trades] == ['2']
+
+    clock.now = 6 * PERIOD # Jambe TP exécutée, mais son détail est illisible à cette clôture
+    replay.inject('fetch_order', ccxt.RequestTimeout("binance GET order timed out"))
+    bot.reconcile_brackets()
+    assert '1' in bot.open_positions
+    bot.reconcile_brackets()
+    assert [trade['status'] for trade in bot.closed_trades] == ['closed_sl', 'closed_tp']
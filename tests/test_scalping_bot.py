@@ -0,0 +1,61 @@
+import pytest
+
+import scalping_bot as bot
+
+
+class CountingExchange:
+    """Exchange synchrone factice : bougies 1m plates jusqu'à `published` (exclu), appels comptés."""
+
+    def __init__(self, published):
+        self.published = published
+        self.ohlcv_calls = 0
+
+    def market(self, market_symbol):
+        return {'precision': {'amount': 5}, 'limits': {'amount': {'min': 0.00001}}}
+
+    def fetch_ohlcv(self, market_symbol, tf, since=None, limit=None):
+        self.ohlcv_calls += 1
+        first = 0 if since is None else since // 60_000
+        return [[60_000 * i, 100.0, 100.0, 100.0, 100.0, 1.0] for i in range(first, self.published)]
+
+    def fetch_ticker(self, market_symbol):
+        return {'last': 100.0}
+
+    def fetch_balance(self):
+        return {'total': {'USDT': 1000.0, 'BTC': 0.0}}
+
+
+@pytest.fixture
+def fresh_bot(monkeypatch, tmp_path):
+    monkeypatch.setattr(bot, 'sma_state', bot.IncrementalSMA(bot.short_window, bot.long_window))
+    monkeypatch.setattr(bot, 'activity_log_file', str(tmp_path / 'activity.log'))
+    yield
+    bot.close_log()
+
+
+def test_candles_are_refetched_at_every_close(fresh_bot, monkeypatch):
+    exchange = CountingExchange(published=bot.long_window + 1)
+    monkeypatch.setattr(bot, 'exchange', exchange)
+    now = [0.0]
+    provider = bot.SnapshotProvider(clock=lambda: now[0])
+    assert len(provider.take().candles) == bot.long_window + 1
+    now[0] += 0.5 # Deux clôtures rapprochées (rattrapage) : pas de bougies servies depuis le cache
+    exchange.published += 1
+    assert provider.take().candles[-1][0] == 60_000 * (bot.long_window + 1)
+    assert exchange.ohlcv_calls == 2
+    provider.take(candles=False)
+    assert exchange.ohlcv_calls == 2
+
+
+def test_close_signal_is_skipped_and_logged_when_candle_is_not_published(fresh_bot):
+    candles = [[60_000 * i, 100.0, 100.0, 100.0, 100.0, 1.0] for i in range(bot.long_window + 1)]
+    bot.sma_state.update(candles)
+    last_close = (bot.long_window + 1) * 60
+    assert bot.close_signal(last_close) is None # Croisement absent : SMA égales
+    bot.sma_state.update([[60_000 * (bot.long_window + 1), 100.0, 101.0, 100.0, 101.0, 1.0]])
+    assert bot.close_signal(last_close + 60) == 'buy'
+    # Clôture suivante sans nouvelle bougie publiée : pas de signal répété
+    assert bot.close_signal(last_close + 120) is None
+    bot.close_log()
+    with open(bot.activity_log_file) as f:
+        assert "pas encore publiée : signal de cette clôture non évalué" in f.read()
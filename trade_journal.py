@@ -0,0 +1,184 @@
+import json
+import os
+import time
+
+# --- Journal des trades en ajout seul ---
+# Chaque ouverture, mise à jour et fermeture de position est ajoutée en une ligne JSON au
+# journal (JSONL) au lieu de réécrire tout l'historique. Chaque ligne est transmise au système
+# dès son écriture (un arrêt du processus ne perd rien) ; le fsync, coûteux, est groupé
+# (FSYNC_BATCH événements, ou à chaque sync() du bot).
+# Tous les SNAPSHOT_EVERY événements, le journal est compacté : les trades fermés depuis la
+# compaction précédente sont ajoutés à l'archive des trades fermés (JSONL, jamais réécrite),
+# les positions ouvertes sont écrites dans un instantané atomique, et le journal repart à vide.
+# Au redémarrage, on relit l'archive, l'instantané, puis au plus SNAPSHOT_EVERY lignes de journal.
+
+FSYNC_BATCH = 20 # Événements au plus entre deux fsync
+SNAPSHOT_EVERY = 500 # Événements entre deux compactions du journal
+EVENTS = ('open', 'update', 'close')
+
+
+def fsync_file(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def read_jsonl(path, limit=None):
+    """
+    Lit au plus `limit` lignes JSON valides de `path`. Retourne (enregistrements, taille en octets
+    des lignes lues) : une dernière ligne tronquée (arrêt pendant l'écriture) arrête la lecture.
+    """
+    records = []
+    valid_size = 0
+    if not os.path.exists(path):
+        return records, valid_size
+    with open(path, 'rb') as f:
+        for line in f:
+            if limit is not None and len(records) >= limit:
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"{path}: ligne incomplète ignorée à l'octet {valid_size}.")
+                break
+            valid_size += len(line)
+    return records, valid_size
+
+
+def truncate_file(path, size):
+    """Retire la fin de `path` au-delà de `size` octets (lignes non validées)."""
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, 'r+b') as f:
+            f.truncate(size)
+
+
+class TradeJournal:
+    """
+    Journal des positions, en trois fichiers :
+    `path` (JSONL, une ligne par événement numéroté `seq`), `snapshot_path` (positions ouvertes et
+    nombre de trades archivés au dernier `seq` compacté) et `archive_path` (trades fermés, JSONL).
+    """
+
+    def __init__(self, path, snapshot_path, archive_path=None, fsync_batch=FSYNC_BATCH, snapshot_every=SNAPSHOT_EVERY):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.archive_path = archive_path or os.path.splitext(path)[0] + '_closed.jsonl'
+        self.fsync_batch = fsync_batch
+        self.snapshot_every = snapshot_every
+        self.open_positions = {} # Copie des positions ouvertes, pour l'instantané
+        self.new_closed = [] # Trades fermés depuis la dernière compaction
+        self.archived = 0 # Trades fermés présents dans l'archive
+        self.seq = 0 # Numéro du dernier événement
+        self.events_since_snapshot = 0
+        self.pending_fsync = 0
+        self.fsync_count = 0
+        self._file = None
+
+    def _apply(self, event, position):
+        position = dict(position)
+        if event == 'close':
+            self.open_positions.pop(position['id'], None)
+            self.new_closed.append(position)
+        else:
+            self.open_positions[position['id']] = position
+
+    def load(self, legacy_trades=None):
+        """
+        Reconstruit l'état : archive et instantané, puis événements du journal postérieurs à celui-ci.
+        Les lignes non validées par l'instantané (arrêt pendant une écriture ou une compaction) sont
+        retirées. `legacy_trades` (ancien trades.json) sert d'historique initial si aucun journal n'existe.
+        Retourne (closed_trades, open_positions), copies modifiables par l'appelant.
+        """
+        start = time.perf_counter()
+        has_snapshot = os.path.exists(self.snapshot_path)
+        if has_snapshot:
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+            self.seq = snapshot['seq']
+            self.archived = snapshot['archived']
+            self.open_positions = snapshot['open_positions']
+        closed_trades, valid_size = read_jsonl(self.archive_path, self.archived)
+        truncate_file(self.archive_path, valid_size)
+        self.archived = len(closed_trades)
+
+        records, valid_size = read_jsonl(self.path)
+        truncate_file(self.path, valid_size)
+        replayed = 0
+        for record in records:
+            if record['seq'] <= self.seq:
+                continue # Déjà compris dans l'instantané
+            self._apply(record['event'], record['position'])
+            self.seq = record['seq']
+            replayed += 1
+        closed_trades.extend(dict(trade) for trade in self.new_closed)
+
+        if not has_snapshot and not records and legacy_trades:
+            closed_trades = [dict(trade) for trade in legacy_trades]
+            self.new_closed = [dict(trade) for trade in legacy_trades]
+            self.compact() # L'ancien historique devient l'archive initiale
+
+        self.events_since_snapshot = replayed
+        print(f"Journal {self.path}: {len(closed_trades)} trades fermés, {len(self.open_positions)} positions ouvertes "
+              f"({replayed} événements relus en {time.perf_counter() - start:.3f}s).")
+        return closed_trades, {pos_id: dict(position) for pos_id, position in self.open_positions.items()}
+
+    def _journal_file(self):
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        return self._file
+
+    def record(self, event, position):
+        """Ajoute un événement ('open', 'update' ou 'close') pour `position` (dictionnaire avec 'id')."""
+        if event not in EVENTS:
+            raise ValueError(f"Événement de journal inconnu: {event}")
+        self.seq += 1
+        self._apply(event, position)
+        f = self._journal_file()
+        f.write(json.dumps({'seq': self.seq, 'event': event, 'position': position}) + '\n')
+        f.flush() # Ligne transmise au système : survit à un arrêt du processus
+        self.pending_fsync += 1
+        self.events_since_snapshot += 1
+        if self.pending_fsync >= self.fsync_batch:
+            self.sync()
+        if self.events_since_snapshot >= self.snapshot_every:
+            self.compact()
+
+    def sync(self):
+        """Rend durables sur disque les événements écrits depuis le dernier fsync."""
+        if self.pending_fsync and self._file is not None:
+            fsync_file(self._file)
+            self.fsync_count += 1
+        self.pending_fsync = 0
+
+    def compact(self):
+        """
+        Archive les trades fermés récents, écrit l'instantané (atomiquement) puis repart d'un journal vide.
+        Un arrêt entre deux étapes est sans effet : l'instantané précédent reste la référence, les
+        lignes d'archive en trop sont retirées et les événements déjà compactés ignorés à la relecture.
+        """
+        if self.new_closed:
+            with open(self.archive_path, 'a') as f:
+                f.writelines(json.dumps(trade) + '\n' for trade in self.new_closed)
+                fsync_file(f)
+        archived = self.archived + len(self.new_closed)
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'seq': self.seq, 'archived': archived, 'open_positions': self.open_positions}, f)
+            fsync_file(f)
+        os.replace(tmp_path, self.snapshot_path)
+        self.archived = archived
+        self.new_closed = []
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp_path = self.path + '.tmp'
+        open(tmp_path, 'w').close()
+        os.replace(tmp_path, self.path)
+        self.events_since_snapshot = 0
+        self.pending_fsync = 0
+
+    def close(self):
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None